@@ -0,0 +1,107 @@
+"""
+Leia-suas-escritas entre processos (réplicas de leitura, DB_REPLICA_HOSTS).
+
+A marcação de escrita recente em api/persistence/db.py vale só no processo
+que fez a escrita. Para que a leitura seguinte do mesmo cliente também
+vá ao primário quando cair em outro worker (ou outro host), a resposta de
+uma requisição que confirmou uma escrita leva o cookie carteira_escrita
+com o momento do commit; enquanto ele tiver menos de
+DB_REPLICA_LEITURA_PROPRIA_SEGUNDOS, as leituras daquele cliente ficam no
+primário em qualquer processo.
+
+O estado da requisição fica em uma ContextVar aberta pelo middleware; as
+rotas síncronas rodam no threadpool com uma cópia do contexto e marcam o
+mesmo objeto.
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from http.cookies import CookieError, SimpleCookie
+from typing import Optional
+
+
+COOKIE = "carteira_escrita"
+
+
+@dataclass
+class LeituraPropria:
+    escrita_recente: bool = False  # o cliente trouxe um cookie ainda dentro do prazo
+    escreveu: bool = False  # esta requisição confirmou uma escrita
+
+
+_estado_atual: ContextVar[Optional[LeituraPropria]] = ContextVar("leitura_propria", default=None)
+
+
+def estado_atual() -> Optional[LeituraPropria]:
+    """Estado da requisição HTTP em andamento; None fora de uma requisição."""
+    return _estado_atual.get()
+
+
+def cliente_escreveu_recentemente() -> bool:
+    estado = _estado_atual.get()
+    return estado is not None and estado.escrita_recente
+
+
+def marcar_escrita() -> None:
+    """
+    A requisição atual confirmou uma escrita gravada fora do seu contexto
+    (ex.: pela thread do commit em grupo dos depósitos).
+    """
+    estado = _estado_atual.get()
+    if estado is not None:
+        estado.escreveu = True
+
+
+def _momento_do_cookie(scope) -> Optional[float]:
+    for nome, valor in scope.get("headers", []):
+        if nome != b"cookie":
+            continue
+        try:
+            cookies = SimpleCookie(valor.decode("latin-1"))
+        except CookieError:
+            continue
+        if COOKIE in cookies:
+            try:
+                return float(cookies[COOKIE].value)
+            except ValueError:
+                return None
+    return None
+
+
+class MiddlewareLeituraPropria:
+    """
+    Middleware ASGI do cookie de leitura própria (registrado em create_app
+    quando há réplicas). Em respostas em streaming, os headers saem antes
+    do corpo: só escritas confirmadas até ali geram o cookie.
+    """
+
+    def __init__(self, app, prazo_segundos: float):
+        self.app = app
+        self.prazo_segundos = prazo_segundos
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        momento = _momento_do_cookie(scope)
+        # tolera relógios um pouco adiantados em outro host
+        recente = momento is not None and abs(time.time() - momento) < self.prazo_segundos
+        estado = LeituraPropria(escrita_recente=recente)
+        token = _estado_atual.set(estado)
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start" and estado.escreveu:
+                cookie = (
+                    f"{COOKIE}={time.time():.3f}; Max-Age={max(1, round(self.prazo_segundos))}; "
+                    f"Path=/; HttpOnly; SameSite=Lax"
+                )
+                headers = list(mensagem.get("headers", []))
+                headers.append((b"set-cookie", cookie.encode("latin-1")))
+                mensagem = {**mensagem, "headers": headers}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _estado_atual.reset(token)
@@ -1,8 +1,121 @@
+import os
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
 from fastapi import FastAPI
 from api.routers.carteira_router import router as carteiras_router
 from api.routers.movimentacao_router import router as movimentacao_router
 from api.routers.conversao_router import router as conversao_router
 from api.routers.transferencia_router import router as transferencia_router
+from api.routers.diagnostico_router import router as diagnostico_router
+from api.routers.extrato_router import router as extrato_router
+from api.routers.historico_router import router as historico_router
+from api.routers.metricas_router import router as metricas_router
+from api.routers.valor_router import router as valor_router
+from api.services.coinbase_service import CoinbaseService, criar_cliente_coinbase
+from api.services.matriz_cotacoes import MatrizCotacoes
+from api.services.compactador_saldos import CompactadorSaldos
+from api.services.monitor_replicas import MonitorReplicas
+from api.persistence.repositories.moeda_repository import AsyncMoedaRepository
+from api.persistence.fila_depositos import FilaDepositos
+from api.persistence.db import (
+    escritas_recentes,
+    fechar_engines,
+    get_replicas,
+    preaquecer_pool,
+    preaquecer_pool_async,
+)
+from api.metricas import MiddlewareMetricas
+from api.leitura_propria import MiddlewareLeituraPropria
+from api.perfil_consultas import MiddlewarePerfilConsultas, perfil_ativo
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _preaquecer_pools(quantidade: int) -> None:
+    """
+    Abre as primeiras conexões dos pools antes de atender, para que as
+    requisições logo após um deploy não paguem a conexão com o MySQL.
+    Banco indisponível não impede a subida: as conexões são abertas depois,
+    sob demanda.
+    """
+    try:
+        await asyncio.gather(
+            asyncio.to_thread(preaquecer_pool, quantidade),
+            preaquecer_pool_async(quantidade),
+        )
+    except Exception:
+        logger.exception("Falha ao pré-aquecer os pools de conexão")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Pools de conexão pré-aquecidos (0 = engines criadas no primeiro uso)
+    conexoes_preaquecidas = int(os.getenv("DB_POOL_PREAQUECER_CONEXOES", "0"))
+    if conexoes_preaquecidas > 0:
+        await _preaquecer_pools(conexoes_preaquecidas)
+
+    # Cliente HTTP com pool de conexões, compartilhado por todas as requisições
+    app.state.coinbase_client = criar_cliente_coinbase()
+
+    # Matriz de cotações atualizada em segundo plano (opcional)
+    app.state.matriz_cotacoes = None
+    tarefa_matriz = None
+    if os.getenv("COTACAO_MATRIZ_ATIVA", "false").lower() in ("1", "true", "sim"):
+        app.state.matriz_cotacoes = MatrizCotacoes.a_partir_do_env()
+        tarefa_matriz = asyncio.create_task(
+            app.state.matriz_cotacoes.executar(
+                CoinbaseService(app.state.coinbase_client),
+                AsyncMoedaRepository().listar_codigos,
+                float(os.getenv("COTACAO_MATRIZ_INTERVALO_SEGUNDOS", "5")),
+            )
+        )
+
+    # Commit em grupo dos depósitos (opcional)
+    app.state.fila_depositos = None
+    if os.getenv("DEPOSITO_GRUPO_ATIVO", "false").lower() in ("1", "true", "sim"):
+        app.state.fila_depositos = FilaDepositos.a_partir_do_env()
+        app.state.fila_depositos.iniciar()
+
+    # Compactação dos saldos divididos em slots (opcional; 0 ou ausente desativa).
+    # Só é necessária com carteiras em mais de um slot.
+    app.state.compactador_saldos = None
+    tarefa_compactador = None
+    intervalo_compactacao = float(os.getenv("SALDO_COMPACTACAO_INTERVALO_SEGUNDOS", "0"))
+    if intervalo_compactacao > 0:
+        app.state.compactador_saldos = CompactadorSaldos.a_partir_do_env()
+        tarefa_compactador = asyncio.create_task(
+            app.state.compactador_saldos.executar(intervalo_compactacao)
+        )
+
+    # Atraso das réplicas de leitura (se houver DB_REPLICA_HOSTS)
+    app.state.monitor_replicas = None
+    tarefa_replicas = None
+    if get_replicas():
+        app.state.monitor_replicas = MonitorReplicas.a_partir_do_env()
+        # primeira verificação antes de atender: até lá, tudo lê do primário
+        await asyncio.to_thread(app.state.monitor_replicas.verificar)
+        tarefa_replicas = asyncio.create_task(
+            app.state.monitor_replicas.executar(
+                float(os.getenv("DB_REPLICA_VERIFICACAO_INTERVALO_SEGUNDOS", "2"))
+            )
+        )
+
+    try:
+        yield
+    finally:
+        if app.state.fila_depositos is not None:
+            # grava o que ainda está na fila antes de fechar o banco
+            await asyncio.to_thread(app.state.fila_depositos.parar)
+        for tarefa in (tarefa_matriz, tarefa_compactador, tarefa_replicas):
+            if tarefa is not None:
+                tarefa.cancel()
+                with suppress(asyncio.CancelledError):
+                    await tarefa
+        await app.state.coinbase_client.aclose()
+        await fechar_engines()
 
 
 def create_app() -> FastAPI:
@@ -10,6 +123,7 @@ def create_app() -> FastAPI:
         title="Carteira Digital API",
         version="1.0.0",
         description="API educacional de carteira digital com SQL puro e FastAPI.",
+        lifespan=lifespan,
     )
 
     # Endpoint de teste (Mini-Sprint 1)
@@ -25,7 +139,23 @@ def create_app() -> FastAPI:
     app.include_router(carteiras_router)
     app.include_router(movimentacao_router)
     app.include_router(conversao_router)
+    app.include_router(valor_router)
     app.include_router(transferencia_router)
+    app.include_router(historico_router)
+    app.include_router(extrato_router)
+    app.include_router(diagnostico_router)
+    app.include_router(metricas_router)
+
+    # Latência e erros por rota (GET /metrics)
+    app.add_middleware(MiddlewareMetricas)
+
+    # Leia-suas-escritas entre workers: cookie com o momento da última escrita
+    if escritas_recentes.ttl_segundos > 0 and get_replicas():
+        app.add_middleware(MiddlewareLeituraPropria, prazo_segundos=escritas_recentes.ttl_segundos)
+
+    # Perfil das consultas SQL por requisição (headers X-DB-*, log das lentas)
+    if perfil_ativo():
+        app.add_middleware(MiddlewarePerfilConsultas)
 
     return app
 
@@ -0,0 +1,263 @@
+"""
+Métricas do processo no formato texto do Prometheus (GET /metrics).
+
+Implementação mínima, sem dependências: contadores e histogramas com
+rótulos, e medidores lidos na hora da coleta. Registrar uma observação
+custa uma busca binária nas faixas e um lock curto (poucos microssegundos).
+Cada processo tem as suas métricas; com vários workers, o Prometheus
+coleta cada um separadamente.
+"""
+import time
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+
+# Faixas em segundos: de 1 ms a 10 s (HTTP e Coinbase)
+FAIXAS_LATENCIA = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Comandos SQL e espera por conexão costumam ficar abaixo de 1 ms
+FAIXAS_SQL = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0, 5.0)
+# Itens por grupo do commit em grupo dos depósitos
+FAIXAS_TAMANHO_GRUPO = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+
+def _escapar(valor: str) -> str:
+    return valor.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _rotulos(nomes: Sequence[str], valores: Tuple[str, ...], extra: str = "") -> str:
+    pares = [f'{n}="{_escapar(v)}"' for n, v in zip(nomes, valores)]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor: float) -> str:
+    if valor == float("inf"):
+        return "+Inf"
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+class Contador:
+    """Contador monotônico com rótulos."""
+
+    tipo = "counter"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = ()):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self._valores: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def incrementar(self, *rotulos: str, valor: float = 1) -> None:
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def exportar(self) -> Iterable[str]:
+        with self._lock:
+            valores = list(self._valores.items())
+        for rotulos, valor in valores:
+            yield f"{self.nome}{_rotulos(self.rotulos, rotulos)} {_numero(valor)}"
+
+
+class Histograma:
+    """Histograma com faixas fixas (limite superior inclusivo) e rótulos."""
+
+    tipo = "histogram"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str] = (), faixas: Sequence[float] = FAIXAS_LATENCIA):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.faixas = tuple(faixas)
+        # por combinação de rótulos: [contagem por faixa (+ uma acima da maior), soma]
+        self._series: Dict[Tuple[str, ...], List] = {}
+        self._lock = threading.Lock()
+
+    def observar(self, valor: float, *rotulos: str) -> None:
+        indice = bisect.bisect_left(self.faixas, valor)
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * (len(self.faixas) + 1), 0.0]
+            serie[0][indice] += 1
+            serie[1] += valor
+
+    def exportar(self) -> Iterable[str]:
+        with self._lock:
+            series = [(r, list(s[0]), s[1]) for r, s in self._series.items()]
+        for rotulos, contagens, soma in series:
+            acumulado = 0
+            for limite, qtd in zip(self.faixas + (float("inf"),), contagens):
+                acumulado += qtd
+                le = f'le="{_numero(limite)}"'
+                yield f"{self.nome}_bucket{_rotulos(self.rotulos, rotulos, le)} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {_numero(soma)}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {acumulado}"
+
+    def resumo(self, *rotulos: str) -> Dict[str, Any]:
+        """Total, média e contagem por faixa de uma série (endpoints de diagnóstico)."""
+        with self._lock:
+            serie = self._series.get(rotulos)
+            contagens = list(serie[0]) if serie else [0] * (len(self.faixas) + 1)
+            soma = serie[1] if serie else 0.0
+        total = sum(contagens)
+        faixas = {f"<={limite:g}": qtd for limite, qtd in zip(self.faixas, contagens)}
+        faixas[f">{self.faixas[-1]:g}"] = contagens[-1]
+        return {"total": total, "media": soma / total if total else 0.0, "faixas": faixas}
+
+
+class Medidor:
+    """
+    Valor instantâneo calculado na coleta (ex.: conexões em uso no pool).
+    `ler` retorna pares (valores dos rótulos, valor).
+    """
+
+    tipo = "gauge"
+
+    def __init__(self, nome: str, ajuda: str, rotulos: Sequence[str], ler: Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]):
+        self.nome = nome
+        self.ajuda = ajuda
+        self.rotulos = tuple(rotulos)
+        self.ler = ler
+
+    def exportar(self) -> Iterable[str]:
+        for rotulos, valor in self.ler():
+            yield f"{self.nome}{_rotulos(self.rotulos, rotulos)} {_numero(valor)}"
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._metricas: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, metrica):
+        """Registra a métrica (uma vez por nome) e a devolve."""
+        with self._lock:
+            return self._metricas.setdefault(metrica.nome, metrica)
+
+    def exportar(self) -> str:
+        with self._lock:
+            metricas = list(self._metricas.values())
+        linhas: List[str] = []
+        for m in metricas:
+            linhas.append(f"# HELP {m.nome} {m.ajuda}")
+            linhas.append(f"# TYPE {m.nome} {m.tipo}")
+            linhas.extend(m.exportar())
+        return "\n".join(linhas) + "\n"
+
+
+registro = RegistroMetricas()
+
+
+# --- HTTP (middleware registrado em create_app) ---
+http_duracao = registro.registrar(Histograma(
+    "carteira_http_requisicao_segundos",
+    "Duração das requisições HTTP por rota.",
+    ("metodo", "rota"),
+))
+http_requisicoes = registro.registrar(Contador(
+    "carteira_http_requisicoes_total",
+    "Requisições HTTP por rota e status.",
+    ("metodo", "rota", "status"),
+))
+http_erros = registro.registrar(Contador(
+    "carteira_http_erros_total",
+    "Requisições HTTP com status 5xx ou exceção não tratada, por rota.",
+    ("metodo", "rota"),
+))
+
+# --- SQL (eventos das engines em api/persistence/db.py) ---
+sql_duracao = registro.registrar(Histograma(
+    "carteira_sql_comando_segundos",
+    "Duração dos comandos SQL por tipo de comando e tabela.",
+    ("engine", "comando"),
+    FAIXAS_SQL,
+))
+sql_erros = registro.registrar(Contador(
+    "carteira_sql_erros_total",
+    "Comandos SQL que falharam, por tipo de comando e tabela.",
+    ("engine", "comando"),
+))
+pool_espera = registro.registrar(Histograma(
+    "carteira_pool_checkout_segundos",
+    "Espera para obter uma conexão do pool (inclui o pre-ping).",
+    ("engine",),
+    FAIXAS_SQL,
+))
+leituras = registro.registrar(Contador(
+    "carteira_leituras_total",
+    "Consultas somente leitura fora de transação, por destino (primario ou réplica).",
+    ("destino",),
+))
+
+# --- Coinbase ---
+coinbase_duracao = registro.registrar(Histograma(
+    "carteira_coinbase_requisicao_segundos",
+    "Duração das chamadas à API de cotações da Coinbase.",
+))
+coinbase_falhas = registro.registrar(Contador(
+    "carteira_coinbase_falhas_total",
+    "Chamadas à Coinbase que falharam, por motivo.",
+    ("motivo",),
+))
+
+# --- Commit em grupo dos depósitos (api/persistence/fila_depositos.py) ---
+fila_tamanho_grupo = registro.registrar(Histograma(
+    "carteira_fila_depositos_tamanho_grupo",
+    "Depósitos gravados por grupo.",
+    faixas=FAIXAS_TAMANHO_GRUPO,
+))
+fila_espera = registro.registrar(Histograma(
+    "carteira_fila_depositos_espera_segundos",
+    "Espera de cada depósito na fila até o início da gravação do grupo.",
+    faixas=FAIXAS_SQL,
+))
+fila_grupos = registro.registrar(Contador(
+    "carteira_fila_depositos_grupos_total",
+    "Grupos gravados, por motivo do fechamento (tamanho ou tempo).",
+    ("fechamento",),
+))
+fila_falhas = registro.registrar(Contador(
+    "carteira_fila_depositos_falhas_total",
+    "Grupos de depósitos que falharam ao gravar.",
+))
+
+
+class MiddlewareMetricas:
+    """
+    Middleware ASGI que mede cada requisição HTTP. A rota é o caminho
+    declarado (ex.: /carteiras/{endereco_carteira}/saldos), não o caminho
+    recebido, para não criar uma série por carteira; caminhos sem rota
+    contam como "sem_rota". Respostas em streaming são medidas até o
+    último pedaço.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        inicio = time.perf_counter()
+        status = 500
+
+        async def enviar(mensagem):
+            nonlocal status
+            if mensagem["type"] == "http.response.start":
+                status = mensagem["status"]
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            rota = scope.get("route")
+            caminho = getattr(rota, "path", None) or "sem_rota"
+            metodo = scope["method"]
+            http_duracao.observar(time.perf_counter() - inicio, metodo, caminho)
+            http_requisicoes.incrementar(metodo, caminho, str(status))
+            if status >= 500:
+                http_erros.incrementar(metodo, caminho)
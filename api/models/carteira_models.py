@@ -1,6 +1,7 @@
-from typing import Literal
+from typing import List, Literal, Optional
 from datetime import  datetime
-from pydantic import BaseModel
+from decimal import Decimal
+from pydantic import BaseModel, Field
 
 
 class Carteira(BaseModel):
@@ -9,4 +10,63 @@ class Carteira(BaseModel):
     status: Literal["ATIVA","BLOQUEADA"]
 
 class CarteiraCriada(Carteira):
-    chave_privada: str
\ No newline at end of file
+    chave_privada: str
+
+
+class CarteiraPagina(BaseModel):
+    itens: List[Carteira]
+    proximo_cursor: Optional[str] = None
+    total_aproximado: Optional[int] = None
+
+
+class CarteiraLoteRequest(BaseModel):
+    quantidade: int = Field(..., ge=1, le=100000, description="Quantidade de carteiras a criar")
+
+
+class SlotsSaldoRequest(BaseModel):
+    slots: int = Field(..., ge=1, le=64, description="Linhas por moeda em que o saldo é dividido (1 = sem divisão)")
+
+
+class SlotsSaldo(BaseModel):
+    endereco_carteira: str
+    slots: int
+
+
+class ValorMoeda(BaseModel):
+    codigo_moeda: str
+    saldo: Decimal
+    cotacao: Decimal
+    valor: Decimal
+
+
+class ValorCarteira(BaseModel):
+    endereco_carteira: str
+    valor_total: Decimal
+    moedas: List[ValorMoeda]
+
+
+class CotacaoUtilizada(BaseModel):
+    moeda_origem: str
+    moeda_destino: str
+    cotacao: Decimal
+    obtida_em: datetime
+    idade_segundos: float
+    origem: Literal["matriz", "coinbase", "triangulada"]
+
+
+class ValorCarteiraResponse(ValorCarteira):
+    moeda_referencia: str
+    cotacoes: List[CotacaoUtilizada]
+
+
+class ValorCarteirasRequest(BaseModel):
+    enderecos: List[str] = Field(..., min_length=1, max_length=1000, description="Carteiras a avaliar")
+    moeda: str = Field("USD", description="Moeda de referência (ex.: USD, BRL)")
+
+
+class ValorCarteirasResponse(BaseModel):
+    moeda_referencia: str
+    valor_total: Decimal
+    carteiras: List[ValorCarteira]
+    nao_encontradas: List[str]
+    cotacoes: List[CotacaoUtilizada]
@@ -1,6 +1,6 @@
 from decimal import Decimal
 from datetime import datetime
-from typing import Literal
+from typing import List, Literal, Optional
 from pydantic import BaseModel, Field
 
 
@@ -34,6 +34,34 @@ class MovimentacaoResponse(BaseModel):
     data_operacao: datetime
 
 
+class DepositoLoteItem(BaseModel):
+    endereco_carteira: str = Field(..., description="Endereço da carteira a creditar")
+    codigo_moeda: str = Field(..., description="Código da moeda (BTC, ETH, SOL, USD, BRL)")
+    valor: Decimal = Field(..., gt=0, description="Valor a depositar")
+
+
+class DepositoLoteRequest(BaseModel):
+    itens: List[DepositoLoteItem] = Field(..., min_length=1, max_length=50000, description="Depósitos do lote")
+
+
+class DepositoLoteResultado(BaseModel):
+    indice: int
+    endereco_carteira: str
+    codigo_moeda: str
+    valor: Decimal
+    sucesso: bool
+    id: Optional[int] = None
+    data_operacao: Optional[datetime] = None
+    erro: Optional[str] = None
+
+
+class DepositoLoteResponse(BaseModel):
+    total: int
+    sucessos: int
+    falhas: int
+    resultados: List[DepositoLoteResultado]
+
+
 # ============ Modelos para Conversão ============
 class ConversaoRequest(BaseModel):
     moeda_origem: str = Field(..., description="Código da moeda de origem")
@@ -52,6 +80,7 @@ class ConversaoResponse(BaseModel):
     cotacao: Decimal
     taxa: Decimal
     data_operacao: datetime
+    idade_cotacao_segundos: float
 
 
 # ============ Modelos para Transferência ============
@@ -70,3 +99,57 @@ class TransferenciaResponse(BaseModel):
     valor: Decimal
     taxa: Decimal
     data_operacao: datetime
+
+
+class TransferenciaLoteItem(BaseModel):
+    endereco_destino: str = Field(..., description="Endereço da carteira de destino")
+    valor: Decimal = Field(..., gt=0, description="Valor a transferir")
+
+
+class TransferenciaLoteRequest(BaseModel):
+    codigo_moeda: str = Field(..., description="Código da moeda")
+    chave_privada: str = Field(..., description="Chave privada para autorização")
+    itens: List[TransferenciaLoteItem] = Field(..., min_length=1, max_length=50000, description="Destinos do pagamento")
+
+
+class TransferenciaLoteResultado(BaseModel):
+    indice: int
+    endereco_destino: str
+    valor: Decimal
+    sucesso: bool
+    id: Optional[int] = None
+    taxa: Optional[Decimal] = None
+    data_operacao: Optional[datetime] = None
+    erro: Optional[str] = None
+
+
+class TransferenciaLoteResponse(BaseModel):
+    endereco_origem: str
+    codigo_moeda: str
+    total: int
+    sucessos: int
+    falhas: int
+    valor_debitado: Decimal
+    resultados: List[TransferenciaLoteResultado]
+
+
+# ============ Modelos para Histórico ============
+TipoOperacao = Literal["DEPOSITO", "SAQUE", "CONVERSAO", "TRANSFERENCIA_ENVIADA", "TRANSFERENCIA_RECEBIDA"]
+
+
+class HistoricoItem(BaseModel):
+    id: int
+    tipo: TipoOperacao
+    data_operacao: datetime
+    codigo_moeda: str
+    valor: Decimal
+    taxa: Decimal
+    moeda_destino: Optional[str] = None
+    valor_destino: Optional[Decimal] = None
+    cotacao: Optional[Decimal] = None
+    contraparte: Optional[str] = None
+
+
+class HistoricoPagina(BaseModel):
+    itens: List[HistoricoItem]
+    proximo_cursor: Optional[str] = None
@@ -0,0 +1,152 @@
+"""
+Perfil das consultas SQL de cada requisição (modo opcional,
+PERFIL_CONSULTAS_ATIVO=true).
+
+O middleware abre um perfil por requisição em uma ContextVar; os eventos
+de cursor das engines (api/persistence/db.py) registram nele cada comando
+executado, inclusive nas rotas síncronas, que rodam no threadpool com uma
+cópia do contexto. A resposta ganha os headers X-DB-Query-Count e
+X-DB-Time-Ms; requisições lentas ou com muitos comandos são registradas
+no log com a lista completa, e comandos repetidos são sinalizados.
+"""
+import os
+import time
+import hashlib
+import itertools
+import logging
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+_perfil_atual: ContextVar[Optional["PerfilRequisicao"]] = ContextVar("perfil_consultas", default=None)
+
+# Número estável por conexão física do pool (guardado em conn.info)
+_ID_CONEXAO = "perfil_id_conexao"
+_ids_conexao = itertools.count(1)
+
+
+def perfil_ativo() -> bool:
+    return os.getenv("PERFIL_CONSULTAS_ATIVO", "false").lower() in ("1", "true", "sim")
+
+
+@dataclass
+class ComandoExecutado:
+    texto: str
+    parametros: str  # impressão digital dos parâmetros (não guarda os valores)
+    duracao_ms: float
+    conexao: int
+
+
+@dataclass
+class PerfilRequisicao:
+    comandos: List[ComandoExecutado] = field(default_factory=list)
+
+    @property
+    def quantidade(self) -> int:
+        return len(self.comandos)
+
+    @property
+    def tempo_ms(self) -> float:
+        return sum(c.duracao_ms for c in self.comandos)
+
+    def repetidos(self) -> List[Tuple[str, int]]:
+        """Mesmo comando com os mesmos parâmetros mais de uma vez: (texto, vezes)."""
+        vezes = Counter((c.texto, c.parametros) for c in self.comandos)
+        return [(texto, qtd) for (texto, _), qtd in vezes.items() if qtd > 1]
+
+    def possiveis_n_mais_1(self, minimo: int) -> List[Tuple[str, int]]:
+        """Mesmo texto com parâmetros diferentes pelo menos `minimo` vezes (laço de consultas)."""
+        vezes = Counter(c.texto for c in self.comandos)
+        return [(texto, qtd) for texto, qtd in vezes.items() if qtd >= minimo]
+
+
+def _impressao_parametros(parametros: Any) -> str:
+    return hashlib.blake2b(repr(parametros).encode(), digest_size=6).hexdigest()
+
+
+def _id_conexao(conn) -> int:
+    info = conn.info
+    if _ID_CONEXAO not in info:
+        info[_ID_CONEXAO] = next(_ids_conexao)
+    return info[_ID_CONEXAO]
+
+
+def registrar_comando(conn, texto: str, parametros: Any, duracao_segundos: float) -> None:
+    """Chamado pelo evento after_cursor_execute; sem perfil aberto, não faz nada."""
+    perfil = _perfil_atual.get()
+    if perfil is None:
+        return
+    perfil.comandos.append(ComandoExecutado(
+        texto=texto,
+        parametros=_impressao_parametros(parametros),
+        duracao_ms=duracao_segundos * 1000,
+        conexao=_id_conexao(conn),
+    ))
+
+
+def _compacto(texto: str) -> str:
+    return " ".join(texto.split())
+
+
+class MiddlewarePerfilConsultas:
+    """
+    Middleware ASGI do perfil de consultas. Em respostas em streaming, os
+    headers saem antes do corpo, então só contam os comandos executados
+    até ali; o log no fim da requisição conta todos.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.limite_ms = float(os.getenv("PERFIL_CONSULTAS_LIMITE_MS", "200"))
+        self.limite_comandos = int(os.getenv("PERFIL_CONSULTAS_LIMITE_COMANDOS", "20"))
+        self.minimo_n_mais_1 = int(os.getenv("PERFIL_CONSULTAS_MINIMO_N_MAIS_1", "5"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        perfil = PerfilRequisicao()
+        token = _perfil_atual.set(perfil)
+        inicio = time.perf_counter()
+
+        async def enviar(mensagem):
+            if mensagem["type"] == "http.response.start":
+                headers = list(mensagem.get("headers", []))
+                headers.append((b"x-db-query-count", str(perfil.quantidade).encode()))
+                headers.append((b"x-db-time-ms", f"{perfil.tempo_ms:.2f}".encode()))
+                mensagem = {**mensagem, "headers": headers}
+            await send(mensagem)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _perfil_atual.reset(token)
+            self._relatar(scope, perfil, (time.perf_counter() - inicio) * 1000)
+
+    def _relatar(self, scope, perfil: PerfilRequisicao, duracao_ms: float) -> None:
+        repetidos = perfil.repetidos()
+        n_mais_1 = perfil.possiveis_n_mais_1(self.minimo_n_mais_1)
+        lenta = duracao_ms > self.limite_ms or perfil.quantidade > self.limite_comandos
+        if not (lenta or repetidos or n_mais_1):
+            return
+
+        linhas = [
+            f"{scope['method']} {scope['path']}: {perfil.quantidade} comandos SQL em "
+            f"{perfil.tempo_ms:.2f} ms (requisição {duracao_ms:.2f} ms)"
+        ]
+        if lenta:
+            for i, c in enumerate(perfil.comandos, 1):
+                linhas.append(
+                    f"  {i}. [conexão {c.conexao}] {c.duracao_ms:.3f} ms "
+                    f"(parâmetros {c.parametros}) {_compacto(c.texto)}"
+                )
+        for texto, qtd in repetidos:
+            linhas.append(f"  REPETIDO {qtd}x com os mesmos parâmetros: {_compacto(texto)}")
+        for texto, qtd in n_mais_1:
+            linhas.append(f"  POSSÍVEL N+1 ({qtd}x): {_compacto(texto)}")
+        logger.warning("\n".join(linhas))
@@ -0,0 +1,90 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+
+class CacheLRU:
+    """
+    Cache em memória com tamanho máximo (descarta o menos usado) e TTL.
+
+    Seguro para uso a partir de várias threads (as rotas síncronas do
+    FastAPI rodam em um threadpool). Cada processo tem o seu cache; entre
+    processos a consistência é garantida apenas pelo TTL.
+    """
+
+    def __init__(self, max_itens: int, ttl_segundos: float):
+        self.max_itens = max_itens
+        self.ttl_segundos = ttl_segundos
+        self._itens: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        # incrementada a cada invalidação: um valor lido do banco antes de
+        # uma invalidação não pode ser gravado depois dela
+        self._geracao = 0
+        self.hits = 0
+        self.misses = 0
+        self.expirados = 0
+        self.descartados = 0
+        self.invalidacoes = 0
+
+    def geracao(self) -> int:
+        return self._geracao
+
+    def obter(self, chave: Hashable) -> Optional[Any]:
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                self.misses += 1
+                return None
+
+            valor, expira_em = item
+            if time.monotonic() > expira_em:
+                del self._itens[chave]
+                self.expirados += 1
+                self.misses += 1
+                return None
+
+            self._itens.move_to_end(chave)
+            self.hits += 1
+            return valor
+
+    def definir(self, chave: Hashable, valor: Any, geracao: Optional[int] = None) -> None:
+        """
+        Grava o valor. Se `geracao` for informada e tiver havido uma
+        invalidação desde então, o valor é considerado velho e ignorado.
+        """
+        if self.max_itens <= 0:
+            return
+        with self._lock:
+            if geracao is not None and geracao != self._geracao:
+                return
+            self._itens[chave] = (valor, time.monotonic() + self.ttl_segundos)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.descartados += 1
+
+    def invalidar(self, chave: Hashable) -> None:
+        with self._lock:
+            self._geracao += 1
+            self.invalidacoes += 1
+            self._itens.pop(chave, None)
+
+    def limpar(self) -> None:
+        with self._lock:
+            self._geracao += 1
+            self._itens.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        consultas = self.hits + self.misses
+        return {
+            "max_itens": self.max_itens,
+            "ttl_segundos": self.ttl_segundos,
+            "itens": len(self._itens),
+            "hits": self.hits,
+            "misses": self.misses,
+            "expirados": self.expirados,
+            "descartados": self.descartados,
+            "invalidacoes": self.invalidacoes,
+            "taxa_acerto": self.hits / consultas if consultas else 0.0,
+        }
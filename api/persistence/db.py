@@ -1,10 +1,28 @@
 import os
+import re
+import time
+import asyncio
+import threading
+import logging
+import itertools
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from contextlib import contextmanager
+from contextlib import contextmanager, asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple, Union
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine, Connection
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncConnection
+
+from api import metricas
+from api.perfil_consultas import registrar_comando
+from api.leitura_propria import cliente_escreveu_recentemente, estado_atual
+from api.persistence.cache_lru import CacheLRU
+
+
+logger = logging.getLogger(__name__)
 
 
 # Carrega .env a partir da raiz do projeto
@@ -13,27 +31,302 @@ ENV_PATH = BASE_DIR / ".env"
 load_dotenv(ENV_PATH)
 
 
-def get_database_url() -> str:
+def get_database_url(driver: str = "mysqlconnector", host: Optional[str] = None, port: Optional[str] = None) -> str:
     user = os.getenv("DB_USER")
     password = os.getenv("DB_PASSWORD")
-    host = os.getenv("DB_HOST", "localhost")
-    port = os.getenv("DB_PORT", "3306")
+    host = host or os.getenv("DB_HOST", "localhost")
+    port = port or os.getenv("DB_PORT", "3306")
     db = os.getenv("DB_NAME")
 
     if not all([user, password, db]):
         raise RuntimeError("Variáveis de ambiente do banco não configuradas corretamente.")
 
     # usamos mysql+mysqlconnector, mas continua tudo SQL puro
-    return f"mysql+mysqlconnector://{user}:{password}@{host}:{port}/{db}"
+    return f"mysql+{driver}://{user}:{password}@{host}:{port}/{db}"
 
 
-DATABASE_URL = get_database_url()
+class Replica:
+    """
+    Réplica de leitura do MySQL, com pool próprio. A situação (saudável ou
+    não, atraso) é atualizada pelo MonitorReplicas; até a primeira
+    verificação a réplica não recebe leituras.
+    """
+
+    def __init__(self, nome: str, eng: Engine):
+        self.nome = nome
+        self.engine = eng
+        self.saudavel = False
+        self.atraso_segundos: Optional[float] = None
+        self.erro: Optional[str] = None
+
+    def situacao(self) -> dict:
+        return {
+            "nome": self.nome,
+            "saudavel": self.saudavel,
+            "atraso_segundos": self.atraso_segundos,
+            "erro": self.erro,
+        }
+
+
+def _hosts_replicas() -> List[Tuple[str, Optional[str]]]:
+    """DB_REPLICA_HOSTS=host[:porta],... (mesmo usuário, senha e banco do primário)."""
+    hosts = []
+    for item in os.getenv("DB_REPLICA_HOSTS", "").split(","):
+        item = item.strip()
+        if item:
+            host, _, porta = item.partition(":")
+            hosts.append((host, porta or None))
+    return hosts
+
+
+# ---------------------------------------------------------------------------
+# Métricas: duração de cada comando SQL (eventos do cursor), espera por
+# conexão do pool e ocupação do pool. Ver api/metricas.py e, para o perfil
+# por requisição, api/perfil_consultas.py.
+# ---------------------------------------------------------------------------
+
+_RE_TABELA = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+`?(\w+)", re.IGNORECASE)
+
+
+@lru_cache(maxsize=512)
+def _rotulo_sql(statement: str) -> str:
+    """
+    Rótulo do comando para as métricas: tipo + primeira tabela (ex.:
+    "UPDATE saldo_carteira"). Os textos SQL são constantes dos
+    repositórios, então o rótulo é calculado uma vez por texto.
+    """
+    palavras = statement.split(None, 1)
+    comando = palavras[0].upper() if palavras else "?"
+    tabela = _RE_TABELA.search(statement)
+    return f"{comando} {tabela.group(1)}" if tabela else comando
+
+
+def _instrumentar(eng: Engine, nome: str) -> None:
+    @event.listens_for(eng, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        context._inicio_metricas = time.perf_counter()
+
+    @event.listens_for(eng, "after_cursor_execute")
+    def _depois(conn, cursor, statement, parameters, context, executemany):
+        duracao = time.perf_counter() - context._inicio_metricas
+        metricas.sql_duracao.observar(duracao, nome, _rotulo_sql(statement))
+        # perfil da requisição (só quando PERFIL_CONSULTAS_ATIVO)
+        registrar_comando(conn, statement, parameters, duracao)
+
+    @event.listens_for(eng, "handle_error")
+    def _erro(contexto):
+        if contexto.statement:
+            metricas.sql_erros.incrementar(nome, _rotulo_sql(contexto.statement))
+
+
+# ---------------------------------------------------------------------------
+# Engines criadas no primeiro uso: importar este módulo (ou api.main) não
+# carrega os drivers do MySQL nem abre pool. O lifespan da API pode
+# pré-aquecer os pools (DB_POOL_PREAQUECER_CONEXOES).
+# ---------------------------------------------------------------------------
+
+_engine: Optional[Engine] = None
+_async_engine: Optional[AsyncEngine] = None
+_replicas: Optional[List[Replica]] = None
+_lock_engines = threading.Lock()
+
+
+def get_engine() -> Engine:
+    """Engine síncrona do primário (driver mysqlconnector)."""
+    global _engine
+    if _engine is None:
+        with _lock_engines:
+            if _engine is None:
+                eng = create_engine(get_database_url(), future=True, pool_pre_ping=True)
+                _instrumentar(eng, "sync")
+                _engine = eng
+    return _engine
+
+
+def get_async_engine() -> AsyncEngine:
+    """Engine assíncrona do primário (driver aiomysql) para as rotas async; o SQL é o mesmo."""
+    global _async_engine
+    if _async_engine is None:
+        with _lock_engines:
+            if _async_engine is None:
+                eng = create_async_engine(
+                    get_database_url(os.getenv("DB_ASYNC_DRIVER", "aiomysql")),
+                    pool_pre_ping=True,
+                )
+                _instrumentar(eng.sync_engine, "async")
+                _async_engine = eng
+    return _async_engine
+
+
+def get_replicas() -> List[Replica]:
+    """Réplicas de leitura de DB_REPLICA_HOSTS (lista vazia se não houver)."""
+    global _replicas
+    if _replicas is None:
+        with _lock_engines:
+            if _replicas is None:
+                criadas = []
+                for i, (host, porta) in enumerate(_hosts_replicas(), 1):
+                    replica = Replica(f"replica{i}", create_engine(
+                        get_database_url(host=host, port=porta),
+                        future=True,
+                        pool_pre_ping=True,
+                        pool_size=int(os.getenv("DB_REPLICA_POOL_TAMANHO", "5")),
+                    ))
+                    _instrumentar(replica.engine, replica.nome)
+                    criadas.append(replica)
+                _replicas = criadas
+    return _replicas
+
+
+def preaquecer_pool(quantidade: int) -> None:
+    """
+    Abre `quantidade` conexões do pool síncrono e as devolve, para que as
+    primeiras requisições não paguem a conexão (TCP, TLS, autenticação).
+    O pool guarda até pool_size conexões ociosas; acima disso, as
+    excedentes são fechadas ao voltar.
+    """
+    conexoes = []
+    try:
+        for _ in range(quantidade):
+            conexoes.append(get_engine().connect())
+    finally:
+        for conn in conexoes:
+            conn.close()
+
+
+async def preaquecer_pool_async(quantidade: int) -> None:
+    """Versão assíncrona de preaquecer_pool (conexões abertas em paralelo)."""
+    eng = get_async_engine()
+    resultados = await asyncio.gather(*(eng.connect() for _ in range(quantidade)), return_exceptions=True)
+    for conn in resultados:
+        if not isinstance(conn, BaseException):
+            await conn.close()
+    erros = [r for r in resultados if isinstance(r, BaseException)]
+    if erros:
+        raise erros[0]
+
+
+async def fechar_engines() -> None:
+    """Fecha os pools das engines já criadas (desligamento da API)."""
+    if _async_engine is not None:
+        await _async_engine.dispose()
+    if _engine is not None:
+        _engine.dispose()
+    for replica in _replicas or []:
+        replica.engine.dispose()
+
+
+def _ocupacao_pool(leitura: str):
+    def ler():
+        # só as engines já criadas: a coleta não cria pools
+        engines = []
+        if _engine is not None:
+            engines.append(("sync", _engine))
+        if _async_engine is not None:
+            engines.append(("async", _async_engine.sync_engine))
+        engines.extend((r.nome, r.engine) for r in _replicas or [])
+        for nome, eng in engines:
+            valor = getattr(eng.pool, leitura, None)
+            if valor is not None:
+                yield (nome,), valor()
+    return ler
+
+
+metricas.registro.registrar(metricas.Medidor(
+    "carteira_pool_conexoes_em_uso", "Conexões emprestadas pelo pool agora.",
+    ("engine",), _ocupacao_pool("checkedout"),
+))
+metricas.registro.registrar(metricas.Medidor(
+    "carteira_pool_overflow", "Conexões além de pool_size (negativo: vagas ainda não abertas).",
+    ("engine",), _ocupacao_pool("overflow"),
+))
+metricas.registro.registrar(metricas.Medidor(
+    "carteira_pool_tamanho", "pool_size configurado.",
+    ("engine",), _ocupacao_pool("size"),
+))
+
+
+def _conectar() -> Connection:
+    inicio = time.perf_counter()
+    conn = get_engine().connect()
+    metricas.pool_espera.observar(time.perf_counter() - inicio, "sync")
+    return conn
+
+
+def _conectar_replica(replica: Replica) -> Connection:
+    inicio = time.perf_counter()
+    conn = replica.engine.connect()
+    metricas.pool_espera.observar(time.perf_counter() - inicio, replica.nome)
+    return conn
+
+
+async def _conectar_async() -> AsyncConnection:
+    inicio = time.perf_counter()
+    conn = await get_async_engine().connect()
+    metricas.pool_espera.observar(time.perf_counter() - inicio, "async")
+    return conn
+
+
+def agora() -> datetime:
+    """
+    Momento da operação, gravado explicitamente em data_operacao para que a
+    resposta possa ser montada sem reler a linha. Sem frações de segundo,
+    como uma coluna DATETIME.
+    """
+    return datetime.now().replace(microsecond=0)
+
+
+_APOS_COMMIT = "apos_commit"
+
+
+def apos_commit(conn: Union[Connection, AsyncConnection], acao: Callable[[], None]) -> None:
+    """
+    Agenda `acao` para rodar somente depois do commit da transação de `conn`
+    (ex.: invalidar um cache). Em caso de rollback a ação é descartada.
+    """
+    conn.info.setdefault(_APOS_COMMIT, []).append(acao)
+
+
+def _executar_apos_commit(conn: Union[Connection, AsyncConnection]) -> None:
+    for acao in conn.info.pop(_APOS_COMMIT, []):
+        acao()
+
+
+_ANTES_DO_COMMIT = "antes_do_commit"
+
+
+def antes_do_commit(
+    conn: Union[Connection, AsyncConnection],
+    chave: str,
+    criar: Callable[[], Callable[[], Any]],
+) -> Callable[[], Any]:
+    """
+    Ação que roda na transação de `conn` logo antes do commit, uma por
+    chave: a primeira chamada cria a ação com criar(), as seguintes
+    devolvem a mesma (que pode acumular dados, ex.: as carteiras
+    alteradas). Na conexão assíncrona, a ação devolve um awaitable. Em
+    caso de rollback a ação é descartada.
+    """
+    acoes: Dict[str, Callable[[], Any]] = conn.info.setdefault(_ANTES_DO_COMMIT, {})
+    if chave not in acoes:
+        acoes[chave] = criar()
+    return acoes[chave]
 
-engine: Engine = create_engine(
-    DATABASE_URL,
-    future=True,
-    pool_pre_ping=True,
-)
+
+def _executar_antes_do_commit(conn: Connection) -> None:
+    for acao in conn.info.pop(_ANTES_DO_COMMIT, {}).values():
+        acao()
+
+
+async def _executar_antes_do_commit_async(conn: AsyncConnection) -> None:
+    for acao in conn.info.pop(_ANTES_DO_COMMIT, {}).values():
+        await acao()
+
+
+def _descartar_apos_commit(conn: Union[Connection, AsyncConnection]) -> None:
+    # conn.info pertence à conexão do pool: não pode sobrar nada para o próximo uso
+    conn.info.pop(_APOS_COMMIT, None)
+    conn.info.pop(_ANTES_DO_COMMIT, None)
 
 
 @contextmanager
@@ -42,13 +335,212 @@ def get_connection() -> Connection:
     Entrega uma conexão do SQLAlchemy já com transação aberta.
     Faz commit automático se der tudo certo, rollback se der erro.
     """
-    conn: Connection = engine.connect()
+    conn: Connection = _conectar()
     trans = conn.begin()
     try:
         yield conn
+        _executar_antes_do_commit(conn)
         trans.commit()
+        _executar_apos_commit(conn)
     except Exception:
         trans.rollback()
         raise
     finally:
-        conn.close()
\ No newline at end of file
+        _descartar_apos_commit(conn)
+        conn.close()
+
+
+@asynccontextmanager
+async def get_async_connection() -> AsyncIterator[AsyncConnection]:
+    """
+    Versão assíncrona de get_connection: o I/O com o MySQL não bloqueia
+    o event loop. Commit automático se der tudo certo, rollback se der erro.
+    """
+    conn: AsyncConnection = await _conectar_async()
+    trans = await conn.begin()
+    try:
+        yield conn
+        await _executar_antes_do_commit_async(conn)
+        await trans.commit()
+        _executar_apos_commit(conn)
+    except Exception:
+        await trans.rollback()
+        raise
+    finally:
+        _descartar_apos_commit(conn)
+        await conn.close()
+
+
+@contextmanager
+def usar_conexao(conn: Optional[Connection] = None) -> Iterator[Connection]:
+    """
+    Usa a conexão recebida (da unidade de trabalho da requisição) sem
+    commit nem rollback; sem conexão, abre uma transação própria.
+    """
+    if conn is not None:
+        yield conn
+    else:
+        with get_connection() as nova:
+            yield nova
+
+
+@asynccontextmanager
+async def usar_conexao_async(conn: Optional[AsyncConnection] = None) -> AsyncIterator[AsyncConnection]:
+    """Versão assíncrona de usar_conexao."""
+    if conn is not None:
+        yield conn
+    else:
+        async with get_async_connection() as nova:
+            yield nova
+
+
+# ---------------------------------------------------------------------------
+# Réplicas de leitura (DB_REPLICA_HOSTS). Consultas somente leitura fora de
+# uma unidade de trabalho vão para uma réplica saudável; escritas e tudo o
+# que roda dentro de uma transação de movimentação ficam no primário.
+# ---------------------------------------------------------------------------
+
+# Leia-suas-escritas: carteiras com escrita recente neste processo leem do
+# primário por DB_REPLICA_LEITURA_PROPRIA_SEGUNDOS (0 desativa). Entre
+# processos, o cookie de api/leitura_propria.py faz o mesmo por cliente.
+escritas_recentes = CacheLRU(
+    max_itens=int(os.getenv("DB_REPLICA_LEITURA_PROPRIA_MAX_ITENS", "100000")),
+    ttl_segundos=float(os.getenv("DB_REPLICA_LEITURA_PROPRIA_SEGUNDOS", "5")),
+)
+
+_proxima_replica = itertools.count()
+
+
+def registrar_escrita(conn: Union[Connection, AsyncConnection], endereco_carteira: str) -> None:
+    """
+    Após o commit de uma escrita na carteira, as leituras dela vão para o
+    primário por alguns segundos, para não ler da réplica um dado anterior
+    à própria escrita: neste processo pela carteira e, nos demais, pelo
+    cookie que a resposta da requisição leva. Sem réplicas, não faz nada.
+    """
+    if escritas_recentes.ttl_segundos > 0 and get_replicas():
+        estado = estado_atual()
+
+        def marcar():
+            escritas_recentes.definir(endereco_carteira, True)
+            if estado is not None:
+                estado.escreveu = True
+
+        apos_commit(conn, marcar)
+
+
+def _escolher_replica(endereco_carteira: Optional[str]) -> Optional[Replica]:
+    """Réplica saudável (em rodízio) ou None para ler do primário."""
+    if cliente_escreveu_recentemente():
+        return None
+    if endereco_carteira is not None and escritas_recentes.obter(endereco_carteira) is not None:
+        return None
+    saudaveis = [r for r in get_replicas() if r.saudavel]
+    if not saudaveis:
+        return None
+    return saudaveis[next(_proxima_replica) % len(saudaveis)]
+
+
+@contextmanager
+def usar_conexao_leitura(
+    conn: Optional[Connection] = None,
+    endereco_carteira: Optional[str] = None,
+) -> Iterator[Connection]:
+    """
+    Conexão para consultas somente leitura. Com a conexão recebida (da
+    unidade de trabalho), usa ela: a leitura faz parte da transação, no
+    primário. Sem ela, usa uma réplica saudável, exceto se a carteira teve
+    escrita recente; sem réplica disponível, uma transação no primário.
+    """
+    if conn is not None:
+        yield conn
+        return
+
+    replica = _escolher_replica(endereco_carteira)
+    nova: Optional[Connection] = None
+    if replica is not None:
+        try:
+            nova = _conectar_replica(replica)
+        except Exception as e:
+            # réplica caiu entre duas verificações: sai do rodízio até a próxima
+            replica.saudavel = False
+            replica.erro = str(e)
+            logger.warning("Réplica %s indisponível, lendo do primário: %s", replica.nome, e)
+
+    if nova is None:
+        metricas.leituras.incrementar("primario")
+        with get_connection() as primario:
+            yield primario
+        return
+
+    metricas.leituras.incrementar(replica.nome)
+    try:
+        yield nova
+    finally:
+        nova.close()
+
+
+class UnidadeDeTrabalho:
+    """
+    Uma conexão e uma transação para a requisição inteira.
+    Serviços e repositórios compartilham a mesma conexão, e o serviço
+    chama commit() ao final da operação. O que não for confirmado é
+    desfeito em close().
+    """
+
+    def __init__(self):
+        self.conn: Connection = _conectar()
+        self._trans = self.conn.begin()
+
+    def commit(self) -> None:
+        _executar_antes_do_commit(self.conn)
+        self._trans.commit()
+        _executar_apos_commit(self.conn)
+
+    def close(self) -> None:
+        try:
+            if self._trans.is_active:
+                self._trans.rollback()
+        finally:
+            _descartar_apos_commit(self.conn)
+            self.conn.close()
+
+
+class AsyncUnidadeDeTrabalho:
+    """Versão assíncrona da UnidadeDeTrabalho (engine aiomysql)."""
+
+    async def iniciar(self) -> "AsyncUnidadeDeTrabalho":
+        self.conn: AsyncConnection = await _conectar_async()
+        self._trans = await self.conn.begin()
+        return self
+
+    async def commit(self) -> None:
+        await _executar_antes_do_commit_async(self.conn)
+        await self._trans.commit()
+        _executar_apos_commit(self.conn)
+
+    async def close(self) -> None:
+        try:
+            if self._trans.is_active:
+                await self._trans.rollback()
+        finally:
+            _descartar_apos_commit(self.conn)
+            await self.conn.close()
+
+
+def get_unidade_de_trabalho() -> Iterator[UnidadeDeTrabalho]:
+    """Dependência FastAPI: uma unidade de trabalho por requisição."""
+    uow = UnidadeDeTrabalho()
+    try:
+        yield uow
+    finally:
+        uow.close()
+
+
+async def get_async_unidade_de_trabalho() -> AsyncIterator[AsyncUnidadeDeTrabalho]:
+    """Dependência FastAPI (rotas async): uma unidade de trabalho por requisição."""
+    uow = await AsyncUnidadeDeTrabalho().iniciar()
+    try:
+        yield uow
+    finally:
+        await uow.close()
@@ -0,0 +1,243 @@
+import os
+import time
+import queue
+import asyncio
+import logging
+import threading
+from concurrent.futures import Future, InvalidStateError
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Any, List, Optional
+
+from api import metricas
+from api.leitura_propria import marcar_escrita
+from api.persistence.db import get_connection
+from api.persistence.repositories.movimentacao_repository import MovimentacaoRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Pedido:
+    item: Dict[str, Any]
+    futuro: Future = field(default_factory=Future)
+    enfileirado_em: float = field(default_factory=time.monotonic)
+
+
+_PARAR = object()
+
+
+# Fila em uso no processo (a do lifespan), lida pelo medidor do /metrics
+_fila_atual: Optional["FilaDepositos"] = None
+
+
+def _tamanho_fila():
+    if _fila_atual is not None:
+        yield (), _fila_atual._fila.qsize()
+
+
+metricas.registro.registrar(metricas.Medidor(
+    "carteira_fila_depositos_na_fila", "Depósitos esperando na fila agora.", (), _tamanho_fila,
+))
+
+
+class FilaIndisponivel(RuntimeError):
+    """A fila não está gravando (thread parada) ou não respondeu a tempo."""
+
+
+def _falhar(pedido: _Pedido, erro: Exception) -> None:
+    # o chamador pode ter desistido (cancelado) ao mesmo tempo
+    try:
+        pedido.futuro.set_exception(erro)
+    except InvalidStateError:
+        pass
+
+
+class FilaDepositos:
+    """
+    Commit em grupo dos depósitos: requisições simultâneas entram em uma
+    fila e uma thread grava todas juntas, em uma única transação, quando
+    o grupo chega a tamanho_maximo itens ou o primeiro da fila espera
+    espera_maxima_ms, o que vier primeiro. Um fsync do MySQL confirma o
+    grupo inteiro em vez de um depósito.
+
+    Cada chamador continua recebendo o seu id e a sua movimentação; um
+    depósito recusado (carteira bloqueada, moeda inválida) não afeta os
+    demais do grupo. Uma falha do banco derruba o grupo inteiro.
+
+    Quem espera é a rota assíncrona (no event loop, sem ocupar uma thread
+    do servidor), então o grupo pode crescer até tamanho_maximo. Ninguém
+    espera mais que tempo_maximo_segundos: sem resposta a tempo, ou com a
+    thread parada, o depósito falha com FilaIndisponivel (HTTP 503).
+    """
+
+    def __init__(self, tamanho_maximo: int, espera_maxima_ms: float, tempo_maximo_segundos: float = 10):
+        self.tamanho_maximo = max(1, tamanho_maximo)
+        self.espera_maxima_ms = max(0.0, espera_maxima_ms)
+        self.tempo_maximo_segundos = tempo_maximo_segundos
+        self._fila: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._ativa = False
+        self._grupo_atual: List[_Pedido] = []
+
+        self._lock = threading.Lock()
+        self.grupos = 0
+        self.depositos = 0
+        self.falhas = 0
+        self.fechados_por_tamanho = 0
+        self.fechados_por_tempo = 0
+
+    @classmethod
+    def a_partir_do_env(cls) -> "FilaDepositos":
+        return cls(
+            tamanho_maximo=int(os.getenv("DEPOSITO_GRUPO_TAMANHO_MAXIMO", "100")),
+            espera_maxima_ms=float(os.getenv("DEPOSITO_GRUPO_ESPERA_MAXIMA_MS", "5")),
+            tempo_maximo_segundos=float(os.getenv("DEPOSITO_GRUPO_TEMPO_MAXIMO_SEGUNDOS", "10")),
+        )
+
+    def iniciar(self) -> None:
+        global _fila_atual
+        _fila_atual = self
+        self._ativa = True
+        self._thread = threading.Thread(target=self._executar, name="fila-depositos", daemon=True)
+        self._thread.start()
+
+    def parar(self) -> None:
+        """Grava o que já está na fila e encerra a thread."""
+        self._ativa = False
+        self._fila.put(_PARAR)
+        if self._thread is not None:
+            self._thread.join()
+
+    async def depositar(self, endereco_carteira: str, codigo_moeda: str, valor: Decimal) -> Dict[str, Any]:
+        """
+        Enfileira o depósito e espera o commit do grupo sem bloquear o event
+        loop. Retorna a movimentação gravada; ValueError se o depósito foi
+        recusado (carteira inexistente ou bloqueada, moeda inválida) e
+        FilaIndisponivel se a fila não gravou a tempo.
+        """
+        if not self._ativa or self._thread is None or not self._thread.is_alive():
+            raise FilaIndisponivel("Fila de depósitos indisponível")
+        pedido = _Pedido({
+            "endereco_carteira": endereco_carteira,
+            "codigo_moeda": codigo_moeda,
+            "valor": valor,
+        })
+        self._fila.put(pedido)
+        # asyncio.wait não cancela o futuro no timeout: quem decide é o código abaixo
+        resultado = asyncio.wrap_future(pedido.futuro)
+        await asyncio.wait({resultado}, timeout=self.tempo_maximo_segundos)
+        if not resultado.done():
+            # Ainda na fila: desiste, e a thread descarta o pedido sem gravar
+            if pedido.futuro.cancel():
+                raise FilaIndisponivel("Fila de depósitos não respondeu a tempo; o depósito não foi gravado")
+            # Já na transação do grupo: espera o resultado mais um prazo
+            await asyncio.wait({resultado}, timeout=self.tempo_maximo_segundos)
+            if not resultado.done():
+                raise FilaIndisponivel(
+                    "Fila de depósitos não respondeu a tempo; o depósito pode ter sido gravado"
+                )
+        row = resultado.result()
+        # gravado pela thread da fila, fora do contexto da requisição
+        marcar_escrita()
+        return row
+
+    def _executar(self) -> None:
+        try:
+            self._laco()
+        except BaseException:
+            logger.exception("Thread da fila de depósitos encerrada por erro")
+            raise
+        finally:
+            # Nada fica esperando uma thread que não existe mais
+            self._ativa = False
+            erro = FilaIndisponivel("Fila de depósitos encerrada")
+            for pedido in self._grupo_atual:
+                _falhar(pedido, erro)
+            while True:
+                try:
+                    pedido = self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if pedido is not _PARAR:
+                    _falhar(pedido, erro)
+
+    def _laco(self) -> None:
+        parar = False
+        while not parar:
+            primeiro = self._fila.get()
+            if primeiro is _PARAR:
+                break
+
+            grupo: List[_Pedido] = [primeiro]
+            prazo = primeiro.enfileirado_em + self.espera_maxima_ms / 1000
+            while len(grupo) < self.tamanho_maximo:
+                restante = prazo - time.monotonic()
+                try:
+                    pedido = self._fila.get(timeout=restante) if restante > 0 else self._fila.get_nowait()
+                except queue.Empty:
+                    break
+                if pedido is _PARAR:
+                    parar = True
+                    break
+                grupo.append(pedido)
+
+            # pedidos cancelados (o chamador desistiu) não são gravados
+            self._grupo_atual = [p for p in grupo if p.futuro.set_running_or_notify_cancel()]
+            if self._grupo_atual:
+                self._gravar(self._grupo_atual)
+            self._grupo_atual = []
+
+    def _gravar(self, grupo: List[_Pedido]) -> None:
+        inicio = time.monotonic()
+        try:
+            # Transação própria; com a conexão recebida o repositório grava
+            # o grupo todo nela e propaga erros do banco em vez de recusar itens
+            with get_connection() as conn:
+                rows = MovimentacaoRepository(conn).realizar_depositos_lote([p.item for p in grupo])
+        except Exception as e:
+            logger.exception("Falha ao gravar grupo de %d depósitos", len(grupo))
+            metricas.fila_falhas.incrementar()
+            with self._lock:
+                self.falhas += 1
+            for pedido in grupo:
+                pedido.futuro.set_exception(e)
+            return
+
+        por_tamanho = len(grupo) >= self.tamanho_maximo
+        with self._lock:
+            self.grupos += 1
+            self.depositos += len(grupo)
+            if por_tamanho:
+                self.fechados_por_tamanho += 1
+            else:
+                self.fechados_por_tempo += 1
+        metricas.fila_grupos.incrementar("tamanho" if por_tamanho else "tempo")
+        metricas.fila_tamanho_grupo.observar(len(grupo))
+        for pedido in grupo:
+            metricas.fila_espera.observar(inicio - pedido.enfileirado_em)
+
+        for pedido, row in zip(grupo, rows):
+            if row.pop("sucesso"):
+                pedido.futuro.set_result(row)
+            else:
+                pedido.futuro.set_exception(ValueError(row["erro"]))
+
+    def estatisticas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "ativa": self._ativa,
+                "tamanho_maximo": self.tamanho_maximo,
+                "espera_maxima_ms": self.espera_maxima_ms,
+                "tempo_maximo_segundos": self.tempo_maximo_segundos,
+                "thread_viva": self._thread is not None and self._thread.is_alive(),
+                "na_fila": self._fila.qsize(),
+                "grupos": self.grupos,
+                "depositos": self.depositos,
+                "falhas": self.falhas,
+                "fechados_por_tamanho": self.fechados_por_tamanho,
+                "fechados_por_tempo": self.fechados_por_tempo,
+                "tamanho_grupo": metricas.fila_tamanho_grupo.resumo(),
+                "espera_fila_segundos": metricas.fila_espera.resumo(),
+            }
@@ -1,11 +1,234 @@
 import os
 import secrets
 import hashlib
-from typing import Dict, Any, Optional, List
+from datetime import datetime
+from decimal import Decimal
+from functools import lru_cache
+from typing import Callable, Dict, Any, Iterator, Optional, List, Tuple
 
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql.elements import TextClause
 
-from api.persistence.db import get_connection
+from api.persistence.db import (
+    usar_conexao,
+    usar_conexao_async,
+    usar_conexao_leitura,
+    apos_commit,
+    agora,
+    registrar_escrita,
+)
+from api.persistence.cache_lru import CacheLRU
+from api.persistence.repositories.moeda_repository import MoedaRepository, AsyncMoedaRepository
+from api.persistence.repositories.saldo_repository import (
+    carteiras_fragmentadas,
+    arredondar,
+    registrar_alteracao_saldo,
+)
+
+
+# Cache do hash da chave privada, consultado antes do banco na validação
+# da chave. O hash nunca muda; o status não fica em cache porque um
+# bloqueio precisa valer na hora em todos os processos.
+carteira_cache = CacheLRU(
+    max_itens=int(os.getenv("CARTEIRA_CACHE_MAX_ITENS", "100000")),
+    ttl_segundos=float(os.getenv("CARTEIRA_CACHE_TTL_SEGUNDOS", "30")),
+)
+
+
+# SQL compartilhado entre a versão síncrona e a assíncrona do repositório
+_SQL_INSERIR_CARTEIRA = text("""
+    INSERT INTO carteira (endereco_carteira, hash_chave_privada)
+    VALUES (:endereco, :hash_privada)
+""")
+
+_SQL_BUSCAR_CARTEIRA = text("""
+    SELECT endereco_carteira,
+           data_criacao,
+           status,
+           hash_chave_privada
+      FROM carteira
+     WHERE endereco_carteira = :endereco
+""")
+
+# Listagem paginada por chave (data_criacao, endereco_carteira): cada página
+# continua do último item da anterior pelos índices idx_carteira_criacao /
+# idx_carteira_status_criacao, sem OFFSET e sem ler a tabela inteira.
+_SQL_LISTAR_CARTEIRAS = """
+    SELECT endereco_carteira,
+           data_criacao,
+           status
+      FROM carteira
+     WHERE {filtros}
+     ORDER BY data_criacao, endereco_carteira
+     LIMIT :limite
+"""
+
+# Estimativa do otimizador (EXPLAIN) para o total da listagem; não percorre as linhas
+_SQL_ESTIMAR_CARTEIRAS = """
+    EXPLAIN SELECT endereco_carteira
+      FROM carteira
+     WHERE {filtros}
+"""
+
+_SQL_ATUALIZAR_STATUS = text("""
+    UPDATE carteira
+       SET status = :status
+     WHERE endereco_carteira = :endereco
+""")
+
+_SQL_ATUALIZAR_SLOTS_SALDO = text("""
+    UPDATE carteira
+       SET slots_saldo = :slots
+     WHERE endereco_carteira = :endereco
+""")
+
+# Só as moedas que a carteira já movimentou têm linha em saldo_carteira
+# (criada no primeiro crédito); as demais vêm do catálogo com saldo zero.
+# O saldo de cada moeda é a soma dos seus slots.
+_SQL_BUSCAR_SALDOS = text("""
+    SELECT codigo_moeda,
+           SUM(saldo) AS saldo
+      FROM saldo_carteira
+     WHERE endereco_carteira = :endereco
+     GROUP BY codigo_moeda
+""")
+
+# Versão do saldo junto com a carteira: o mesmo comando é a checagem de
+# existência de GET /saldos. Sem linha em versao_saldo (nenhuma alteração
+# de saldo ainda), a versão é 0.
+_SQL_BUSCAR_VERSAO_SALDO = text("""
+    SELECT c.slots_saldo,
+           COALESCE(v.versao, 0) AS versao
+      FROM carteira c
+      LEFT JOIN versao_saldo v
+        ON v.endereco_carteira = c.endereco_carteira
+     WHERE c.endereco_carteira = :endereco
+""")
+
+# Saldos diferentes de zero de várias carteiras de uma vez (avaliação)
+_SQL_BUSCAR_SALDOS_LOTE = text("""
+    SELECT endereco_carteira,
+           codigo_moeda,
+           SUM(saldo) AS saldo
+      FROM saldo_carteira
+     WHERE endereco_carteira IN :enderecos
+     GROUP BY endereco_carteira, codigo_moeda
+    HAVING SUM(saldo) <> 0
+""").bindparams(bindparam("enderecos", expanding=True))
+
+_SQL_BUSCAR_HASH_CHAVE = text("""
+    SELECT hash_chave_privada
+      FROM carteira
+     WHERE endereco_carteira = :endereco
+""")
+
+# Leitura com lock compartilhado: dentro da transação da operação, um
+# bloqueio concorrente espera o commit dela, e a operação seguinte já vê
+# a carteira bloqueada
+_SQL_BUSCAR_STATUS = text("""
+    SELECT status
+      FROM carteira
+     WHERE endereco_carteira = :endereco
+       FOR SHARE
+""")
+
+_SQL_BUSCAR_STATUS_CARTEIRAS = text("""
+    SELECT endereco_carteira, status
+      FROM carteira
+     WHERE endereco_carteira IN :enderecos
+""").bindparams(bindparam("enderecos", expanding=True))
+
+
+@lru_cache(maxsize=16)
+def _sql_inserir_carteiras(qtd: int) -> TextClause:
+    """INSERT de `qtd` carteiras em um único comando."""
+    valores = ",\n        ".join(f"(:e{i}, :h{i}, :data_criacao)" for i in range(qtd))
+    return text(f"""
+    INSERT INTO carteira (endereco_carteira, hash_chave_privada, data_criacao)
+    VALUES
+        {valores}
+""")
+
+
+def _tamanho_bloco_lote() -> int:
+    # Carteiras por transação na criação em lote
+    return max(1, int(os.getenv("CARTEIRA_LOTE_TAMANHO_BLOCO", "1000")))
+
+
+def _filtros_listagem(
+    status: Optional[str],
+    criada_de: Optional[datetime],
+    criada_ate: Optional[datetime],
+    apos: Optional[Tuple[datetime, str]] = None,
+) -> Tuple[str, Dict[str, Any]]:
+    """Cláusula WHERE e parâmetros da listagem de carteiras."""
+    filtros = ["1 = 1"]
+    params: Dict[str, Any] = {}
+    if status is not None:
+        filtros.append("status = :status")
+        params["status"] = status
+    if criada_de is not None:
+        filtros.append("data_criacao >= :criada_de")
+        params["criada_de"] = criada_de
+    if criada_ate is not None:
+        filtros.append("data_criacao <= :criada_ate")
+        params["criada_ate"] = criada_ate
+    if apos is not None:
+        # forma expandida de (data_criacao, endereco) > (:d, :e), que vira range no índice
+        filtros.append(
+            "(data_criacao > :apos_data"
+            " OR (data_criacao = :apos_data AND endereco_carteira > :apos_endereco))"
+        )
+        params["apos_data"], params["apos_endereco"] = apos
+    return " AND ".join(filtros), params
+
+
+def _sql_listar(filtros: str) -> TextClause:
+    return text(_SQL_LISTAR_CARTEIRAS.format(filtros=filtros))
+
+
+def _sql_estimar(filtros: str) -> TextClause:
+    return text(_SQL_ESTIMAR_CARTEIRAS.format(filtros=filtros))
+
+
+def _estimativa_explain(rows) -> int:
+    # uma linha por tabela; rows * filtered% é a estimativa de linhas retornadas
+    plano = rows[0] if rows else None
+    if not plano or plano.get("rows") is None:
+        return 0
+    filtrado = plano.get("filtered")
+    return int(plano["rows"] * (float(filtrado) if filtrado is not None else 100.0) / 100)
+
+
+def _mesclar_saldos(moedas: List[Dict[str, Any]], rows) -> List[Dict[str, Any]]:
+    """Saldo de todas as moedas do catálogo (zero onde não há linha)."""
+    saldos = {r["codigo_moeda"]: r["saldo"] for r in rows}
+    # mesma escala de uma linha gravada com zero (0E-8), tenha linha ou não
+    zero = arredondar(Decimal(0))
+    return [
+        {
+            "codigo_moeda": m["codigo"],
+            "nome_moeda": m["nome"],
+            "tipo_moeda": m["tipo"],
+            "saldo": saldos.get(m["codigo"], zero),
+        }
+        for m in sorted(moedas, key=lambda m: (m["tipo"], m["codigo"]))
+    ]
+
+
+def _hash_chave(chave_privada: str) -> str:
+    return hashlib.sha256(chave_privada.encode()).hexdigest()
+
+
+def _gerar_chaves() -> Tuple[str, str, str]:
+    """Gera (endereco, chave_privada, hash da chave privada)."""
+    private_key_size:int = int(os.getenv("PRIVATE_KEY_SIZE"))
+    public_key_size:int = int(os.getenv("PUBLIC_KEY_SIZE"))
+    chave_privada = secrets.token_hex(private_key_size)      # 32 bytes -> 64 hex chars (configurável depois)
+    endereco = secrets.token_hex(public_key_size)           # "chave pública" simplificada
+    return endereco, chave_privada, _hash_chave(chave_privada)
 
 
 class CarteiraRepository:
@@ -13,48 +236,30 @@ class CarteiraRepository:
     Acesso a dados da carteira usando SQLAlchemy Core + SQL puro.
     """
 
+    def __init__(self, conn: Optional[Connection] = None):
+        # conn: conexão da unidade de trabalho da requisição (opcional)
+        self.conn = conn
+
     def criar(self) -> Dict[str, Any]:
         """
         Gera chave pública, chave privada, salva no banco (apenas hash da privada)
         e retorna os dados da carteira + chave privada em claro.
         """
         # 1) Geração das chaves
-        private_key_size:int = int(os.getenv("PRIVATE_KEY_SIZE"))
-        public_key_size:int = int(os.getenv("PUBLIC_KEY_SIZE"))
-        chave_privada = secrets.token_hex(private_key_size)      # 32 bytes -> 64 hex chars (configurável depois)
-        endereco = secrets.token_hex(public_key_size)           # "chave pública" simplificada
-        hash_privada = hashlib.sha256(chave_privada.encode()).hexdigest()
+        endereco, chave_privada, hash_privada = _gerar_chaves()
 
-        with get_connection() as conn:
+        with usar_conexao(self.conn) as conn:
             # 2) INSERT da carteira
             conn.execute(
-                text("""
-                    INSERT INTO carteira (endereco_carteira, hash_chave_privada)
-                    VALUES (:endereco, :hash_privada)
-                """),
+                _SQL_INSERIR_CARTEIRA,
                 {"endereco": endereco, "hash_privada": hash_privada},
             )
+            registrar_escrita(conn, endereco)
 
-            # 3) Inicializar saldos zerados para todas as moedas
-            conn.execute(
-                text("""
-                    INSERT INTO saldo_carteira (endereco_carteira, codigo_moeda, saldo)
-                    SELECT :endereco, codigo, 0
-                    FROM moeda
-                """),
-                {"endereco": endereco},
-            )
-
-            # 4) SELECT para retornar a carteira criada
+            # 3) SELECT para retornar a carteira criada
+            #    (sem linhas de saldo: elas nascem no primeiro crédito)
             row = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                _SQL_BUSCAR_CARTEIRA,
                 {"endereco": endereco},
             ).mappings().first()
 
@@ -62,95 +267,333 @@ class CarteiraRepository:
         carteira["chave_privada"] = chave_privada
         return carteira
 
+    def criar_lote(self, quantidade: int) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Cria `quantidade` carteiras em blocos de CARTEIRA_LOTE_TAMANHO_BLOCO.
+        Cada bloco usa uma transação (sem conexão da requisição) com um INSERT
+        de várias linhas em carteira.
+        Gera, a cada bloco confirmado, as carteiras criadas com a chave
+        privada em claro; nada além do bloco atual fica em memória.
+        """
+        tamanho = _tamanho_bloco_lote()
+        for inicio in range(0, quantidade, tamanho):
+            yield self._criar_bloco(min(tamanho, quantidade - inicio))
+
+    def _criar_bloco(self, qtd: int) -> List[Dict[str, Any]]:
+        data_criacao = agora()
+        carteiras: List[Dict[str, Any]] = []
+        params: Dict[str, Any] = {"data_criacao": data_criacao}
+        for i in range(qtd):
+            endereco, chave_privada, hash_privada = _gerar_chaves()
+            params[f"e{i}"] = endereco
+            params[f"h{i}"] = hash_privada
+            carteiras.append({
+                "endereco_carteira": endereco,
+                "data_criacao": data_criacao,
+                "status": "ATIVA",
+                "chave_privada": chave_privada,
+            })
+
+        with usar_conexao(self.conn) as conn:
+            conn.execute(_sql_inserir_carteiras(qtd), params)
+            for c in carteiras:
+                registrar_escrita(conn, c["endereco_carteira"])
+
+        return carteiras
+
     def buscar_por_endereco(self, endereco_carteira: str) -> Optional[Dict[str, Any]]:
-        with get_connection() as conn:
+        with usar_conexao_leitura(self.conn, endereco_carteira) as conn:
             row = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                _SQL_BUSCAR_CARTEIRA,
                 {"endereco": endereco_carteira},
             ).mappings().first()
 
         return dict(row) if row else None
 
-    def listar(self) -> List[Dict[str, Any]]:
-        with get_connection() as conn:
+    def listar(
+        self,
+        limite: int,
+        apos: Optional[Tuple[datetime, str]] = None,
+        status: Optional[str] = None,
+        criada_de: Optional[datetime] = None,
+        criada_ate: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Até `limite` carteiras em ordem de (data_criacao, endereco_carteira),
+        começando depois da chave `apos` (a última da página anterior).
+        """
+        filtros, params = _filtros_listagem(status, criada_de, criada_ate, apos)
+        params["limite"] = limite
+        with usar_conexao_leitura(self.conn) as conn:
+            rows = conn.execute(_sql_listar(filtros), params).mappings().all()
+
+        return [dict(r) for r in rows]
+
+    def estimar_total(
+        self,
+        status: Optional[str] = None,
+        criada_de: Optional[datetime] = None,
+        criada_ate: Optional[datetime] = None,
+    ) -> int:
+        """Total aproximado de carteiras com os filtros (estimativa do EXPLAIN)"""
+        filtros, params = _filtros_listagem(status, criada_de, criada_ate)
+        with usar_conexao_leitura(self.conn) as conn:
+            rows = conn.execute(_sql_estimar(filtros), params).mappings().all()
+
+        return _estimativa_explain(rows)
+
+    def buscar_status_lote(self, enderecos: List[str]) -> Dict[str, str]:
+        """Status de várias carteiras em uma consulta; ausentes não aparecem"""
+        if not enderecos:
+            return {}
+        with usar_conexao(self.conn) as conn:
             rows = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                """)
+                _SQL_BUSCAR_STATUS_CARTEIRAS,
+                {"enderecos": sorted(set(enderecos))},
             ).mappings().all()
 
-        return [dict(r) for r in rows]
+        return {r["endereco_carteira"]: r["status"] for r in rows}
 
     def atualizar_status(self, endereco_carteira: str, status: str) -> Optional[Dict[str, Any]]:
-        with get_connection() as conn:
+        with usar_conexao(self.conn) as conn:
             conn.execute(
-                text("""
-                    UPDATE carteira
-                       SET status = :status
-                     WHERE endereco_carteira = :endereco
-                """),
+                _SQL_ATUALIZAR_STATUS,
                 {"status": status, "endereco": endereco_carteira},
             )
+            registrar_escrita(conn, endereco_carteira)
 
             row = conn.execute(
-                text("""
-                    SELECT endereco_carteira,
-                           data_criacao,
-                           status,
-                           hash_chave_privada
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                _SQL_BUSCAR_CARTEIRA,
                 {"endereco": endereco_carteira},
             ).mappings().first()
 
         return dict(row) if row else None
 
+    def definir_slots_saldo(self, endereco_carteira: str, slots: int) -> bool:
+        """
+        Em quantas linhas (slots) o saldo de cada moeda da carteira é
+        dividido. Retorna False se a carteira não existe.
+        """
+        with usar_conexao(self.conn) as conn:
+            result = conn.execute(
+                _SQL_ATUALIZAR_SLOTS_SALDO,
+                {"slots": slots, "endereco": endereco_carteira},
+            )
+            # a lista de carteiras fragmentadas é relida na próxima operação;
+            # a versão do saldo avança ao voltar para um slot (enquanto
+            # fragmentada, a carteira não a atualiza)
+            apos_commit(conn, carteiras_fragmentadas.limpar)
+            registrar_alteracao_saldo(conn, endereco_carteira)
+
+        # o SQLAlchemy conecta ao MySQL com FOUND_ROWS: conta linhas encontradas
+        return result.rowcount > 0
+
     def buscar_saldos(self, endereco_carteira: str) -> List[Dict[str, Any]]:
-        """Retorna todos os saldos da carteira"""
-        with get_connection() as conn:
+        """Retorna os saldos da carteira em todas as moedas do catálogo"""
+        moedas = MoedaRepository(self.conn).listar()
+        with usar_conexao_leitura(self.conn, endereco_carteira) as conn:
             rows = conn.execute(
-                text("""
-                    SELECT sc.codigo_moeda,
-                           m.nome as nome_moeda,
-                           m.tipo as tipo_moeda,
-                           sc.saldo
-                      FROM saldo_carteira sc
-                      JOIN moeda m ON sc.codigo_moeda = m.codigo
-                     WHERE sc.endereco_carteira = :endereco
-                     ORDER BY m.tipo, sc.codigo_moeda
-                """),
+                _SQL_BUSCAR_SALDOS,
                 {"endereco": endereco_carteira},
             ).mappings().all()
 
-        return [dict(r) for r in rows]
+        return _mesclar_saldos(moedas, rows)
 
-    def validar_chave_privada(self, endereco_carteira: str, chave_privada: str) -> bool:
-        """Valida a chave privada comparando o hash"""
-        hash_fornecido = hashlib.sha256(chave_privada.encode()).hexdigest()
-        
-        with get_connection() as conn:
+    def buscar_saldos_versionados(
+        self,
+        endereco_carteira: str,
+        versao_conhecida: Callable[[int], bool],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Versão do saldo e saldos da carteira, lidos na mesma conexão: os
+        saldos nunca são anteriores à versão. None se a carteira não existe.
+        Carteira fragmentada não tem versão (None). Se versao_conhecida(versao)
+        for verdadeiro, os saldos não são lidos (saldos None).
+        """
+        moedas = MoedaRepository(self.conn).listar()
+        with usar_conexao_leitura(self.conn, endereco_carteira) as conn:
             row = conn.execute(
-                text("""
-                    SELECT hash_chave_privada
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                _SQL_BUSCAR_VERSAO_SALDO,
                 {"endereco": endereco_carteira},
             ).mappings().first()
+            if row is None:
+                return None
+
+            versao = row["versao"] if row["slots_saldo"] == 1 else None
+            if versao is not None and versao_conhecida(versao):
+                return {"versao": versao, "saldos": None}
+
+            rows = conn.execute(
+                _SQL_BUSCAR_SALDOS,
+                {"endereco": endereco_carteira},
+            ).mappings().all()
+
+        return {"versao": versao, "saldos": _mesclar_saldos(moedas, rows)}
+
+    def buscar_status(self, endereco_carteira: str) -> Optional[str]:
+        """
+        Status da carteira lido do banco (sem cache), com lock compartilhado
+        até o fim da transação da unidade de trabalho. None se não existe.
+        """
+        with usar_conexao(self.conn) as conn:
+            return conn.execute(
+                _SQL_BUSCAR_STATUS,
+                {"endereco": endereco_carteira},
+            ).scalar()
+
+    def validar_chave_privada(self, endereco_carteira: str, chave_privada: str) -> bool:
+        """Valida a chave privada comparando o hash (consulta o cache antes do banco)"""
+        hash_fornecido = _hash_chave(chave_privada)
+
+        hash_chave = carteira_cache.obter(endereco_carteira)
+        if hash_chave is None:
+            with usar_conexao(self.conn) as conn:
+                hash_chave = conn.execute(
+                    _SQL_BUSCAR_HASH_CHAVE,
+                    {"endereco": endereco_carteira},
+                ).scalar()
+            if hash_chave is None:
+                return False
+            carteira_cache.definir(endereco_carteira, hash_chave)
+
+        return hash_chave == hash_fornecido
+
+
+class AsyncCarteiraRepository:
+    """
+    Versão assíncrona do CarteiraRepository (mesmo SQL, engine aiomysql).
+    """
+
+    def __init__(self, conn: Optional[AsyncConnection] = None):
+        self.conn = conn
+
+    async def criar(self) -> Dict[str, Any]:
+        endereco, chave_privada, hash_privada = _gerar_chaves()
+
+        async with usar_conexao_async(self.conn) as conn:
+            await conn.execute(
+                _SQL_INSERIR_CARTEIRA,
+                {"endereco": endereco, "hash_privada": hash_privada},
+            )
+            registrar_escrita(conn, endereco)
+            row = (await conn.execute(
+                _SQL_BUSCAR_CARTEIRA,
+                {"endereco": endereco},
+            )).mappings().first()
+
+        carteira = dict(row)
+        carteira["chave_privada"] = chave_privada
+        return carteira
+
+    async def buscar_por_endereco(self, endereco_carteira: str) -> Optional[Dict[str, Any]]:
+        async with usar_conexao_async(self.conn) as conn:
+            row = (await conn.execute(
+                _SQL_BUSCAR_CARTEIRA,
+                {"endereco": endereco_carteira},
+            )).mappings().first()
+
+        return dict(row) if row else None
+
+    async def listar(
+        self,
+        limite: int,
+        apos: Optional[Tuple[datetime, str]] = None,
+        status: Optional[str] = None,
+        criada_de: Optional[datetime] = None,
+        criada_ate: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        filtros, params = _filtros_listagem(status, criada_de, criada_ate, apos)
+        params["limite"] = limite
+        async with usar_conexao_async(self.conn) as conn:
+            rows = (await conn.execute(_sql_listar(filtros), params)).mappings().all()
+
+        return [dict(r) for r in rows]
+
+    async def estimar_total(
+        self,
+        status: Optional[str] = None,
+        criada_de: Optional[datetime] = None,
+        criada_ate: Optional[datetime] = None,
+    ) -> int:
+        filtros, params = _filtros_listagem(status, criada_de, criada_ate)
+        async with usar_conexao_async(self.conn) as conn:
+            rows = (await conn.execute(_sql_estimar(filtros), params)).mappings().all()
+
+        return _estimativa_explain(rows)
+
+    async def atualizar_status(self, endereco_carteira: str, status: str) -> Optional[Dict[str, Any]]:
+        async with usar_conexao_async(self.conn) as conn:
+            await conn.execute(
+                _SQL_ATUALIZAR_STATUS,
+                {"status": status, "endereco": endereco_carteira},
+            )
+            registrar_escrita(conn, endereco_carteira)
+            row = (await conn.execute(
+                _SQL_BUSCAR_CARTEIRA,
+                {"endereco": endereco_carteira},
+            )).mappings().first()
+
+        return dict(row) if row else None
+
+    async def buscar_saldos(self, endereco_carteira: str) -> List[Dict[str, Any]]:
+        moedas = await AsyncMoedaRepository(self.conn).listar()
+        async with usar_conexao_async(self.conn) as conn:
+            rows = (await conn.execute(
+                _SQL_BUSCAR_SALDOS,
+                {"endereco": endereco_carteira},
+            )).mappings().all()
+
+        return _mesclar_saldos(moedas, rows)
+
+    async def buscar_status_lote(self, enderecos: List[str]) -> Dict[str, str]:
+        """Status de várias carteiras em uma consulta; ausentes não aparecem"""
+        if not enderecos:
+            return {}
+        async with usar_conexao_async(self.conn) as conn:
+            rows = (await conn.execute(
+                _SQL_BUSCAR_STATUS_CARTEIRAS,
+                {"enderecos": sorted(set(enderecos))},
+            )).mappings().all()
+
+        return {r["endereco_carteira"]: r["status"] for r in rows}
+
+    async def buscar_saldos_lote(self, enderecos: List[str]) -> Dict[str, Dict[str, Decimal]]:
+        """
+        Saldos diferentes de zero de várias carteiras em uma consulta:
+        endereço -> {moeda: saldo}. Carteiras sem saldo não aparecem.
+        """
+        if not enderecos:
+            return {}
+        async with usar_conexao_async(self.conn) as conn:
+            rows = (await conn.execute(
+                _SQL_BUSCAR_SALDOS_LOTE,
+                {"enderecos": sorted(set(enderecos))},
+            )).mappings().all()
+
+        saldos: Dict[str, Dict[str, Decimal]] = {}
+        for r in rows:
+            saldos.setdefault(r["endereco_carteira"], {})[r["codigo_moeda"]] = r["saldo"]
+        return saldos
+
+    async def buscar_status(self, endereco_carteira: str) -> Optional[str]:
+        async with usar_conexao_async(self.conn) as conn:
+            return (await conn.execute(
+                _SQL_BUSCAR_STATUS,
+                {"endereco": endereco_carteira},
+            )).scalar()
+
+    async def validar_chave_privada(self, endereco_carteira: str, chave_privada: str) -> bool:
+        hash_fornecido = _hash_chave(chave_privada)
+
+        hash_chave = carteira_cache.obter(endereco_carteira)
+        if hash_chave is None:
+            async with usar_conexao_async(self.conn) as conn:
+                hash_chave = (await conn.execute(
+                    _SQL_BUSCAR_HASH_CHAVE,
+                    {"endereco": endereco_carteira},
+                )).scalar()
+            if hash_chave is None:
+                return False
+            carteira_cache.definir(endereco_carteira, hash_chave)
 
-        if not row:
-            return False
-        
-        return row["hash_chave_privada"] == hash_fornecido
\ No newline at end of file
+        return hash_chave == hash_fornecido
@@ -1,8 +1,69 @@
 import os
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple
 from sqlalchemy import text
-from api.persistence.db import get_connection
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+from api.persistence.db import usar_conexao, usar_conexao_async, agora
+from api.persistence.repositories.saldo_repository import (
+    SaldoRepository,
+    AsyncSaldoRepository,
+    arredondar,
+)
+
+
+# SQL compartilhado entre a versão síncrona e a assíncrona do repositório
+_SQL_INSERIR_CONVERSAO = text("""
+    INSERT INTO conversao
+        (endereco_carteira, moeda_origem, moeda_destino,
+         valor_origem, valor_destino, cotacao, taxa, data_operacao)
+    VALUES
+        (:endereco, :moeda_origem, :moeda_destino,
+         :valor_origem, :valor_destino, :cotacao, :taxa, :data_operacao)
+""")
+
+_MSG_SALDO_INSUFICIENTE = "Saldo insuficiente na moeda de origem"
+
+
+def _calcular_valores(valor_origem: Decimal, cotacao: Decimal) -> Tuple[Decimal, Decimal]:
+    """Retorna (valor_destino líquido, taxa) da conversão."""
+    taxa_percentual = Decimal(os.getenv("TAXA_CONVERSAO", "0.02"))  # 2% padrão
+
+    # Calcula valor destino e taxa
+    valor_bruto_destino = valor_origem * cotacao
+    taxa = arredondar(valor_bruto_destino * taxa_percentual)
+    valor_destino = arredondar(valor_bruto_destino - taxa)
+    return valor_destino, taxa
+
+
+def _montar_conversao(
+    endereco_carteira: str,
+    moeda_origem: str,
+    moeda_destino: str,
+    valor_origem: Decimal,
+    cotacao: Decimal
+) -> Dict[str, Any]:
+    """Dados da conversão a gravar; também são a resposta da operação."""
+    valor_origem = arredondar(valor_origem)
+    # o valor movimentado usa a cotação com precisão completa; só o que é
+    # gravado (e devolvido) fica na escala da coluna DECIMAL(20, 8)
+    valor_destino, taxa = _calcular_valores(valor_origem, cotacao)
+    return {
+        "endereco_carteira": endereco_carteira,
+        "moeda_origem": moeda_origem,
+        "moeda_destino": moeda_destino,
+        "valor_origem": valor_origem,
+        "valor_destino": valor_destino,
+        "cotacao": arredondar(cotacao),
+        "taxa": taxa,
+        "data_operacao": agora(),
+    }
+
+
+def _params_insert(conv: Dict[str, Any]) -> Dict[str, Any]:
+    params = dict(conv)
+    params["endereco"] = params.pop("endereco_carteira")
+    return params
 
 
 class ConversaoRepository:
@@ -10,6 +71,11 @@ class ConversaoRepository:
     Repositório para conversões entre moedas.
     """
 
+    def __init__(self, conn: Optional[Connection] = None):
+        # conn: conexão da unidade de trabalho da requisição (opcional)
+        self.conn = conn
+        self.saldo_repo = SaldoRepository()
+
     def realizar_conversao(
         self,
         endereco_carteira: str,
@@ -21,89 +87,51 @@ class ConversaoRepository:
         """
         Realiza conversão entre moedas com taxa.
         """
-        taxa_percentual = Decimal(os.getenv("TAXA_CONVERSAO", "0.02"))  # 2% padrão
-        
-        # Calcula valor destino e taxa
-        valor_bruto_destino = valor_origem * cotacao
-        taxa = valor_bruto_destino * taxa_percentual
-        valor_destino = valor_bruto_destino - taxa
-
-        with get_connection() as conn:
-            # 1) Verificar saldo origem
-            saldo_row = conn.execute(
-                text("""
-                    SELECT saldo
-                      FROM saldo_carteira
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda
-                """),
-                {"endereco": endereco_carteira, "moeda": moeda_origem},
-            ).mappings().first()
-
-            if not saldo_row or saldo_row["saldo"] < valor_origem:
-                raise ValueError("Saldo insuficiente na moeda de origem")
+        conv = _montar_conversao(endereco_carteira, moeda_origem, moeda_destino, valor_origem, cotacao)
 
-            # 2) Registrar conversão
-            result = conn.execute(
-                text("""
-                    INSERT INTO conversao 
-                        (endereco_carteira, moeda_origem, moeda_destino, 
-                         valor_origem, valor_destino, cotacao, taxa)
-                    VALUES 
-                        (:endereco, :moeda_origem, :moeda_destino, 
-                         :valor_origem, :valor_destino, :cotacao, :taxa)
-                """),
-                {
-                    "endereco": endereco_carteira,
-                    "moeda_origem": moeda_origem,
-                    "moeda_destino": moeda_destino,
-                    "valor_origem": valor_origem,
-                    "valor_destino": valor_destino,
-                    "cotacao": cotacao,
-                    "taxa": taxa
-                },
-            )
-            conversao_id = result.lastrowid
-
-            # 3) Atualizar saldo origem (deduz)
-            conn.execute(
-                text("""
-                    UPDATE saldo_carteira
-                       SET saldo = saldo - :valor_origem
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda_origem
-                """),
-                {
-                    "endereco": endereco_carteira,
-                    "moeda_origem": moeda_origem,
-                    "valor_origem": valor_origem
-                },
+        with usar_conexao(self.conn) as conn:
+            # 1) Debitar origem; falha se o saldo for insuficiente
+            self.saldo_repo.debitar(
+                conn, endereco_carteira, moeda_origem, conv["valor_origem"], _MSG_SALDO_INSUFICIENTE,
             )
 
-            # 4) Atualizar saldo destino (adiciona líquido)
-            conn.execute(
-                text("""
-                    UPDATE saldo_carteira
-                       SET saldo = saldo + :valor_destino
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda_destino
-                """),
-                {
-                    "endereco": endereco_carteira,
-                    "moeda_destino": moeda_destino,
-                    "valor_destino": valor_destino
-                },
+            # 2) Registrar conversão
+            result = conn.execute(_SQL_INSERIR_CONVERSAO, _params_insert(conv))
+            conv["id"] = result.lastrowid
+
+            # 3) Creditar destino (valor líquido)
+            self.saldo_repo.creditar(conn, endereco_carteira, moeda_destino, conv["valor_destino"])
+
+        return conv
+
+
+class AsyncConversaoRepository:
+    """
+    Versão assíncrona do ConversaoRepository (mesmo SQL, engine aiomysql).
+    """
+
+    def __init__(self, conn: Optional[AsyncConnection] = None):
+        self.conn = conn
+        self.saldo_repo = AsyncSaldoRepository()
+
+    async def realizar_conversao(
+        self,
+        endereco_carteira: str,
+        moeda_origem: str,
+        moeda_destino: str,
+        valor_origem: Decimal,
+        cotacao: Decimal
+    ) -> Dict[str, Any]:
+        conv = _montar_conversao(endereco_carteira, moeda_origem, moeda_destino, valor_origem, cotacao)
+
+        async with usar_conexao_async(self.conn) as conn:
+            await self.saldo_repo.debitar(
+                conn, endereco_carteira, moeda_origem, conv["valor_origem"], _MSG_SALDO_INSUFICIENTE,
             )
 
-            # 5) Buscar o registro criado
-            row = conn.execute(
-                text("""
-                    SELECT id, endereco_carteira, moeda_origem, moeda_destino,
-                           valor_origem, valor_destino, cotacao, taxa, data_operacao
-                      FROM conversao
-                     WHERE id = :id
-                """),
-                {"id": conversao_id},
-            ).mappings().first()
-
-        return dict(row)
+            result = await conn.execute(_SQL_INSERIR_CONVERSAO, _params_insert(conv))
+            conv["id"] = result.lastrowid
+
+            await self.saldo_repo.creditar(conn, endereco_carteira, moeda_destino, conv["valor_destino"])
+
+        return conv
@@ -0,0 +1,145 @@
+import os
+from datetime import datetime
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from api.persistence.db import get_async_connection
+
+
+# Colunas comuns às três tabelas, para que o extrato tenha um formato só
+COLUNAS_EXTRATO = [
+    "origem",
+    "id",
+    "data_operacao",
+    "tipo",
+    "endereco_carteira",
+    "endereco_destino",
+    "codigo_moeda",
+    "valor",
+    "taxa",
+    "moeda_destino",
+    "valor_destino",
+    "cotacao",
+]
+
+_SQL_EXTRATO_MOVIMENTACOES = """
+    SELECT 'deposito_saque' AS origem,
+           id,
+           data_operacao,
+           tipo,
+           endereco_carteira,
+           NULL AS endereco_destino,
+           codigo_moeda,
+           valor,
+           taxa,
+           NULL AS moeda_destino,
+           NULL AS valor_destino,
+           NULL AS cotacao
+      FROM deposito_saque
+     WHERE {filtros}
+     ORDER BY id
+"""
+
+_SQL_EXTRATO_CONVERSOES = """
+    SELECT 'conversao' AS origem,
+           id,
+           data_operacao,
+           'CONVERSAO' AS tipo,
+           endereco_carteira,
+           NULL AS endereco_destino,
+           moeda_origem AS codigo_moeda,
+           valor_origem AS valor,
+           taxa,
+           moeda_destino,
+           valor_destino,
+           cotacao
+      FROM conversao
+     WHERE {filtros}
+     ORDER BY id
+"""
+
+_SQL_EXTRATO_TRANSFERENCIAS = """
+    SELECT 'transferencia' AS origem,
+           id,
+           data_operacao,
+           'TRANSFERENCIA' AS tipo,
+           endereco_origem AS endereco_carteira,
+           endereco_destino,
+           codigo_moeda,
+           valor,
+           taxa,
+           NULL AS moeda_destino,
+           NULL AS valor_destino,
+           NULL AS cotacao
+      FROM transferencia
+     WHERE {filtros}
+     ORDER BY id
+"""
+
+
+def _tamanho_lote() -> int:
+    # Linhas trazidas do cursor do servidor por vez
+    return max(1, int(os.getenv("EXTRATO_TAMANHO_LOTE", "1000")))
+
+
+def _filtros(
+    colunas_carteira: Tuple[str, ...],
+    endereco_carteira: Optional[str],
+    data_de: Optional[datetime],
+    data_ate: Optional[datetime],
+) -> Tuple[str, Dict[str, Any]]:
+    filtros = ["1 = 1"]
+    params: Dict[str, Any] = {}
+    if endereco_carteira is not None:
+        filtros.append("(" + " OR ".join(f"{c} = :endereco" for c in colunas_carteira) + ")")
+        params["endereco"] = endereco_carteira
+    if data_de is not None:
+        filtros.append("data_operacao >= :data_de")
+        params["data_de"] = data_de
+    if data_ate is not None:
+        filtros.append("data_operacao <= :data_ate")
+        params["data_ate"] = data_ate
+    return " AND ".join(filtros), params
+
+
+class AsyncExtratoRepository:
+    """
+    Leitura em fluxo do histórico (depósitos/saques, conversões e
+    transferências) com cursor do lado do servidor: as linhas chegam do
+    MySQL em lotes de EXTRATO_TAMANHO_LOTE, sem carregar o resultado
+    inteiro na memória.
+    """
+
+    async def stream_lancamentos(
+        self,
+        endereco_carteira: Optional[str] = None,
+        data_de: Optional[datetime] = None,
+        data_ate: Optional[datetime] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Gera lotes de lançamentos, tabela por tabela (em ordem de id).
+        Sem `endereco_carteira`, exporta todas as carteiras.
+        """
+        consultas = [
+            (_SQL_EXTRATO_MOVIMENTACOES, ("endereco_carteira",)),
+            (_SQL_EXTRATO_CONVERSOES, ("endereco_carteira",)),
+            (_SQL_EXTRATO_TRANSFERENCIAS, ("endereco_origem", "endereco_destino")),
+        ]
+        tamanho = _tamanho_lote()
+
+        # Uma conexão/transação para as três consultas: com REPEATABLE READ
+        # todas leem o mesmo snapshot do banco
+        async with get_async_connection() as conn:
+            for sql, colunas_carteira in consultas:
+                filtros, params = _filtros(colunas_carteira, endereco_carteira, data_de, data_ate)
+                # conn.stream usa cursor do lado do servidor (stream_results)
+                result = await conn.stream(
+                    text(sql.format(filtros=filtros)).execution_options(yield_per=tamanho),
+                    params,
+                )
+                try:
+                    async for lote in result.mappings().partitions(tamanho):
+                        yield [dict(r) for r in lote]
+                finally:
+                    await result.close()
@@ -0,0 +1,147 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from api.persistence.db import usar_conexao
+
+
+# Cada fonte do histórico é uma consulta com as mesmas colunas. O número da
+# fonte desempata operações no mesmo segundo e faz parte do cursor
+# (data_operacao, fonte, id). Todas filtram a carteira e ordenam por
+# (data_operacao, id), que é o índice composto de cada tabela: cada página
+# é uma leitura de intervalo no índice, parando em :limite linhas.
+_FONTE_MOVIMENTACAO = 1
+_FONTE_CONVERSAO = 2
+_FONTE_TRANSFERENCIA_ENVIADA = 3
+_FONTE_TRANSFERENCIA_RECEBIDA = 4
+
+_SQL_FONTES = {
+    _FONTE_MOVIMENTACAO: """
+    SELECT 1 AS fonte, id, data_operacao, tipo,
+           codigo_moeda, valor, taxa,
+           NULL AS moeda_destino, NULL AS valor_destino, NULL AS cotacao,
+           NULL AS contraparte
+      FROM deposito_saque
+     WHERE endereco_carteira = :endereco{filtros}
+     ORDER BY data_operacao DESC, id DESC
+     LIMIT :limite""",
+    _FONTE_CONVERSAO: """
+    SELECT 2 AS fonte, id, data_operacao, 'CONVERSAO' AS tipo,
+           moeda_origem AS codigo_moeda, valor_origem AS valor, taxa,
+           moeda_destino, valor_destino, cotacao,
+           NULL AS contraparte
+      FROM conversao
+     WHERE endereco_carteira = :endereco{filtros}
+     ORDER BY data_operacao DESC, id DESC
+     LIMIT :limite""",
+    _FONTE_TRANSFERENCIA_ENVIADA: """
+    SELECT 3 AS fonte, id, data_operacao, 'TRANSFERENCIA_ENVIADA' AS tipo,
+           codigo_moeda, valor, taxa,
+           NULL AS moeda_destino, NULL AS valor_destino, NULL AS cotacao,
+           endereco_destino AS contraparte
+      FROM transferencia
+     WHERE endereco_origem = :endereco{filtros}
+     ORDER BY data_operacao DESC, id DESC
+     LIMIT :limite""",
+    # a taxa da transferência é paga pela origem; para o destino ela é zero
+    _FONTE_TRANSFERENCIA_RECEBIDA: """
+    SELECT 4 AS fonte, id, data_operacao, 'TRANSFERENCIA_RECEBIDA' AS tipo,
+           codigo_moeda, valor, 0 AS taxa,
+           NULL AS moeda_destino, NULL AS valor_destino, NULL AS cotacao,
+           endereco_origem AS contraparte
+      FROM transferencia
+     WHERE endereco_destino = :endereco{filtros}
+     ORDER BY data_operacao DESC, id DESC
+     LIMIT :limite""",
+}
+
+# Filtro de moeda por fonte (na conversão vale a moeda de origem ou a de destino)
+_FILTRO_MOEDA = {
+    _FONTE_MOVIMENTACAO: "codigo_moeda = :moeda",
+    _FONTE_CONVERSAO: "(moeda_origem = :moeda OR moeda_destino = :moeda)",
+    _FONTE_TRANSFERENCIA_ENVIADA: "codigo_moeda = :moeda",
+    _FONTE_TRANSFERENCIA_RECEBIDA: "codigo_moeda = :moeda",
+}
+
+# Tipo de operação -> fontes que podem conter esse tipo
+_FONTES_POR_TIPO = {
+    "DEPOSITO": (_FONTE_MOVIMENTACAO,),
+    "SAQUE": (_FONTE_MOVIMENTACAO,),
+    "CONVERSAO": (_FONTE_CONVERSAO,),
+    "TRANSFERENCIA_ENVIADA": (_FONTE_TRANSFERENCIA_ENVIADA,),
+    "TRANSFERENCIA_RECEBIDA": (_FONTE_TRANSFERENCIA_RECEBIDA,),
+}
+
+_SQL_HISTORICO = """
+    SELECT fonte, id, data_operacao, tipo, codigo_moeda, valor, taxa,
+           moeda_destino, valor_destino, cotacao, contraparte
+      FROM ({subconsultas}) h
+     ORDER BY data_operacao DESC, fonte DESC, id DESC
+     LIMIT :limite
+"""
+
+
+def _filtro_apos(fonte: int, apos_fonte: int) -> str:
+    """
+    Itens depois de (:apos_data, apos_fonte, :apos_id) na ordem decrescente,
+    escrito para uma fonte só, em que a fonte é constante: sobra uma
+    condição de intervalo em (data_operacao, id).
+    """
+    if fonte < apos_fonte:
+        return "data_operacao <= :apos_data"
+    if fonte > apos_fonte:
+        return "data_operacao < :apos_data"
+    return "(data_operacao < :apos_data OR (data_operacao = :apos_data AND id < :apos_id))"
+
+
+class HistoricoRepository:
+    """
+    Histórico unificado da carteira: depósitos/saques, conversões e
+    transferências (enviadas e recebidas) em ordem decrescente de data.
+    """
+
+    def __init__(self, conn: Optional[Connection] = None):
+        # conn: conexão da unidade de trabalho da requisição (opcional)
+        self.conn = conn
+
+    def listar(
+        self,
+        endereco_carteira: str,
+        limite: int,
+        apos: Optional[Tuple[datetime, int, int]] = None,
+        codigo_moeda: Optional[str] = None,
+        tipo: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Até `limite` operações, começando depois da chave `apos`
+        (data_operacao, fonte, id) do último item da página anterior.
+        """
+        fontes = _FONTES_POR_TIPO[tipo] if tipo else tuple(_SQL_FONTES)
+        params: Dict[str, Any] = {"endereco": endereco_carteira, "limite": limite}
+        if codigo_moeda is not None:
+            params["moeda"] = codigo_moeda
+        if tipo in ("DEPOSITO", "SAQUE"):
+            params["tipo"] = tipo
+        if apos is not None:
+            params["apos_data"], apos_fonte, params["apos_id"] = apos
+
+        subconsultas = []
+        for fonte in fontes:
+            filtros = []
+            if codigo_moeda is not None:
+                filtros.append(_FILTRO_MOEDA[fonte])
+            if "tipo" in params:
+                filtros.append("tipo = :tipo")
+            if apos is not None:
+                filtros.append(_filtro_apos(fonte, apos_fonte))
+            sql = _SQL_FONTES[fonte].format(filtros="".join(f"\n       AND {f}" for f in filtros))
+            # cada fonte vira uma tabela derivada com o seu próprio ORDER BY/LIMIT
+            subconsultas.append(f"SELECT * FROM ({sql}\n    ) f{fonte}")
+
+        sql = _SQL_HISTORICO.format(subconsultas="\n    UNION ALL\n    ".join(subconsultas))
+        with usar_conexao(self.conn) as conn:
+            rows = conn.execute(text(sql), params).mappings().all()
+
+        return [dict(r) for r in rows]
@@ -0,0 +1,178 @@
+import os
+from typing import Dict, Any, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from api.persistence.db import usar_conexao, usar_conexao_async, apos_commit, agora
+from api.persistence.cache_lru import CacheLRU
+
+
+# Cache na frente da tabela idempotencia: repetições de uma chave já
+# confirmada são respondidas sem ir ao banco. Só recebe registros depois
+# do commit da operação.
+idempotencia_cache = CacheLRU(
+    max_itens=int(os.getenv("IDEMPOTENCIA_CACHE_MAX_ITENS", "100000")),
+    ttl_segundos=float(os.getenv("IDEMPOTENCIA_CACHE_TTL_SEGUNDOS", "3600")),
+)
+
+
+# SQL compartilhado entre a versão síncrona e a assíncrona do repositório
+_SQL_RESERVAR = text("""
+    INSERT INTO idempotencia (endereco_carteira, chave, hash_requisicao, data_criacao)
+    VALUES (:endereco, :chave, :hash, :data_criacao)
+""")
+
+# Leitura com lock compartilhado: enxerga a versão confirmada mais recente,
+# mesmo que a transação já tenha lido outras tabelas antes (REPEATABLE READ)
+_SQL_BUSCAR = text("""
+    SELECT hash_requisicao,
+           resposta
+      FROM idempotencia
+     WHERE endereco_carteira = :endereco
+       AND chave = :chave
+       FOR SHARE
+""")
+
+# Leitura simples, fora da transação da operação: só para responder uma
+# repetição antes de qualquer trabalho (ex.: a cotação da conversão)
+_SQL_CONSULTAR = text("""
+    SELECT hash_requisicao,
+           resposta
+      FROM idempotencia
+     WHERE endereco_carteira = :endereco
+       AND chave = :chave
+""")
+
+_SQL_REGISTRAR_RESPOSTA = text("""
+    UPDATE idempotencia
+       SET resposta = :resposta
+     WHERE endereco_carteira = :endereco
+       AND chave = :chave
+""")
+
+
+class IdempotenciaRepository:
+    """
+    Registro das operações feitas com Idempotency-Key (tabela idempotencia).
+    Deve usar a conexão da unidade de trabalho: a reserva da chave, a
+    operação e a resposta gravada são confirmadas juntas.
+    """
+
+    def __init__(self, conn: Optional[Connection] = None):
+        self.conn = conn
+
+    def reservar(self, endereco_carteira: str, chave: str, hash_requisicao: str) -> Optional[Dict[str, Any]]:
+        """
+        Reserva a chave para esta execução e retorna None. Se a chave já foi
+        usada, retorna o registro existente (hash_requisicao e resposta).
+
+        Duas requisições simultâneas com a mesma chave: o INSERT da segunda
+        espera o lock da linha inserida pela primeira e, quando ela confirma,
+        falha com chave duplicada; a segunda então lê a resposta gravada.
+        """
+        registro = idempotencia_cache.obter((endereco_carteira, chave))
+        if registro is not None:
+            return registro
+
+        with usar_conexao(self.conn) as conn:
+            try:
+                conn.execute(_SQL_RESERVAR, {
+                    "endereco": endereco_carteira,
+                    "chave": chave,
+                    "hash": hash_requisicao,
+                    "data_criacao": agora(),
+                })
+                return None
+            except IntegrityError:
+                row = conn.execute(
+                    _SQL_BUSCAR,
+                    {"endereco": endereco_carteira, "chave": chave},
+                ).mappings().first()
+
+        registro = dict(row)
+        if registro["resposta"] is not None:
+            idempotencia_cache.definir((endereco_carteira, chave), registro)
+        return registro
+
+    def consultar(self, endereco_carteira: str, chave: str) -> Optional[Dict[str, Any]]:
+        """Registro da chave, se existir (cache antes do banco). Não reserva a chave."""
+        registro = idempotencia_cache.obter((endereco_carteira, chave))
+        if registro is not None:
+            return registro
+
+        with usar_conexao(self.conn) as conn:
+            row = conn.execute(
+                _SQL_CONSULTAR,
+                {"endereco": endereco_carteira, "chave": chave},
+            ).mappings().first()
+
+        return dict(row) if row else None
+
+    def registrar_resposta(self, endereco_carteira: str, chave: str, hash_requisicao: str, resposta: str) -> None:
+        """Grava a resposta da execução; vai para o cache após o commit."""
+        with usar_conexao(self.conn) as conn:
+            conn.execute(
+                _SQL_REGISTRAR_RESPOSTA,
+                {"resposta": resposta, "endereco": endereco_carteira, "chave": chave},
+            )
+            registro = {"hash_requisicao": hash_requisicao, "resposta": resposta}
+            apos_commit(conn, lambda: idempotencia_cache.definir((endereco_carteira, chave), registro))
+
+
+class AsyncIdempotenciaRepository:
+    """
+    Versão assíncrona do IdempotenciaRepository (mesmo SQL, engine aiomysql).
+    """
+
+    def __init__(self, conn: Optional[AsyncConnection] = None):
+        self.conn = conn
+
+    async def reservar(self, endereco_carteira: str, chave: str, hash_requisicao: str) -> Optional[Dict[str, Any]]:
+        registro = idempotencia_cache.obter((endereco_carteira, chave))
+        if registro is not None:
+            return registro
+
+        async with usar_conexao_async(self.conn) as conn:
+            try:
+                await conn.execute(_SQL_RESERVAR, {
+                    "endereco": endereco_carteira,
+                    "chave": chave,
+                    "hash": hash_requisicao,
+                    "data_criacao": agora(),
+                })
+                return None
+            except IntegrityError:
+                row = (await conn.execute(
+                    _SQL_BUSCAR,
+                    {"endereco": endereco_carteira, "chave": chave},
+                )).mappings().first()
+
+        registro = dict(row)
+        if registro["resposta"] is not None:
+            idempotencia_cache.definir((endereco_carteira, chave), registro)
+        return registro
+
+    async def consultar(self, endereco_carteira: str, chave: str) -> Optional[Dict[str, Any]]:
+        registro = idempotencia_cache.obter((endereco_carteira, chave))
+        if registro is not None:
+            return registro
+
+        async with usar_conexao_async(self.conn) as conn:
+            row = (await conn.execute(
+                _SQL_CONSULTAR,
+                {"endereco": endereco_carteira, "chave": chave},
+            )).mappings().first()
+
+        return dict(row) if row else None
+
+    async def registrar_resposta(self, endereco_carteira: str, chave: str, hash_requisicao: str, resposta: str) -> None:
+        async with usar_conexao_async(self.conn) as conn:
+            await conn.execute(
+                _SQL_REGISTRAR_RESPOSTA,
+                {"resposta": resposta, "endereco": endereco_carteira, "chave": chave},
+            )
+            registro = {"hash_requisicao": hash_requisicao, "resposta": resposta}
+            apos_commit(conn, lambda: idempotencia_cache.definir((endereco_carteira, chave), registro))
@@ -0,0 +1,75 @@
+import os
+from typing import Dict, Any, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from api.persistence.db import usar_conexao_async, usar_conexao_leitura
+from api.persistence.cache_lru import CacheLRU
+
+
+# O catálogo de moedas quase nunca muda: fica em memória por
+# MOEDA_CACHE_TTL_SEGUNDOS (moedas novas aparecem depois desse prazo)
+catalogo_moedas = CacheLRU(
+    max_itens=1,
+    ttl_segundos=float(os.getenv("MOEDA_CACHE_TTL_SEGUNDOS", "300")),
+)
+_CHAVE_CATALOGO = "moedas"
+
+
+_SQL_LISTAR_MOEDAS = text("""
+    SELECT codigo, nome, tipo
+      FROM moeda
+     ORDER BY codigo
+""")
+
+
+class MoedaRepository:
+    """
+    Acesso ao catálogo de moedas (tabela moeda).
+    """
+
+    def __init__(self, conn: Optional[Connection] = None):
+        # conn: conexão da unidade de trabalho da requisição (opcional)
+        self.conn = conn
+
+    def listar(self) -> List[Dict[str, Any]]:
+        """Catálogo de moedas (do cache, quando disponível)"""
+        moedas = catalogo_moedas.obter(_CHAVE_CATALOGO)
+        if moedas is not None:
+            return moedas
+
+        with usar_conexao_leitura(self.conn) as conn:
+            rows = conn.execute(_SQL_LISTAR_MOEDAS).mappings().all()
+
+        moedas = [dict(r) for r in rows]
+        catalogo_moedas.definir(_CHAVE_CATALOGO, moedas)
+        return moedas
+
+    def listar_codigos(self) -> List[str]:
+        return [r["codigo"] for r in self.listar()]
+
+
+class AsyncMoedaRepository:
+    """
+    Versão assíncrona do MoedaRepository (mesmo SQL, engine aiomysql).
+    """
+
+    def __init__(self, conn: Optional[AsyncConnection] = None):
+        self.conn = conn
+
+    async def listar(self) -> List[Dict[str, Any]]:
+        moedas = catalogo_moedas.obter(_CHAVE_CATALOGO)
+        if moedas is not None:
+            return moedas
+
+        async with usar_conexao_async(self.conn) as conn:
+            rows = (await conn.execute(_SQL_LISTAR_MOEDAS)).mappings().all()
+
+        moedas = [dict(r) for r in rows]
+        catalogo_moedas.definir(_CHAVE_CATALOGO, moedas)
+        return moedas
+
+    async def listar_codigos(self) -> List[str]:
+        return [r["codigo"] for r in await self.listar()]
@@ -1,8 +1,103 @@
 import os
+import secrets
+from collections import defaultdict, deque
 from decimal import Decimal
-from typing import Dict, Any
+from functools import lru_cache
+from typing import Deque, Dict, Any, List, Optional, Set, Tuple
 from sqlalchemy import text
-from api.persistence.db import get_connection
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql.elements import TextClause
+from api.persistence.db import usar_conexao, usar_conexao_async, agora
+from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.persistence.repositories.moeda_repository import MoedaRepository
+from api.persistence.repositories.saldo_repository import (
+    SaldoRepository,
+    AsyncSaldoRepository,
+    arredondar,
+)
+
+
+# SQL compartilhado entre a versão síncrona e a assíncrona do repositório
+_SQL_INSERIR_MOVIMENTACAO = text("""
+    INSERT INTO deposito_saque
+        (endereco_carteira, codigo_moeda, tipo, valor, taxa, data_operacao)
+    VALUES
+        (:endereco, :moeda, :tipo, :valor, :taxa, :data_operacao)
+""")
+
+# Ids gravados por um INSERT de várias linhas, lidos de volta pelo
+# identificador do lote: o InnoDB não garante ids consecutivos
+# (innodb_autoinc_lock_mode = 2, auto_increment_increment > 1)
+_SQL_IDS_LOTE = text("""
+    SELECT id,
+           endereco_carteira,
+           codigo_moeda,
+           valor
+      FROM deposito_saque
+     WHERE lote = :lote
+     ORDER BY id
+""")
+
+@lru_cache(maxsize=16)
+def _sql_inserir_movimentacoes(qtd: int) -> TextClause:
+    """INSERT de `qtd` movimentações do mesmo tipo/data/lote em um único comando."""
+    valores = ",\n        ".join(
+        f"(:e{i}, :m{i}, :tipo, :v{i}, :taxa, :data_operacao, :lote)" for i in range(qtd)
+    )
+    return text(f"""
+    INSERT INTO deposito_saque
+        (endereco_carteira, codigo_moeda, tipo, valor, taxa, data_operacao, lote)
+    VALUES
+        {valores}
+""")
+
+
+def _tamanho_bloco_lote() -> int:
+    # Itens por transação nos lotes; lotes enormes não seguram uma transação gigante
+    return max(1, int(os.getenv("DEPOSITO_LOTE_TAMANHO_BLOCO", "500")))
+
+
+def _motivo_recusa(item: Dict[str, Any], status_carteiras: Dict[str, str], codigos_moeda: Set[str]) -> Optional[str]:
+    status = status_carteiras.get(item["endereco_carteira"])
+    if status is None:
+        return "Carteira não encontrada"
+    if status != "ATIVA":
+        return "Carteira está bloqueada"
+    if item["codigo_moeda"] not in codigos_moeda:
+        return "Moeda não suportada"
+    return None
+
+
+def _calcular_taxa_saque(valor: Decimal) -> Tuple[Decimal, Decimal]:
+    """Retorna (taxa, valor_total) do saque."""
+    taxa_percentual = Decimal(os.getenv("TAXA_SAQUE", "0.01"))  # 1% padrão
+    taxa = arredondar(valor * taxa_percentual)
+    return taxa, valor + taxa
+
+
+def _movimentacao(endereco_carteira: str, codigo_moeda: str, tipo: str, valor: Decimal, taxa: Decimal) -> Dict[str, Any]:
+    """Dados da movimentação a gravar; também são a resposta da operação."""
+    return {
+        "endereco_carteira": endereco_carteira,
+        "codigo_moeda": codigo_moeda,
+        "tipo": tipo,
+        "valor": valor,
+        "taxa": taxa,
+        "data_operacao": agora(),
+    }
+
+
+def _params_insert(mov: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "endereco": mov["endereco_carteira"],
+        "moeda": mov["codigo_moeda"],
+        "tipo": mov["tipo"],
+        "valor": mov["valor"],
+        "taxa": mov["taxa"],
+        "data_operacao": mov["data_operacao"],
+    }
 
 
 class MovimentacaoRepository:
@@ -10,130 +105,194 @@ class MovimentacaoRepository:
     Repositório para depósitos e saques.
     """
 
+    def __init__(self, conn: Optional[Connection] = None):
+        # conn: conexão da unidade de trabalho da requisição (opcional)
+        self.conn = conn
+        self.saldo_repo = SaldoRepository()
+
     def realizar_deposito(
-        self, 
-        endereco_carteira: str, 
-        codigo_moeda: str, 
+        self,
+        endereco_carteira: str,
+        codigo_moeda: str,
         valor: Decimal
     ) -> Dict[str, Any]:
         """
         Realiza um depósito (sem taxa) e atualiza o saldo.
         """
-        with get_connection() as conn:
+        valor = arredondar(valor)
+        mov = _movimentacao(endereco_carteira, codigo_moeda, "DEPOSITO", valor, arredondar(Decimal(0)))
+
+        with usar_conexao(self.conn) as conn:
             # 1) Registrar o depósito
-            result = conn.execute(
-                text("""
-                    INSERT INTO deposito_saque 
-                        (endereco_carteira, codigo_moeda, tipo, valor, taxa)
-                    VALUES 
-                        (:endereco, :moeda, 'DEPOSITO', :valor, 0)
-                """),
-                {
-                    "endereco": endereco_carteira,
-                    "moeda": codigo_moeda,
-                    "valor": valor
-                },
-            )
-            deposito_id = result.lastrowid
+            result = conn.execute(_SQL_INSERIR_MOVIMENTACAO, _params_insert(mov))
+            mov["id"] = result.lastrowid
 
             # 2) Atualizar saldo
-            conn.execute(
-                text("""
-                    UPDATE saldo_carteira
-                       SET saldo = saldo + :valor
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda
-                """),
-                {
-                    "endereco": endereco_carteira,
-                    "moeda": codigo_moeda,
-                    "valor": valor
-                },
-            )
+            self.saldo_repo.creditar(conn, endereco_carteira, codigo_moeda, valor)
 
-            # 3) Buscar o registro criado
-            row = conn.execute(
-                text("""
-                    SELECT id, endereco_carteira, codigo_moeda, tipo, 
-                           valor, taxa, data_operacao
-                      FROM deposito_saque
-                     WHERE id = :id
-                """),
-                {"id": deposito_id},
-            ).mappings().first()
-
-        return dict(row)
+        return mov
 
     def realizar_saque(
-        self, 
-        endereco_carteira: str, 
-        codigo_moeda: str, 
+        self,
+        endereco_carteira: str,
+        codigo_moeda: str,
         valor: Decimal
     ) -> Dict[str, Any]:
         """
         Realiza um saque (com taxa) e atualiza o saldo.
         A taxa é configurada via variável de ambiente TAXA_SAQUE.
         """
-        taxa_percentual = Decimal(os.getenv("TAXA_SAQUE", "0.01"))  # 1% padrão
-        taxa = valor * taxa_percentual
-        valor_total = valor + taxa
-
-        with get_connection() as conn:
-            # 1) Verificar saldo
-            saldo_row = conn.execute(
-                text("""
-                    SELECT saldo
-                      FROM saldo_carteira
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda
-                """),
-                {"endereco": endereco_carteira, "moeda": codigo_moeda},
-            ).mappings().first()
-
-            if not saldo_row or saldo_row["saldo"] < valor_total:
-                raise ValueError("Saldo insuficiente para realizar o saque")
+        valor = arredondar(valor)
+        taxa, valor_total = _calcular_taxa_saque(valor)
+        mov = _movimentacao(endereco_carteira, codigo_moeda, "SAQUE", valor, taxa)
+
+        with usar_conexao(self.conn) as conn:
+            # 1) Debitar valor + taxa (falha se o saldo for insuficiente)
+            self.saldo_repo.debitar(
+                conn, endereco_carteira, codigo_moeda, valor_total,
+                "Saldo insuficiente para realizar o saque",
+            )
 
             # 2) Registrar o saque
-            result = conn.execute(
-                text("""
-                    INSERT INTO deposito_saque 
-                        (endereco_carteira, codigo_moeda, tipo, valor, taxa)
-                    VALUES 
-                        (:endereco, :moeda, 'SAQUE', :valor, :taxa)
-                """),
-                {
-                    "endereco": endereco_carteira,
-                    "moeda": codigo_moeda,
-                    "valor": valor,
-                    "taxa": taxa
-                },
+            result = conn.execute(_SQL_INSERIR_MOVIMENTACAO, _params_insert(mov))
+            mov["id"] = result.lastrowid
+
+        return mov
+
+    def realizar_depositos_lote(self, itens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Depósitos em lote. `itens` traz endereco_carteira, codigo_moeda e valor.
+        Sem conexão da requisição, cada bloco de DEPOSITO_LOTE_TAMANHO_BLOCO
+        itens é gravado na sua própria transação.
+
+        Retorna um resultado por item, na ordem recebida: a movimentação gravada
+        (com "sucesso": True) ou o item com o motivo da recusa em "erro".
+        """
+        codigos_moeda = set(MoedaRepository(self.conn).listar_codigos())
+        tamanho = _tamanho_bloco_lote()
+
+        resultados: List[Dict[str, Any]] = []
+        for inicio in range(0, len(itens), tamanho):
+            bloco = itens[inicio:inicio + tamanho]
+            try:
+                resultados.extend(self._depositar_bloco(bloco, codigos_moeda))
+            except SQLAlchemyError:
+                # Com a conexão da requisição a transação inteira está perdida
+                if self.conn is not None:
+                    raise
+                # O bloco sofreu rollback; os anteriores já estão confirmados
+                resultados.extend(
+                    {**item, "sucesso": False, "erro": "Falha ao gravar o bloco; o depósito não foi aplicado"}
+                    for item in bloco
+                )
+
+        return resultados
+
+    def _depositar_bloco(self, bloco: List[Dict[str, Any]], codigos_moeda: Set[str]) -> List[Dict[str, Any]]:
+        """
+        Um bloco do lote: uma consulta valida todas as carteiras, um INSERT
+        de várias linhas registra os depósitos e um upsert de várias linhas
+        credita os saldos.
+        """
+        zero = arredondar(Decimal(0))
+
+        with usar_conexao(self.conn) as conn:
+            # 1) Status de todas as carteiras do bloco em uma consulta
+            status_carteiras = CarteiraRepository(conn).buscar_status_lote(
+                [item["endereco_carteira"] for item in bloco]
             )
-            saque_id = result.lastrowid
-
-            # 3) Atualizar saldo (deduz valor + taxa)
-            conn.execute(
-                text("""
-                    UPDATE saldo_carteira
-                       SET saldo = saldo - :valor_total
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda
-                """),
-                {
-                    "endereco": endereco_carteira,
-                    "moeda": codigo_moeda,
-                    "valor_total": valor_total
-                },
+
+            resultados: List[Dict[str, Any]] = []
+            aceitos: List[Dict[str, Any]] = []
+            for item in bloco:
+                erro = _motivo_recusa(item, status_carteiras, codigos_moeda)
+                if erro:
+                    resultados.append({**item, "sucesso": False, "erro": erro})
+                    continue
+                mov = _movimentacao(
+                    item["endereco_carteira"], item["codigo_moeda"], "DEPOSITO", arredondar(item["valor"]), zero,
+                )
+                mov["sucesso"] = True
+                resultados.append(mov)
+                aceitos.append(mov)
+
+            if not aceitos:
+                return resultados
+
+            # 2) Registrar todos os depósitos aceitos com um INSERT de várias linhas
+            data_operacao = aceitos[0]["data_operacao"]
+            params: Dict[str, Any] = {
+                "tipo": "DEPOSITO",
+                "taxa": zero,
+                "data_operacao": data_operacao,
+                "lote": secrets.token_hex(16),
+            }
+            creditos: Dict[Tuple[str, str], Decimal] = defaultdict(Decimal)
+            for i, mov in enumerate(aceitos):
+                mov["data_operacao"] = data_operacao
+                params[f"e{i}"] = mov["endereco_carteira"]
+                params[f"m{i}"] = mov["codigo_moeda"]
+                params[f"v{i}"] = mov["valor"]
+                creditos[(mov["endereco_carteira"], mov["codigo_moeda"])] += mov["valor"]
+
+            conn.execute(_sql_inserir_movimentacoes(len(aceitos)), params)
+
+            # Ids lidos de volta pelo lote; linhas iguais são intercambiáveis
+            ids: Dict[Tuple[str, str, Decimal], Deque[int]] = defaultdict(deque)
+            for row in conn.execute(_SQL_IDS_LOTE, {"lote": params["lote"]}).mappings():
+                ids[(row["endereco_carteira"], row["codigo_moeda"], row["valor"])].append(row["id"])
+            for mov in aceitos:
+                mov["id"] = ids[(mov["endereco_carteira"], mov["codigo_moeda"], mov["valor"])].popleft()
+
+            # 3) Creditar os saldos (um upsert de várias linhas, pares já somados)
+            self.saldo_repo.creditar_lote(conn, creditos)
+
+        return resultados
+
+
+class AsyncMovimentacaoRepository:
+    """
+    Versão assíncrona do MovimentacaoRepository (mesmo SQL, engine aiomysql).
+    """
+
+    def __init__(self, conn: Optional[AsyncConnection] = None):
+        self.conn = conn
+        self.saldo_repo = AsyncSaldoRepository()
+
+    async def realizar_deposito(
+        self,
+        endereco_carteira: str,
+        codigo_moeda: str,
+        valor: Decimal
+    ) -> Dict[str, Any]:
+        valor = arredondar(valor)
+        mov = _movimentacao(endereco_carteira, codigo_moeda, "DEPOSITO", valor, arredondar(Decimal(0)))
+
+        async with usar_conexao_async(self.conn) as conn:
+            result = await conn.execute(_SQL_INSERIR_MOVIMENTACAO, _params_insert(mov))
+            mov["id"] = result.lastrowid
+
+            await self.saldo_repo.creditar(conn, endereco_carteira, codigo_moeda, valor)
+
+        return mov
+
+    async def realizar_saque(
+        self,
+        endereco_carteira: str,
+        codigo_moeda: str,
+        valor: Decimal
+    ) -> Dict[str, Any]:
+        valor = arredondar(valor)
+        taxa, valor_total = _calcular_taxa_saque(valor)
+        mov = _movimentacao(endereco_carteira, codigo_moeda, "SAQUE", valor, taxa)
+
+        async with usar_conexao_async(self.conn) as conn:
+            await self.saldo_repo.debitar(
+                conn, endereco_carteira, codigo_moeda, valor_total,
+                "Saldo insuficiente para realizar o saque",
             )
 
-            # 4) Buscar o registro criado
-            row = conn.execute(
-                text("""
-                    SELECT id, endereco_carteira, codigo_moeda, tipo, 
-                           valor, taxa, data_operacao
-                      FROM deposito_saque
-                     WHERE id = :id
-                """),
-                {"id": saque_id},
-            ).mappings().first()
-
-        return dict(row)
+            result = await conn.execute(_SQL_INSERIR_MOVIMENTACAO, _params_insert(mov))
+            mov["id"] = result.lastrowid
+
+        return mov
@@ -0,0 +1,327 @@
+import os
+import random
+from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Set, Tuple, Union
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.sql.elements import TextClause
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from api.persistence.cache_lru import CacheLRU
+from api.persistence.db import antes_do_commit, registrar_escrita
+
+
+# Escala das colunas DECIMAL(20, 8); o MySQL arredonda "half up" ao gravar
+ESCALA = Decimal("0.00000001")
+
+# Carteiras com saldo fragmentado (carteira.slots_saldo > 1): endereço -> slots.
+# São poucas (carteiras de lojistas muito movimentadas), então a lista inteira
+# fica em uma entrada só, relida a cada SALDO_SLOTS_CACHE_TTL_SEGUNDOS. Uma
+# lista desatualizada não afeta a correção: o saldo é sempre a soma dos slots.
+carteiras_fragmentadas = CacheLRU(
+    max_itens=1,
+    ttl_segundos=float(os.getenv("SALDO_SLOTS_CACHE_TTL_SEGUNDOS", "30")),
+)
+_CHAVE_FRAGMENTADAS = "fragmentadas"
+
+_SQL_CARTEIRAS_FRAGMENTADAS = text("""
+    SELECT endereco_carteira, slots_saldo
+      FROM carteira
+     WHERE slots_saldo > 1
+""")
+
+# Versão do saldo (tabela versao_saldo), comparada com o If-None-Match de
+# GET /saldos antes de ler os saldos. Avança uma vez por transação para
+# cada carteira alterada, em um único comando logo antes do commit: depois
+# dos locks de saldo e em ordem de endereço, então não cria deadlock. Fica
+# de fora a carteira fragmentada, cujo lock da versão voltaria a enfileirar
+# os créditos que os slots espalham; o slots_saldo é lido do banco (lock
+# compartilhado, como a checagem de status), não da lista em cache.
+_SQL_AVANCAR_VERSOES = text("""
+    INSERT INTO versao_saldo (endereco_carteira, versao)
+    SELECT endereco_carteira, 1
+      FROM carteira
+     WHERE endereco_carteira IN :enderecos
+       AND slots_saldo = 1
+     ORDER BY endereco_carteira
+    ON DUPLICATE KEY UPDATE versao = versao_saldo.versao + 1
+""").bindparams(bindparam("enderecos", expanding=True))
+
+_AVANCAR_VERSOES = "versao_saldo"
+
+# Débito condicional: só altera a linha se houver saldo suficiente.
+# A checagem e a atualização acontecem no mesmo comando, sob o lock da linha,
+# então duas operações simultâneas não conseguem gastar o mesmo saldo.
+# Sem linha (saldo zero), nada é alterado. O slot vai na condição para o
+# UPDATE travar só aquela linha da PK, e não os outros slots da carteira.
+_SQL_DEBITAR = text("""
+    UPDATE saldo_carteira
+       SET saldo = saldo - :valor
+     WHERE endereco_carteira = :endereco
+       AND codigo_moeda = :moeda
+       AND slot = :slot
+       AND saldo >= :valor
+""")
+
+# As linhas de saldo são criadas no primeiro crédito: carteira nova não tem
+# linha nenhuma, e uma linha ausente vale zero.
+_SQL_CREDITAR = text("""
+    INSERT INTO saldo_carteira (endereco_carteira, codigo_moeda, slot, saldo)
+    VALUES (:endereco, :moeda, :slot, :valor) AS novo
+    ON DUPLICATE KEY UPDATE saldo = saldo_carteira.saldo + novo.saldo
+""")
+
+# Leitura sem lock dos slots, só para escolher qual tentar debitar
+_SQL_BUSCAR_SLOTS = text("""
+    SELECT slot, saldo
+      FROM saldo_carteira
+     WHERE endereco_carteira = :endereco
+       AND codigo_moeda = :moeda
+""")
+
+# Caminho de consolidação: trava todos os slots do par (endereço, moeda)
+_SQL_TRAVAR_SLOTS = text("""
+    SELECT slot, saldo
+      FROM saldo_carteira
+     WHERE endereco_carteira = :endereco
+       AND codigo_moeda = :moeda
+       FOR UPDATE
+""")
+
+_SQL_GRAVAR_CONSOLIDADO = text("""
+    INSERT INTO saldo_carteira (endereco_carteira, codigo_moeda, slot, saldo)
+    VALUES (:endereco, :moeda, 0, :saldo) AS novo
+    ON DUPLICATE KEY UPDATE saldo = novo.saldo
+""")
+
+_SQL_REMOVER_SLOTS = text("""
+    DELETE FROM saldo_carteira
+     WHERE endereco_carteira = :endereco
+       AND codigo_moeda = :moeda
+       AND slot > 0
+""")
+
+# Pares com mais de um slot (usa idx_saldo_slot; quase todas as linhas têm slot 0)
+_SQL_PENDENTES_COMPACTACAO = text("""
+    SELECT DISTINCT endereco_carteira, codigo_moeda
+      FROM saldo_carteira
+     WHERE slot > 0
+     LIMIT :limite
+""")
+
+
+@lru_cache(maxsize=16)
+def _sql_creditar_lote(qtd: int) -> TextClause:
+    """
+    Crédito de `qtd` saldos em um único INSERT de várias linhas com
+    ON DUPLICATE KEY UPDATE (cria as linhas que ainda não existem). Os
+    blocos costumam ter o mesmo tamanho, então o texto é montado uma vez
+    por quantidade.
+    """
+    valores = ",\n        ".join(f"(:e{i}, :m{i}, :s{i}, :v{i})" for i in range(qtd))
+    return text(f"""
+    INSERT INTO saldo_carteira (endereco_carteira, codigo_moeda, slot, saldo)
+    VALUES
+        {valores}
+    AS novo
+    ON DUPLICATE KEY UPDATE saldo = saldo_carteira.saldo + novo.saldo
+""")
+
+
+def _slot_credito(fragmentadas: Dict[str, int], endereco: str) -> int:
+    """Crédito em carteira fragmentada cai em um slot aleatório; nas demais, no 0."""
+    slots = fragmentadas.get(endereco, 1)
+    return random.randrange(slots) if slots > 1 else 0
+
+
+def _params_creditar_lote(
+    creditos: Dict[Tuple[str, str], Decimal],
+    fragmentadas: Dict[str, int]
+) -> Dict[str, object]:
+    # Ordem fixa (endereço, moeda): lotes simultâneos travam as linhas na mesma ordem
+    params: Dict[str, object] = {}
+    for i, ((endereco, moeda), valor) in enumerate(sorted(creditos.items())):
+        params[f"e{i}"] = endereco
+        params[f"m{i}"] = moeda
+        params[f"s{i}"] = _slot_credito(fragmentadas, endereco)
+        params[f"v{i}"] = valor
+    return params
+
+
+def _escolher_slot(slots: Sequence, valor: Decimal) -> Optional[int]:
+    """Um slot aleatório entre os que cobrem o débito sozinhos (None se nenhum)."""
+    candidatos = [s["slot"] for s in slots if s["saldo"] >= valor]
+    return random.choice(candidatos) if candidatos else None
+
+
+def _saldo_consolidado(slots: Sequence, valor: Decimal, mensagem_erro: str) -> Decimal:
+    """Soma dos slots menos o débito; ValueError se a soma não cobrir o débito."""
+    total = sum((s["saldo"] for s in slots), Decimal(0))
+    if total < valor:
+        raise ValueError(mensagem_erro)
+    return total - valor
+
+
+def _mapa_fragmentadas(rows) -> Dict[str, int]:
+    return {r["endereco_carteira"]: r["slots_saldo"] for r in rows}
+
+
+class _AvancarVersoes:
+    """Ação antes do commit: avança a versão do saldo das carteiras alteradas na transação."""
+
+    def __init__(self, conn: Union[Connection, AsyncConnection]):
+        self.conn = conn
+        self.enderecos: Set[str] = set()
+
+    def __call__(self):
+        # na conexão assíncrona, devolve a corrotina que o commit aguarda
+        return self.conn.execute(_SQL_AVANCAR_VERSOES, {"enderecos": sorted(self.enderecos)})
+
+
+def registrar_alteracao_saldo(conn: Union[Connection, AsyncConnection], endereco: str) -> None:
+    """
+    O saldo da carteira muda nesta transação: a versão do saldo avança
+    antes do commit e as leituras da carteira vão para o primário depois.
+    """
+    registrar_escrita(conn, endereco)
+    antes_do_commit(conn, _AVANCAR_VERSOES, lambda: _AvancarVersoes(conn)).enderecos.add(endereco)
+
+
+def arredondar(valor: Decimal) -> Decimal:
+    """Arredonda para a escala gravada no banco, como o MySQL faria."""
+    return valor.quantize(ESCALA, rounding=ROUND_HALF_UP)
+
+
+class SaldoRepository:
+    """
+    Débitos e créditos em saldo_carteira dentro de uma transação já aberta.
+
+    O saldo de uma moeda pode estar dividido em vários slots (linhas com o
+    mesmo endereço e moeda), para carteiras com carteira.slots_saldo > 1:
+    créditos simultâneos caem em linhas diferentes e não disputam o mesmo
+    lock. O saldo é sempre a soma dos slots.
+    """
+
+    def debitar(self, conn: Connection, endereco: str, moeda: str, valor: Decimal, mensagem_erro: str) -> None:
+        """
+        Debita `valor` com um único UPDATE condicional em um slot que cubra
+        o valor sozinho (o slot 0, em carteira comum). Se nenhum cobrir,
+        consolida: trava todos os slots, confere a soma e junta o que sobrar
+        no slot 0. Saldo insuficiente (ou inexistente) gera ValueError.
+        """
+        registrar_alteracao_saldo(conn, endereco)
+        params = {"endereco": endereco, "moeda": moeda, "valor": valor}
+        if self._fragmentadas(conn).get(endereco, 1) > 1:
+            slots = conn.execute(_SQL_BUSCAR_SLOTS, params).mappings().all()
+            slot = _escolher_slot(slots, valor)
+        else:
+            slot = 0
+
+        if slot is not None and conn.execute(_SQL_DEBITAR, {**params, "slot": slot}).rowcount:
+            return
+
+        self._consolidar(conn, endereco, moeda, valor, mensagem_erro)
+
+    def creditar(self, conn: Connection, endereco: str, moeda: str, valor: Decimal) -> None:
+        registrar_alteracao_saldo(conn, endereco)
+        slot = _slot_credito(self._fragmentadas(conn), endereco)
+        conn.execute(_SQL_CREDITAR, {"endereco": endereco, "moeda": moeda, "slot": slot, "valor": valor})
+
+    def creditar_lote(self, conn: Connection, creditos: Dict[Tuple[str, str], Decimal]) -> None:
+        """
+        Credita vários saldos com um comando só. `creditos` mapeia
+        (endereço, moeda) -> valor já somado, uma linha por par.
+        """
+        if creditos:
+            for endereco in {e for e, _ in creditos}:
+                registrar_alteracao_saldo(conn, endereco)
+            conn.execute(
+                _sql_creditar_lote(len(creditos)),
+                _params_creditar_lote(creditos, self._fragmentadas(conn)),
+            )
+
+    def compactar(self, conn: Connection, endereco: str, moeda: str) -> None:
+        """Junta todos os slots do par (endereço, moeda) no slot 0."""
+        self._consolidar(conn, endereco, moeda, Decimal(0), "")
+
+    def listar_pendentes_compactacao(self, conn: Connection, limite: int) -> List[Tuple[str, str]]:
+        rows = conn.execute(_SQL_PENDENTES_COMPACTACAO, {"limite": limite}).all()
+        return [(r[0], r[1]) for r in rows]
+
+    def _consolidar(self, conn: Connection, endereco: str, moeda: str, valor: Decimal, mensagem_erro: str) -> None:
+        params = {"endereco": endereco, "moeda": moeda}
+        slots = conn.execute(_SQL_TRAVAR_SLOTS, params).mappings().all()
+        if not slots and valor == 0:
+            return
+        saldo = _saldo_consolidado(slots, valor, mensagem_erro)
+        conn.execute(_SQL_GRAVAR_CONSOLIDADO, {**params, "saldo": saldo})
+        conn.execute(_SQL_REMOVER_SLOTS, params)
+
+    def _fragmentadas(self, conn: Connection) -> Dict[str, int]:
+        fragmentadas = carteiras_fragmentadas.obter(_CHAVE_FRAGMENTADAS)
+        if fragmentadas is None:
+            geracao = carteiras_fragmentadas.geracao()
+            fragmentadas = _mapa_fragmentadas(conn.execute(_SQL_CARTEIRAS_FRAGMENTADAS).mappings().all())
+            carteiras_fragmentadas.definir(_CHAVE_FRAGMENTADAS, fragmentadas, geracao=geracao)
+        return fragmentadas
+
+
+class AsyncSaldoRepository:
+    """
+    Versão assíncrona do SaldoRepository (mesmo SQL, engine aiomysql).
+    """
+
+    async def debitar(self, conn: AsyncConnection, endereco: str, moeda: str, valor: Decimal, mensagem_erro: str) -> None:
+        registrar_alteracao_saldo(conn, endereco)
+        params = {"endereco": endereco, "moeda": moeda, "valor": valor}
+        if (await self._fragmentadas(conn)).get(endereco, 1) > 1:
+            slots = (await conn.execute(_SQL_BUSCAR_SLOTS, params)).mappings().all()
+            slot = _escolher_slot(slots, valor)
+        else:
+            slot = 0
+
+        if slot is not None and (await conn.execute(_SQL_DEBITAR, {**params, "slot": slot})).rowcount:
+            return
+
+        await self._consolidar(conn, endereco, moeda, valor, mensagem_erro)
+
+    async def creditar(self, conn: AsyncConnection, endereco: str, moeda: str, valor: Decimal) -> None:
+        registrar_alteracao_saldo(conn, endereco)
+        slot = _slot_credito(await self._fragmentadas(conn), endereco)
+        await conn.execute(_SQL_CREDITAR, {"endereco": endereco, "moeda": moeda, "slot": slot, "valor": valor})
+
+    async def creditar_lote(self, conn: AsyncConnection, creditos: Dict[Tuple[str, str], Decimal]) -> None:
+        if creditos:
+            for endereco in {e for e, _ in creditos}:
+                registrar_alteracao_saldo(conn, endereco)
+            await conn.execute(
+                _sql_creditar_lote(len(creditos)),
+                _params_creditar_lote(creditos, await self._fragmentadas(conn)),
+            )
+
+    async def compactar(self, conn: AsyncConnection, endereco: str, moeda: str) -> None:
+        await self._consolidar(conn, endereco, moeda, Decimal(0), "")
+
+    async def listar_pendentes_compactacao(self, conn: AsyncConnection, limite: int) -> List[Tuple[str, str]]:
+        rows = (await conn.execute(_SQL_PENDENTES_COMPACTACAO, {"limite": limite})).all()
+        return [(r[0], r[1]) for r in rows]
+
+    async def _consolidar(self, conn: AsyncConnection, endereco: str, moeda: str, valor: Decimal, mensagem_erro: str) -> None:
+        params = {"endereco": endereco, "moeda": moeda}
+        slots = (await conn.execute(_SQL_TRAVAR_SLOTS, params)).mappings().all()
+        if not slots and valor == 0:
+            return
+        saldo = _saldo_consolidado(slots, valor, mensagem_erro)
+        await conn.execute(_SQL_GRAVAR_CONSOLIDADO, {**params, "saldo": saldo})
+        await conn.execute(_SQL_REMOVER_SLOTS, params)
+
+    async def _fragmentadas(self, conn: AsyncConnection) -> Dict[str, int]:
+        fragmentadas = carteiras_fragmentadas.obter(_CHAVE_FRAGMENTADAS)
+        if fragmentadas is None:
+            geracao = carteiras_fragmentadas.geracao()
+            rows = (await conn.execute(_SQL_CARTEIRAS_FRAGMENTADAS)).mappings().all()
+            fragmentadas = _mapa_fragmentadas(rows)
+            carteiras_fragmentadas.definir(_CHAVE_FRAGMENTADAS, fragmentadas, geracao=geracao)
+        return fragmentadas
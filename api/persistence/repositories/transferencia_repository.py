@@ -1,8 +1,120 @@
 import os
+import secrets
+from collections import defaultdict, deque
 from decimal import Decimal
-from typing import Dict, Any
-from sqlalchemy import text
-from api.persistence.db import get_connection
+from functools import lru_cache
+from typing import Deque, Dict, Any, List, Optional, Tuple
+from sqlalchemy import text, bindparam
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncConnection
+from sqlalchemy.sql.elements import TextClause
+from api.persistence.db import usar_conexao, usar_conexao_async, agora
+from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.persistence.repositories.saldo_repository import (
+    SaldoRepository,
+    AsyncSaldoRepository,
+    arredondar,
+)
+
+
+# SQL compartilhado entre a versão síncrona e a assíncrona do repositório
+_SQL_BUSCAR_STATUS_DESTINO = text("""
+    SELECT status
+      FROM carteira
+     WHERE endereco_carteira = :endereco
+""")
+
+_SQL_INSERIR_TRANSFERENCIA = text("""
+    INSERT INTO transferencia
+        (endereco_origem, endereco_destino, codigo_moeda, valor, taxa, data_operacao)
+    VALUES
+        (:origem, :destino, :moeda, :valor, :taxa, :data_operacao)
+""")
+
+# Trava as linhas de saldo da origem e dos destinos de um bloco em ordem de
+# endereço (a do índice da PK); pagamentos simultâneos que compartilham
+# carteiras pedem os locks na mesma ordem e não entram em deadlock.
+# Destino que nunca recebeu a moeda ainda não tem linha; ela nasce no crédito.
+_SQL_TRAVAR_SALDOS = text("""
+    SELECT endereco_carteira
+      FROM saldo_carteira
+     WHERE codigo_moeda = :moeda
+       AND endereco_carteira IN :enderecos
+     ORDER BY endereco_carteira
+       FOR UPDATE
+""").bindparams(bindparam("enderecos", expanding=True))
+
+_MSG_SALDO_INSUFICIENTE = "Saldo insuficiente para realizar a transferência"
+_MSG_SALDO_INSUFICIENTE_LOTE = "Saldo insuficiente na origem para este bloco do pagamento"
+
+
+# Ids gravados por um INSERT de várias linhas, lidos de volta pelo
+# identificador do lote (o InnoDB não garante ids consecutivos)
+_SQL_IDS_LOTE = text("""
+    SELECT id,
+           endereco_destino,
+           valor
+      FROM transferencia
+     WHERE lote = :lote
+     ORDER BY id
+""")
+
+
+@lru_cache(maxsize=16)
+def _sql_inserir_transferencias(qtd: int) -> TextClause:
+    """INSERT de `qtd` transferências da mesma origem/moeda/lote em um único comando."""
+    valores = ",\n        ".join(
+        f"(:origem, :d{i}, :moeda, :v{i}, :t{i}, :data_operacao, :lote)" for i in range(qtd)
+    )
+    return text(f"""
+    INSERT INTO transferencia
+        (endereco_origem, endereco_destino, codigo_moeda, valor, taxa, data_operacao, lote)
+    VALUES
+        {valores}
+""")
+
+
+def _tamanho_bloco_lote() -> int:
+    # Destinos por transação nos pagamentos em lote
+    return max(1, int(os.getenv("TRANSFERENCIA_LOTE_TAMANHO_BLOCO", "500")))
+
+
+def _motivo_recusa_destino(endereco_origem: str, endereco_destino: str, status_carteiras: Dict[str, str]) -> Optional[str]:
+    if endereco_destino == endereco_origem:
+        return "Origem e destino devem ser diferentes"
+    status = status_carteiras.get(endereco_destino)
+    if status is None:
+        return "Carteira de destino não encontrada"
+    if status != "ATIVA":
+        return "Carteira de destino está bloqueada"
+    return None
+
+
+def _calcular_taxa_transferencia(valor: Decimal) -> Tuple[Decimal, Decimal]:
+    """Retorna (taxa, valor_total) da transferência."""
+    taxa_percentual = Decimal(os.getenv("TAXA_TRANSFERENCIA", "0.015"))  # 1.5% padrão
+    taxa = arredondar(valor * taxa_percentual)
+    return taxa, valor + taxa
+
+
+def _validar_destino(dest_row) -> None:
+    if not dest_row:
+        raise ValueError("Carteira de destino não encontrada")
+
+    if dest_row["status"] != "ATIVA":
+        raise ValueError("Carteira de destino está bloqueada")
+
+
+def _params_insert(transf: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "origem": transf["endereco_origem"],
+        "destino": transf["endereco_destino"],
+        "moeda": transf["codigo_moeda"],
+        "valor": transf["valor"],
+        "taxa": transf["taxa"],
+        "data_operacao": transf["data_operacao"],
+    }
 
 
 class TransferenciaRepository:
@@ -10,6 +122,11 @@ class TransferenciaRepository:
     Repositório para transferências entre carteiras.
     """
 
+    def __init__(self, conn: Optional[Connection] = None):
+        # conn: conexão da unidade de trabalho da requisição (opcional)
+        self.conn = conn
+        self.saldo_repo = SaldoRepository()
+
     def realizar_transferencia(
         self,
         endereco_origem: str,
@@ -21,98 +138,200 @@ class TransferenciaRepository:
         Realiza transferência entre carteiras.
         A carteira origem paga a taxa, a destino recebe o valor integral.
         """
-        taxa_percentual = Decimal(os.getenv("TAXA_TRANSFERENCIA", "0.015"))  # 1.5% padrão
-        taxa = valor * taxa_percentual
-        valor_total = valor + taxa
+        valor = arredondar(valor)
+        taxa, valor_total = _calcular_taxa_transferencia(valor)
+        transf = {
+            "endereco_origem": endereco_origem,
+            "endereco_destino": endereco_destino,
+            "codigo_moeda": codigo_moeda,
+            "valor": valor,
+            "taxa": taxa,
+            "data_operacao": agora(),
+        }
 
-        with get_connection() as conn:
+        with usar_conexao(self.conn) as conn:
             # 1) Verificar se carteira destino existe e está ativa
             dest_row = conn.execute(
-                text("""
-                    SELECT status
-                      FROM carteira
-                     WHERE endereco_carteira = :endereco
-                """),
+                _SQL_BUSCAR_STATUS_DESTINO,
                 {"endereco": endereco_destino},
             ).mappings().first()
+            _validar_destino(dest_row)
 
-            if not dest_row:
-                raise ValueError("Carteira de destino não encontrada")
-            
-            if dest_row["status"] != "ATIVA":
-                raise ValueError("Carteira de destino está bloqueada")
-
-            # 2) Verificar saldo origem
-            saldo_row = conn.execute(
-                text("""
-                    SELECT saldo
-                      FROM saldo_carteira
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda
-                """),
-                {"endereco": endereco_origem, "moeda": codigo_moeda},
-            ).mappings().first()
-
-            if not saldo_row or saldo_row["saldo"] < valor_total:
-                raise ValueError("Saldo insuficiente para realizar a transferência")
+            # 2) Debitar origem (valor + taxa); falha se o saldo for insuficiente
+            self.saldo_repo.debitar(conn, endereco_origem, codigo_moeda, valor_total, _MSG_SALDO_INSUFICIENTE)
 
             # 3) Registrar transferência
-            result = conn.execute(
-                text("""
-                    INSERT INTO transferencia 
-                        (endereco_origem, endereco_destino, codigo_moeda, valor, taxa)
-                    VALUES 
-                        (:origem, :destino, :moeda, :valor, :taxa)
-                """),
-                {
-                    "origem": endereco_origem,
-                    "destino": endereco_destino,
-                    "moeda": codigo_moeda,
-                    "valor": valor,
-                    "taxa": taxa
-                },
-            )
-            transferencia_id = result.lastrowid
-
-            # 4) Atualizar saldo origem (deduz valor + taxa)
-            conn.execute(
-                text("""
-                    UPDATE saldo_carteira
-                       SET saldo = saldo - :valor_total
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda
-                """),
-                {
-                    "endereco": endereco_origem,
-                    "moeda": codigo_moeda,
-                    "valor_total": valor_total
-                },
-            )
+            result = conn.execute(_SQL_INSERIR_TRANSFERENCIA, _params_insert(transf))
+            transf["id"] = result.lastrowid
+
+            # 4) Creditar destino (apenas o valor, sem taxa)
+            self.saldo_repo.creditar(conn, endereco_destino, codigo_moeda, valor)
+
+        return transf
+
+    def realizar_transferencias_lote(
+        self,
+        endereco_origem: str,
+        codigo_moeda: str,
+        itens: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Pagamento de uma origem para vários destinos (`itens` com
+        endereco_destino e valor). A taxa de cada destino é a mesma de uma
+        transferência individual, mas a origem é debitada uma vez por bloco
+        de TRANSFERENCIA_LOTE_TAMANHO_BLOCO destinos, cada bloco na sua
+        própria transação (sem conexão da requisição).
+
+        Retorna um resultado por destino, na ordem recebida. Se faltar saldo
+        em um bloco, ele e os seguintes não são pagos.
+        """
+        tamanho = _tamanho_bloco_lote()
 
-            # 5) Atualizar saldo destino (adiciona apenas o valor, sem taxa)
-            conn.execute(
-                text("""
-                    UPDATE saldo_carteira
-                       SET saldo = saldo + :valor
-                     WHERE endereco_carteira = :endereco
-                       AND codigo_moeda = :moeda
-                """),
-                {
-                    "endereco": endereco_destino,
-                    "moeda": codigo_moeda,
-                    "valor": valor
-                },
+        resultados: List[Dict[str, Any]] = []
+        saldo_esgotado = False
+        for inicio in range(0, len(itens), tamanho):
+            bloco = itens[inicio:inicio + tamanho]
+            if saldo_esgotado:
+                resultados.extend({**item, "sucesso": False, "erro": _MSG_SALDO_INSUFICIENTE_LOTE} for item in bloco)
+                continue
+            try:
+                resultados.extend(self._transferir_bloco(endereco_origem, codigo_moeda, bloco))
+            except ValueError as e:
+                # Débito recusado: nada do bloco foi gravado
+                if self.conn is not None:
+                    raise
+                saldo_esgotado = True
+                resultados.extend({**item, "sucesso": False, "erro": str(e)} for item in bloco)
+            except SQLAlchemyError:
+                if self.conn is not None:
+                    raise
+                resultados.extend(
+                    {**item, "sucesso": False, "erro": "Falha ao gravar o bloco; a transferência não foi realizada"}
+                    for item in bloco
+                )
+
+        return resultados
+
+    def _transferir_bloco(
+        self,
+        endereco_origem: str,
+        codigo_moeda: str,
+        bloco: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Um bloco do pagamento: valida os destinos em uma consulta, trava os
+        saldos em ordem, debita a origem uma vez (valores + taxas), registra
+        as transferências com um INSERT de várias linhas e credita os
+        destinos com um único upsert de várias linhas.
+        """
+        data_operacao = agora()
+
+        with usar_conexao(self.conn) as conn:
+            # 1) Status de todos os destinos do bloco em uma consulta
+            status_carteiras = CarteiraRepository(conn).buscar_status_lote(
+                [item["endereco_destino"] for item in bloco]
             )
 
-            # 6) Buscar o registro criado
-            row = conn.execute(
-                text("""
-                    SELECT id, endereco_origem, endereco_destino, codigo_moeda,
-                           valor, taxa, data_operacao
-                      FROM transferencia
-                     WHERE id = :id
-                """),
-                {"id": transferencia_id},
-            ).mappings().first()
+            resultados: List[Dict[str, Any]] = []
+            aceitos: List[Dict[str, Any]] = []
+            for item in bloco:
+                erro = _motivo_recusa_destino(endereco_origem, item["endereco_destino"], status_carteiras)
+                if erro:
+                    resultados.append({**item, "sucesso": False, "erro": erro})
+                    continue
+                valor = arredondar(item["valor"])
+                taxa, _ = _calcular_taxa_transferencia(valor)
+                transf = {
+                    "endereco_origem": endereco_origem,
+                    "endereco_destino": item["endereco_destino"],
+                    "codigo_moeda": codigo_moeda,
+                    "valor": valor,
+                    "taxa": taxa,
+                    "data_operacao": data_operacao,
+                    "sucesso": True,
+                }
+                resultados.append(transf)
+                aceitos.append(transf)
+
+            if not aceitos:
+                return resultados
+
+            # 2) Travar origem e destinos em ordem determinística
+            enderecos = sorted({endereco_origem, *(t["endereco_destino"] for t in aceitos)})
+            conn.execute(_SQL_TRAVAR_SALDOS, {"moeda": codigo_moeda, "enderecos": enderecos})
+
+            # 3) Debitar a origem uma vez: soma dos valores + taxas do bloco
+            total = sum((t["valor"] + t["taxa"] for t in aceitos), Decimal(0))
+            self.saldo_repo.debitar(conn, endereco_origem, codigo_moeda, total, _MSG_SALDO_INSUFICIENTE_LOTE)
+
+            # 4) Registrar as transferências com um INSERT de várias linhas
+            params: Dict[str, Any] = {
+                "origem": endereco_origem,
+                "moeda": codigo_moeda,
+                "data_operacao": data_operacao,
+                "lote": secrets.token_hex(16),
+            }
+            creditos: Dict[Tuple[str, str], Decimal] = defaultdict(Decimal)
+            for i, transf in enumerate(aceitos):
+                params[f"d{i}"] = transf["endereco_destino"]
+                params[f"v{i}"] = transf["valor"]
+                params[f"t{i}"] = transf["taxa"]
+                creditos[(transf["endereco_destino"], codigo_moeda)] += transf["valor"]
+
+            conn.execute(_sql_inserir_transferencias(len(aceitos)), params)
+
+            # Ids lidos de volta pelo lote; linhas iguais são intercambiáveis
+            ids: Dict[Tuple[str, Decimal], Deque[int]] = defaultdict(deque)
+            for row in conn.execute(_SQL_IDS_LOTE, {"lote": params["lote"]}).mappings():
+                ids[(row["endereco_destino"], row["valor"])].append(row["id"])
+            for transf in aceitos:
+                transf["id"] = ids[(transf["endereco_destino"], transf["valor"])].popleft()
+
+            # 5) Creditar os destinos (apenas o valor, sem taxa)
+            self.saldo_repo.creditar_lote(conn, creditos)
+
+        return resultados
+
+
+class AsyncTransferenciaRepository:
+    """
+    Versão assíncrona do TransferenciaRepository (mesmo SQL, engine aiomysql).
+    """
+
+    def __init__(self, conn: Optional[AsyncConnection] = None):
+        self.conn = conn
+        self.saldo_repo = AsyncSaldoRepository()
+
+    async def realizar_transferencia(
+        self,
+        endereco_origem: str,
+        endereco_destino: str,
+        codigo_moeda: str,
+        valor: Decimal
+    ) -> Dict[str, Any]:
+        valor = arredondar(valor)
+        taxa, valor_total = _calcular_taxa_transferencia(valor)
+        transf = {
+            "endereco_origem": endereco_origem,
+            "endereco_destino": endereco_destino,
+            "codigo_moeda": codigo_moeda,
+            "valor": valor,
+            "taxa": taxa,
+            "data_operacao": agora(),
+        }
+
+        async with usar_conexao_async(self.conn) as conn:
+            dest_row = (await conn.execute(
+                _SQL_BUSCAR_STATUS_DESTINO,
+                {"endereco": endereco_destino},
+            )).mappings().first()
+            _validar_destino(dest_row)
+
+            await self.saldo_repo.debitar(conn, endereco_origem, codigo_moeda, valor_total, _MSG_SALDO_INSUFICIENTE)
+
+            result = await conn.execute(_SQL_INSERIR_TRANSFERENCIA, _params_insert(transf))
+            transf["id"] = result.lastrowid
+
+            await self.saldo_repo.creditar(conn, endereco_destino, codigo_moeda, valor)
 
-        return dict(row)
+        return transf
@@ -0,0 +1,72 @@
+"""
+Resposta JSON rápida para listas e saldos lidos do nosso próprio banco.
+
+As linhas já têm os tipos do schema (Decimal, datetime, str), então não
+passam por modelos Pydantic nem pela revalidação do response_model: os
+dicts do repositório vão direto para o codificador. Com o pacote opcional
+orjson instalado, ele é usado; sem ele, o json da biblioteca padrão.
+
+A saída é idêntica byte a byte à serialização do FastAPI/Pydantic para os
+mesmos modelos: JSON compacto em UTF-8, Decimal como string (str(valor)) e
+datetime em ISO 8601. As chaves saem na ordem dos dicts, que os
+repositórios montam na ordem dos campos dos modelos.
+"""
+import json
+import hashlib
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _padrao(valor: Any) -> Any:
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    raise TypeError(f"Tipo não serializável em JSON: {type(valor).__name__}")
+
+
+def codificar(conteudo: Any) -> bytes:
+    if orjson is not None:
+        # orjson já escreve datetime em ISO 8601 (igual a isoformat() para
+        # os DATETIME do MySQL, sem fuso); Decimal vai pelo _padrao
+        return orjson.dumps(conteudo, default=_padrao)
+    return json.dumps(
+        conteudo,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_padrao,
+    ).encode("utf-8")
+
+
+class RespostaJSONRapida(Response):
+    """Response com o conteúdo codificado por `codificar` (sem validação)."""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return codificar(content)
+
+
+def calcular_etag(corpo: bytes) -> str:
+    """ETag forte derivada do conteúdo: o mesmo corpo tem a mesma ETag em qualquer processo."""
+    return '"' + hashlib.blake2b(corpo, digest_size=12).hexdigest() + '"'
+
+
+def etag_corresponde(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparação fraca do If-None-Match (lista de ETags, W/ ou *) com a ETag atual."""
+    if not if_none_match:
+        return False
+    for candidata in if_none_match.split(","):
+        candidata = candidata.strip()
+        if candidata == "*" or candidata.removeprefix("W/") == etag:
+            return True
+    return False
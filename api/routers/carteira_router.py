@@ -1,10 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import Response, StreamingResponse
+from typing import List, Literal, Optional
 
 from api.services.carteira_service import CarteiraService
 from api.persistence.repositories.carteira_repository import CarteiraRepository
-from api.models.carteira_models import Carteira, CarteiraCriada
+from api.models.carteira_models import (
+    Carteira,
+    CarteiraCriada,
+    CarteiraPagina,
+    CarteiraLoteRequest,
+    SlotsSaldo,
+    SlotsSaldoRequest,
+)
 from api.models.operacao_models import Saldo
+from api.respostas_json import RespostaJSONRapida, etag_corresponde
 
 
 router = APIRouter(prefix="/carteiras", tags=["carteiras"])
@@ -29,9 +39,43 @@ def criar_carteira(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.get("", response_model=List[Carteira])
-def listar_carteiras(service: CarteiraService = Depends(get_carteira_service)):
-    return service.listar()
+@router.post("/lote", status_code=201)
+def criar_carteiras_lote(
+    request: CarteiraLoteRequest,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Cria várias carteiras de uma vez (ex.: integração de parceiros).
+    A resposta é NDJSON em fluxo, uma carteira por linha com a chave
+    privada (retornada apenas nesta resposta). Não aceita Idempotency-Key:
+    repetir a resposta exigiria guardar as chaves privadas em claro.
+    """
+    return StreamingResponse(
+        service.criar_lote(request.quantidade),
+        status_code=201,
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("", response_model=CarteiraPagina)
+def listar_carteiras(
+    limite: int = Query(100, ge=1, le=1000, description="Carteiras por página"),
+    cursor: Optional[str] = Query(None, description="proximo_cursor da página anterior"),
+    status: Optional[Literal["ATIVA", "BLOQUEADA"]] = None,
+    criada_de: Optional[datetime] = Query(None, description="Criadas a partir de (inclusive)"),
+    criada_ate: Optional[datetime] = Query(None, description="Criadas até (inclusive)"),
+    incluir_total: bool = Query(False, description="Inclui o total aproximado (estimativa do banco)"),
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Lista carteiras paginadas por cursor, em ordem de criação.
+    Para a próxima página, repita os filtros e envie o `proximo_cursor`.
+    """
+    try:
+        # linhas do banco direto para o JSON, sem revalidar pelo response_model
+        return RespostaJSONRapida(service.listar(limite, cursor, status, criada_de, criada_ate, incluir_total))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/{endereco_carteira}", response_model=Carteira)
@@ -56,15 +100,45 @@ def bloquear_carteira(
         raise HTTPException(status_code=404, detail=str(e))
 
 
-@router.get("/{endereco_carteira}/saldos", response_model=List[Saldo])
+@router.put("/{endereco_carteira}/slots-saldo", response_model=SlotsSaldo)
+def definir_slots_saldo(
+    endereco_carteira: str,
+    request: SlotsSaldoRequest,
+    service: CarteiraService = Depends(get_carteira_service),
+):
+    """
+    Divide o saldo de cada moeda da carteira em `slots` linhas, para
+    carteiras que recebem muitos créditos simultâneos (ex.: lojistas).
+    `slots = 1` volta ao saldo em uma linha só.
+    """
+    try:
+        return service.definir_slots_saldo(endereco_carteira, request.slots)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get(
+    "/{endereco_carteira}/saldos",
+    response_model=List[Saldo],
+    responses={304: {"description": "Saldos inalterados desde a ETag enviada em If-None-Match"}},
+)
 def buscar_saldos(
     endereco_carteira: str,
+    if_none_match: Optional[str] = Header(None),
     service: CarteiraService = Depends(get_carteira_service),
 ):
     """
     Retorna todos os saldos da carteira em todas as moedas.
+    A resposta traz uma ETag; envie-a em If-None-Match para receber 304
+    (sem corpo) enquanto os saldos não mudarem.
     """
     try:
-        return service.buscar_saldos(endereco_carteira)
+        etag, corpo = service.buscar_saldos_serializados(endereco_carteira, if_none_match)
     except ValueError as e:
-        raise HTTPException(status_code=404, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=404, detail=str(e))
+
+    # no-cache: clientes e proxies guardam a resposta, mas revalidam a cada uso
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if corpo is None or etag_corresponde(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=corpo, media_type="application/json", headers=headers)
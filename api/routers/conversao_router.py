@@ -1,20 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
 
 from api.services.conversao_service import ConversaoService
 from api.services.coinbase_service import CoinbaseService
-from api.persistence.repositories.conversao_repository import ConversaoRepository
-from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.services.idempotencia_service import ConflitoIdempotencia
 from api.models.operacao_models import ConversaoRequest, ConversaoResponse
 
 
 router = APIRouter(tags=["conversões"])
 
 
-def get_conversao_service() -> ConversaoService:
-    conversao_repo = ConversaoRepository()
-    carteira_repo = CarteiraRepository()
-    coinbase_service = CoinbaseService()
-    return ConversaoService(conversao_repo, carteira_repo, coinbase_service)
+def get_coinbase_service(request: Request) -> CoinbaseService:
+    # o cliente HTTP é criado uma única vez no lifespan da aplicação (api/main.py)
+    return CoinbaseService(request.app.state.coinbase_client)
+
+
+def get_conversao_service(
+    request: Request,
+    coinbase_service: CoinbaseService = Depends(get_coinbase_service),
+) -> ConversaoService:
+    # sem unidade de trabalho aqui: o serviço abre a transação só depois de
+    # obter a cotação, para não segurar uma conexão durante a chamada HTTP
+    return ConversaoService(coinbase_service, matriz_cotacoes=request.app.state.matriz_cotacoes)
 
 
 @router.post(
@@ -25,14 +33,18 @@ def get_conversao_service() -> ConversaoService:
 async def realizar_conversao(
     endereco_carteira: str,
     request: ConversaoRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=128),
     service: ConversaoService = Depends(get_conversao_service),
 ):
     """
     Realiza conversão entre moedas.
     Requer chave privada, usa API Coinbase para cotação e possui taxa.
+    Com o header Idempotency-Key, repetições devolvem a resposta original.
     """
     try:
-        return await service.realizar_conversao(endereco_carteira, request)
+        return await service.realizar_conversao(endereco_carteira, request, idempotency_key)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
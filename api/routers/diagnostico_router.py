@@ -0,0 +1,76 @@
+from fastapi import APIRouter, Request
+
+from api.services.coinbase_service import cotacao_cache
+from api.persistence.repositories.carteira_repository import carteira_cache
+from api.persistence.repositories.idempotencia_repository import idempotencia_cache
+
+
+router = APIRouter(prefix="/diagnostico", tags=["diagnóstico"])
+
+
+@router.get("/cotacoes")
+def estatisticas_cotacoes():
+    """
+    Contadores do cache de cotações (hits, misses, consultas agrupadas).
+    """
+    return cotacao_cache.estatisticas()
+
+
+@router.get("/carteiras")
+def estatisticas_carteiras():
+    """
+    Contadores do cache do hash da chave privada das carteiras (para dimensioná-lo).
+    """
+    return carteira_cache.estatisticas()
+
+
+@router.get("/idempotencia")
+def estatisticas_idempotencia():
+    """
+    Contadores do cache de respostas das Idempotency-Keys.
+    """
+    return idempotencia_cache.estatisticas()
+
+
+@router.get("/matriz-cotacoes")
+def estatisticas_matriz_cotacoes(request: Request):
+    """
+    Situação da matriz de cotações em segundo plano (se estiver ativa).
+    """
+    matriz = request.app.state.matriz_cotacoes
+    if matriz is None:
+        return {"ativa": False}
+    return {"ativa": True, **matriz.estatisticas()}
+
+
+@router.get("/fila-depositos")
+def estatisticas_fila_depositos(request: Request):
+    """
+    Commit em grupo dos depósitos: tamanho dos grupos e espera na fila.
+    """
+    fila = request.app.state.fila_depositos
+    if fila is None:
+        return {"ativa": False}
+    return fila.estatisticas()
+
+
+@router.get("/compactador-saldos")
+def estatisticas_compactador_saldos(request: Request):
+    """
+    Compactação em segundo plano dos saldos divididos em slots.
+    """
+    compactador = request.app.state.compactador_saldos
+    if compactador is None:
+        return {"ativo": False}
+    return {"ativo": True, **compactador.estatisticas()}
+
+
+@router.get("/replicas")
+def estatisticas_replicas(request: Request):
+    """
+    Réplicas de leitura: quais estão no rodízio e o atraso de cada uma.
+    """
+    monitor = request.app.state.monitor_replicas
+    if monitor is None:
+        return {"ativas": False}
+    return {"ativas": True, **monitor.estatisticas()}
@@ -0,0 +1,66 @@
+from datetime import datetime
+from typing import Literal, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
+
+from api.services.extrato_service import ExtratoService
+from api.persistence.repositories.extrato_repository import AsyncExtratoRepository
+from api.persistence.repositories.carteira_repository import AsyncCarteiraRepository
+
+
+router = APIRouter(tags=["extrato"])
+
+_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def get_extrato_service() -> ExtratoService:
+    return ExtratoService(AsyncExtratoRepository(), AsyncCarteiraRepository())
+
+
+def _resposta(service: ExtratoService, formato: str, nome: str, endereco_carteira, data_de, data_ate) -> StreamingResponse:
+    if data_de is not None and data_ate is not None and data_de > data_ate:
+        raise HTTPException(status_code=400, detail="Período inválido: 'de' posterior a 'ate'")
+
+    return StreamingResponse(
+        service.exportar(formato, endereco_carteira, data_de, data_ate),
+        media_type=_MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{nome}.{formato}"'},
+    )
+
+
+@router.get("/extrato")
+async def exportar_extrato(
+    formato: Literal["ndjson", "csv"] = "ndjson",
+    de: Optional[datetime] = Query(None, description="Operações a partir de (inclusive)"),
+    ate: Optional[datetime] = Query(None, description="Operações até (inclusive)"),
+    service: ExtratoService = Depends(get_extrato_service),
+):
+    """
+    Exporta o histórico de todas as carteiras (depósitos, saques,
+    conversões e transferências) em NDJSON ou CSV, em fluxo.
+    """
+    return _resposta(service, formato, "extrato", None, de, ate)
+
+
+@router.get("/carteiras/{endereco_carteira}/extrato")
+async def exportar_extrato_carteira(
+    endereco_carteira: str,
+    formato: Literal["ndjson", "csv"] = "ndjson",
+    de: Optional[datetime] = Query(None, description="Operações a partir de (inclusive)"),
+    ate: Optional[datetime] = Query(None, description="Operações até (inclusive)"),
+    service: ExtratoService = Depends(get_extrato_service),
+):
+    """
+    Exporta o histórico de uma carteira em NDJSON ou CSV, em fluxo.
+    Transferências aparecem tanto para a origem quanto para o destino.
+    """
+    try:
+        await service.validar_carteira(endereco_carteira)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    return _resposta(service, formato, f"extrato_{endereco_carteira}", endereco_carteira, de, ate)
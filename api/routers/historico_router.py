@@ -0,0 +1,39 @@
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+
+from api.services.historico_service import HistoricoService
+from api.persistence.repositories.historico_repository import HistoricoRepository
+from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.models.operacao_models import HistoricoPagina, TipoOperacao
+
+
+router = APIRouter(tags=["histórico"])
+
+
+def get_historico_service() -> HistoricoService:
+    return HistoricoService(HistoricoRepository(), CarteiraRepository())
+
+
+@router.get("/carteiras/{endereco_carteira}/historico", response_model=HistoricoPagina)
+def listar_historico(
+    endereco_carteira: str,
+    limite: int = Query(50, ge=1, le=500, description="Operações por página"),
+    cursor: Optional[str] = Query(None, description="proximo_cursor da página anterior"),
+    codigo_moeda: Optional[str] = Query(None, description="Somente operações nesta moeda"),
+    tipo: Optional[TipoOperacao] = Query(None, description="Somente operações deste tipo"),
+    service: HistoricoService = Depends(get_historico_service),
+):
+    """
+    Histórico da carteira (depósitos, saques, conversões e transferências
+    enviadas/recebidas), da mais recente para a mais antiga, paginado por cursor.
+    """
+    try:
+        service.validar_carteira(endereco_carteira)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+    try:
+        return service.listar(endereco_carteira, limite, cursor, codigo_moeda, tipo)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,20 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from api.metricas import registro
+
+
+router = APIRouter(tags=["diagnóstico"])
+
+
+class _RespostaPrometheus(PlainTextResponse):
+    media_type = "text/plain; version=0.0.4"
+
+
+@router.get("/metrics", response_class=_RespostaPrometheus)
+def exportar_metricas():
+    """
+    Métricas do processo no formato texto do Prometheus: latência por rota,
+    duração dos comandos SQL, pool de conexões e chamadas à Coinbase.
+    """
+    return registro.exportar()
@@ -1,10 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Iterator, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Request
+from fastapi.concurrency import run_in_threadpool
 
 from api.services.movimentacao_service import MovimentacaoService
+from api.services.idempotencia_service import IdempotenciaService, ConflitoIdempotencia
 from api.persistence.repositories.movimentacao_repository import MovimentacaoRepository
+from api.persistence.repositories.idempotencia_repository import IdempotenciaRepository
 from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.persistence.db import UnidadeDeTrabalho, get_unidade_de_trabalho
+from api.persistence.fila_depositos import FilaIndisponivel
 from api.models.operacao_models import (
     DepositoRequest,
+    DepositoLoteRequest,
+    DepositoLoteResponse,
     SaqueRequest,
     MovimentacaoResponse
 )
@@ -13,10 +22,42 @@ from api.models.operacao_models import (
 router = APIRouter(tags=["movimentações"])
 
 
-def get_movimentacao_service() -> MovimentacaoService:
-    movimentacao_repo = MovimentacaoRepository()
-    carteira_repo = CarteiraRepository()
-    return MovimentacaoService(movimentacao_repo, carteira_repo)
+def get_movimentacao_service(
+    uow: UnidadeDeTrabalho = Depends(get_unidade_de_trabalho),
+) -> MovimentacaoService:
+    # todos os repositórios usam a mesma conexão/transação da requisição
+    movimentacao_repo = MovimentacaoRepository(uow.conn)
+    carteira_repo = CarteiraRepository(uow.conn)
+    idempotencia = IdempotenciaService(IdempotenciaRepository(uow.conn))
+    return MovimentacaoService(movimentacao_repo, carteira_repo, uow, idempotencia)
+
+
+def get_deposito_service(
+    request: Request,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+) -> Iterator[MovimentacaoService]:
+    fila = request.app.state.fila_depositos
+    if fila is not None and idempotency_key is None:
+        # commit em grupo: a requisição não segura uma conexão do pool
+        # enquanto espera o grupo (quem grava é a thread da fila)
+        yield MovimentacaoService(MovimentacaoRepository(), CarteiraRepository(), fila_depositos=fila)
+        return
+
+    uow = UnidadeDeTrabalho()
+    try:
+        yield get_movimentacao_service(uow)
+    finally:
+        uow.close()
+
+
+def get_movimentacao_lote_service() -> MovimentacaoService:
+    # sem unidade de trabalho: o lote confirma um bloco por transação, e a
+    # Idempotency-Key é reservada e registrada cada uma na sua transação
+    return MovimentacaoService(
+        MovimentacaoRepository(),
+        CarteiraRepository(),
+        idempotencia=IdempotenciaService(IdempotenciaRepository()),
+    )
 
 
 @router.post(
@@ -24,17 +65,28 @@ def get_movimentacao_service() -> MovimentacaoService:
     response_model=MovimentacaoResponse,
     status_code=201
 )
-def realizar_deposito(
+async def realizar_deposito(
     endereco_carteira: str,
     request: DepositoRequest,
-    service: MovimentacaoService = Depends(get_movimentacao_service),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=128),
+    service: MovimentacaoService = Depends(get_deposito_service),
 ):
     """
     Realiza um depósito na carteira.
     Não requer chave privada e não possui taxa.
+    Com o header Idempotency-Key, repetições devolvem a resposta original.
     """
     try:
-        return service.realizar_deposito(endereco_carteira, request)
+        if service.fila_depositos is not None:
+            # commit em grupo: espera o grupo no event loop, sem ocupar uma
+            # thread do servidor (o pool de threads não limita o grupo)
+            return await service.realizar_deposito_em_grupo(endereco_carteira, request)
+        # caminho normal: I/O síncrono com o banco, no pool de threads
+        return await run_in_threadpool(service.realizar_deposito, endereco_carteira, request, idempotency_key)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except FilaIndisponivel as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -49,14 +101,42 @@ def realizar_deposito(
 def realizar_saque(
     endereco_carteira: str,
     request: SaqueRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=128),
     service: MovimentacaoService = Depends(get_movimentacao_service),
 ):
     """
     Realiza um saque da carteira.
     Requer chave privada e possui taxa configurada via TAXA_SAQUE.
+    Com o header Idempotency-Key, repetições devolvem a resposta original.
+    """
+    try:
+        return service.realizar_saque(endereco_carteira, request, idempotency_key)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/depositos/lote",
+    response_model=DepositoLoteResponse,
+)
+def realizar_depositos_lote(
+    request: DepositoLoteRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=128),
+    service: MovimentacaoService = Depends(get_movimentacao_lote_service),
+):
+    """
+    Realiza vários depósitos de uma vez (ex.: crédito em massa).
+    Retorna o resultado de cada item; itens recusados não impedem os demais.
+    Com o header Idempotency-Key, repetições devolvem a resposta original.
     """
     try:
-        return service.realizar_saque(endereco_carteira, request)
+        return service.realizar_depositos_lote(request, idempotency_key)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
@@ -1,18 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header
 
 from api.services.transferencia_service import TransferenciaService
+from api.services.idempotencia_service import IdempotenciaService, ConflitoIdempotencia
 from api.persistence.repositories.transferencia_repository import TransferenciaRepository
+from api.persistence.repositories.idempotencia_repository import IdempotenciaRepository
 from api.persistence.repositories.carteira_repository import CarteiraRepository
-from api.models.operacao_models import TransferenciaRequest, TransferenciaResponse
+from api.persistence.db import UnidadeDeTrabalho, get_unidade_de_trabalho
+from api.models.operacao_models import (
+    TransferenciaRequest,
+    TransferenciaResponse,
+    TransferenciaLoteRequest,
+    TransferenciaLoteResponse,
+)
 
 
 router = APIRouter(tags=["transferências"])
 
 
-def get_transferencia_service() -> TransferenciaService:
-    transferencia_repo = TransferenciaRepository()
-    carteira_repo = CarteiraRepository()
-    return TransferenciaService(transferencia_repo, carteira_repo)
+def get_transferencia_service(
+    uow: UnidadeDeTrabalho = Depends(get_unidade_de_trabalho),
+) -> TransferenciaService:
+    # todos os repositórios usam a mesma conexão/transação da requisição
+    transferencia_repo = TransferenciaRepository(uow.conn)
+    carteira_repo = CarteiraRepository(uow.conn)
+    idempotencia = IdempotenciaService(IdempotenciaRepository(uow.conn))
+    return TransferenciaService(transferencia_repo, carteira_repo, uow, idempotencia)
+
+
+def get_transferencia_lote_service() -> TransferenciaService:
+    # sem unidade de trabalho: o pagamento confirma um bloco por transação, e
+    # a Idempotency-Key é reservada e registrada cada uma na sua transação
+    return TransferenciaService(
+        TransferenciaRepository(),
+        CarteiraRepository(),
+        idempotencia=IdempotenciaService(IdempotenciaRepository()),
+    )
 
 
 @router.post(
@@ -23,15 +47,45 @@ def get_transferencia_service() -> TransferenciaService:
 def realizar_transferencia(
     endereco_origem: str,
     request: TransferenciaRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=128),
     service: TransferenciaService = Depends(get_transferencia_service),
 ):
     """
     Realiza transferência entre carteiras.
     Requer chave privada da origem, possui taxa paga pela origem.
     Destino recebe o valor integral.
+    Com o header Idempotency-Key, repetições devolvem a resposta original.
+    """
+    try:
+        return service.realizar_transferencia(endereco_origem, request, idempotency_key)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post(
+    "/carteiras/{endereco_origem}/transferencias/lote",
+    response_model=TransferenciaLoteResponse,
+)
+def realizar_transferencias_lote(
+    endereco_origem: str,
+    request: TransferenciaLoteRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", min_length=1, max_length=128),
+    service: TransferenciaService = Depends(get_transferencia_lote_service),
+):
+    """
+    Paga vários destinos a partir de uma carteira (ex.: folha de pagamento).
+    Requer chave privada da origem, que paga a taxa de cada transferência.
+    Retorna o resultado de cada destino.
+    Com o header Idempotency-Key, repetições devolvem a resposta original.
     """
     try:
-        return service.realizar_transferencia(endereco_origem, request)
+        return service.realizar_transferencias_lote(endereco_origem, request, idempotency_key)
+    except ConflitoIdempotencia as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
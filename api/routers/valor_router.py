@@ -0,0 +1,66 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
+
+from api.services.valor_service import ValorCarteiraService, CarteiraNaoEncontrada
+from api.services.coinbase_service import CoinbaseService
+from api.routers.conversao_router import get_coinbase_service
+from api.persistence.repositories.carteira_repository import AsyncCarteiraRepository
+from api.persistence.repositories.moeda_repository import AsyncMoedaRepository
+from api.models.carteira_models import (
+    ValorCarteiraResponse,
+    ValorCarteirasRequest,
+    ValorCarteirasResponse,
+)
+
+
+router = APIRouter(tags=["carteiras"])
+
+
+def get_valor_service(
+    request: Request,
+    coinbase_service: CoinbaseService = Depends(get_coinbase_service),
+) -> ValorCarteiraService:
+    # só leitura: sem unidade de trabalho, cada consulta pega uma conexão do pool
+    return ValorCarteiraService(
+        AsyncCarteiraRepository(),
+        AsyncMoedaRepository(),
+        coinbase_service,
+        matriz_cotacoes=request.app.state.matriz_cotacoes,
+    )
+
+
+@router.get("/carteiras/{endereco_carteira}/valor", response_model=ValorCarteiraResponse)
+async def avaliar_carteira(
+    endereco_carteira: str,
+    moeda: str = Query("USD", min_length=1, max_length=10),
+    service: ValorCarteiraService = Depends(get_valor_service),
+):
+    """
+    Valor total da carteira na moeda de referência, com o valor de cada
+    moeda e a cotação (e quando foi obtida) usada em cada conversão.
+    """
+    try:
+        return await service.avaliar(endereco_carteira, moeda)
+    except CarteiraNaoEncontrada as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.post("/carteiras/valor", response_model=ValorCarteirasResponse)
+async def avaliar_carteiras(
+    request: ValorCarteirasRequest,
+    service: ValorCarteiraService = Depends(get_valor_service),
+):
+    """
+    Valor de várias carteiras na mesma moeda de referência. As cotações
+    de todas as moedas envolvidas são buscadas uma vez, em paralelo;
+    endereços inexistentes voltam em nao_encontradas.
+    """
+    try:
+        return await service.avaliar_lote(request.enderecos, request.moeda)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,8 +1,20 @@
-from typing import List
+import json
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 
 from api.persistence.repositories.carteira_repository import CarteiraRepository
-from api.models.carteira_models import Carteira, CarteiraCriada
-from api.models.operacao_models import Saldo
+from api.persistence.repositories.moeda_repository import MoedaRepository
+from api.respostas_json import calcular_etag, codificar, etag_corresponde
+from api.services.cursor import codificar_cursor, decodificar_cursor
+from api.models.carteira_models import Carteira, CarteiraCriada, SlotsSaldo
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[datetime, str]:
+    data, endereco = decodificar_cursor(cursor, 2)
+    try:
+        return datetime.fromisoformat(data), endereco
+    except ValueError:
+        raise ValueError("Cursor inválido")
 
 
 class CarteiraService:
@@ -20,6 +32,17 @@ class CarteiraService:
             chave_privada=row["chave_privada"],
         )
 
+    def criar_lote(self, quantidade: int) -> Iterator[str]:
+        """
+        Cria carteiras em lote e gera uma linha NDJSON por carteira
+        (endereço, data de criação, status e chave privada), bloco a bloco.
+        """
+        for bloco in self.carteira_repo.criar_lote(quantidade):
+            yield "".join(
+                json.dumps({**c, "data_criacao": c["data_criacao"].isoformat()}) + "\n"
+                for c in bloco
+            )
+
     def buscar_por_endereco(self, endereco_carteira: str) -> Carteira:
         row = self.carteira_repo.buscar_por_endereco(endereco_carteira)
         if not row:
@@ -31,18 +54,44 @@ class CarteiraService:
             status=row["status"],
         )
 
-    def listar(self) -> List[Carteira]:
-        rows = self.carteira_repo.listar()
-        return [
-            Carteira(
-                endereco_carteira=r["endereco_carteira"],
-                data_criacao=r["data_criacao"],
-                status=r["status"],
-            )
-            for r in rows
-        ]
+    def listar(
+        self,
+        limite: int,
+        cursor: Optional[str] = None,
+        status: Optional[str] = None,
+        criada_de: Optional[datetime] = None,
+        criada_ate: Optional[datetime] = None,
+        incluir_total: bool = False,
+    ) -> Dict[str, Any]:
+        """
+        Uma página de carteiras. `proximo_cursor` aponta para a página
+        seguinte (None na última); os filtros devem se repetir entre páginas.
+        Retorna os dados no formato de CarteiraPagina, com as linhas do
+        banco como estão (ver api/respostas_json.py).
+        """
+        apos = _decodificar_cursor(cursor) if cursor else None
+        # um item a mais só para saber se existe próxima página
+        rows = self.carteira_repo.listar(limite + 1, apos, status, criada_de, criada_ate)
+
+        proximo_cursor = None
+        if len(rows) > limite:
+            rows = rows[:limite]
+            ultimo = rows[-1]
+            proximo_cursor = codificar_cursor(ultimo["data_criacao"].isoformat(), ultimo["endereco_carteira"])
+
+        total_aproximado = None
+        if incluir_total:
+            total_aproximado = self.carteira_repo.estimar_total(status, criada_de, criada_ate)
+
+        return {
+            "itens": rows,
+            "proximo_cursor": proximo_cursor,
+            "total_aproximado": total_aproximado,
+        }
 
     def bloquear(self, endereco_carteira: str) -> Carteira:
+        # o status não fica em cache: as operações o leem na própria
+        # transação, então a carteira é recusada já na próxima operação
         row = self.carteira_repo.atualizar_status(endereco_carteira, "BLOQUEADA")
         if not row:
             raise ValueError("Carteira não encontrada")
@@ -53,28 +102,60 @@ class CarteiraService:
             status=row["status"],
         )
 
-    def buscar_saldos(self, endereco_carteira: str) -> List[Saldo]:
-        """Retorna todos os saldos da carteira"""
+    def definir_slots_saldo(self, endereco_carteira: str, slots: int) -> SlotsSaldo:
+        """
+        Ativa (slots > 1) ou desativa (slots = 1) o saldo fragmentado da
+        carteira. Os slots que sobrarem são juntados pelo compactador.
+        """
+        if not self.carteira_repo.definir_slots_saldo(endereco_carteira, slots):
+            raise ValueError("Carteira não encontrada")
+        return SlotsSaldo(endereco_carteira=endereco_carteira, slots=slots)
+
+    def buscar_saldos(self, endereco_carteira: str) -> List[Dict[str, Any]]:
+        """Retorna todos os saldos da carteira (no formato de Saldo)"""
         # Primeiro verifica se a carteira existe
         carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
         if not carteira:
             raise ValueError("Carteira não encontrada")
         
-        rows = self.carteira_repo.buscar_saldos(endereco_carteira)
-        return [
-            Saldo(
-                codigo_moeda=r["codigo_moeda"],
-                nome_moeda=r["nome_moeda"],
-                tipo_moeda=r["tipo_moeda"],
-                saldo=r["saldo"],
-            )
-            for r in rows
-        ]
+        return self.carteira_repo.buscar_saldos(endereco_carteira)
+
+    def buscar_saldos_serializados(
+        self,
+        endereco_carteira: str,
+        if_none_match: Optional[str] = None,
+    ) -> Tuple[str, Optional[bytes]]:
+        """
+        (ETag, corpo JSON) dos saldos; corpo None quando a ETag atual está
+        em if_none_match (304).
+
+        Carteira comum: a ETag vem da versão do saldo gravada no banco (e
+        do catálogo de moedas) e é comparada antes de ler os saldos, então
+        um 304 custa uma consulta. Carteira fragmentada não mantém versão:
+        os saldos são lidos e a ETag é o hash do corpo. Nos dois casos a
+        ETag vale igual em qualquer processo.
+        """
+        catalogo = codificar(MoedaRepository().listar())
+
+        def etag_da_versao(versao: int) -> str:
+            return calcular_etag(b"%d:" % versao + catalogo)
+
+        lido = self.carteira_repo.buscar_saldos_versionados(
+            endereco_carteira,
+            lambda versao: etag_corresponde(if_none_match, etag_da_versao(versao)),
+        )
+        if lido is None:
+            raise ValueError("Carteira não encontrada")
+
+        corpo = None if lido["saldos"] is None else codificar(lido["saldos"])
+        if lido["versao"] is None:
+            return calcular_etag(corpo), corpo
+        return etag_da_versao(lido["versao"]), corpo
 
     def validar_carteira_ativa(self, endereco_carteira: str) -> None:
         """Valida se a carteira existe e está ativa"""
-        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
-        if not carteira:
+        status = self.carteira_repo.buscar_status(endereco_carteira)
+        if status is None:
             raise ValueError("Carteira não encontrada")
-        if carteira["status"] != "ATIVA":
+        if status != "ATIVA":
             raise ValueError("Carteira está bloqueada")
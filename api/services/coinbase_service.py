@@ -1,6 +1,53 @@
+import os
+import time
 import httpx
 from decimal import Decimal
-from typing import Dict
+from typing import Dict, Optional
+
+from api import metricas
+from api.services.cotacao_cache import CotacaoCache, Cotacao
+
+
+# Cache compartilhado por todas as requisições do processo
+cotacao_cache = CotacaoCache.a_partir_do_env()
+
+
+def criar_cliente_coinbase() -> httpx.AsyncClient:
+    """
+    Cria o cliente HTTP de longa duração usado para falar com a Coinbase.
+    As conexões ficam abertas (keep-alive) e são reaproveitadas entre
+    requisições, evitando um handshake TCP+TLS a cada conversão.
+    """
+    limites = httpx.Limits(
+        max_connections=int(os.getenv("COINBASE_MAX_CONEXOES", "20")),
+        max_keepalive_connections=int(os.getenv("COINBASE_MAX_CONEXOES_OCIOSAS", "10")),
+        keepalive_expiry=float(os.getenv("COINBASE_KEEPALIVE_SEGUNDOS", "60")),
+    )
+    timeout = httpx.Timeout(
+        float(os.getenv("COINBASE_TIMEOUT_SEGUNDOS", "10")),
+        connect=float(os.getenv("COINBASE_TIMEOUT_CONEXAO_SEGUNDOS", "5")),
+        pool=float(os.getenv("COINBASE_TIMEOUT_POOL_SEGUNDOS", "5")),
+    )
+    http2 = os.getenv("COINBASE_HTTP2", "false").lower() in ("1", "true", "sim")
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            raise RuntimeError("COINBASE_HTTP2 exige o pacote opcional: pip install 'httpx[http2]'")
+
+    return httpx.AsyncClient(limits=limites, timeout=timeout, http2=http2)
+
+
+def _motivo_falha(erro: Exception) -> str:
+    if isinstance(erro, httpx.TimeoutException):
+        return "timeout"
+    if isinstance(erro, httpx.TransportError):
+        return "rede"
+    return "resposta_invalida"
+
+
+class ParNaoCotado(ValueError):
+    """A Coinbase não cota o par diretamente (HTTP 404)."""
 
 
 class CoinbaseService:
@@ -9,31 +56,56 @@ class CoinbaseService:
     """
     BASE_URL = "https://api.coinbase.com/v2/prices"
 
+    def __init__(self, client: httpx.AsyncClient, cache: Optional[CotacaoCache] = None):
+        self.client = client
+        self.cache = cache or cotacao_cache
+        # COINBASE_BASE_URL aponta para outro servidor (ex.: o stub dos benchmarks)
+        self.base_url = os.getenv("COINBASE_BASE_URL", self.BASE_URL).rstrip("/")
+
     async def obter_cotacao(self, moeda_origem: str, moeda_destino: str) -> Decimal:
         """
         Obtém a cotação atual de moeda_origem para moeda_destino.
         Exemplo: BTC-USD retorna quanto vale 1 BTC em USD.
         """
-        url = f"{self.BASE_URL}/{moeda_origem}-{moeda_destino}/spot"
-        
-        async with httpx.AsyncClient() as client:
+        cotacao = await self.obter_cotacao_detalhada(moeda_origem, moeda_destino)
+        return cotacao.valor
+
+    async def obter_cotacao_detalhada(self, moeda_origem: str, moeda_destino: str) -> Cotacao:
+        """
+        Igual a obter_cotacao, mas informa também quando a cotação foi obtida
+        e a sua idade (pode vir do cache).
+        """
+        return await self.cache.obter(
+            (moeda_origem, moeda_destino),
+            lambda: self._consultar_coinbase(moeda_origem, moeda_destino),
+        )
+
+    async def _consultar_coinbase(self, moeda_origem: str, moeda_destino: str) -> Decimal:
+        url = f"{self.base_url}/{moeda_origem}-{moeda_destino}/spot"
+
+        inicio = time.perf_counter()
+        try:
             try:
-                response = await client.get(url, timeout=10.0)
-                response.raise_for_status()
-                data = response.json()
-                
-                # A API retorna: {"data": {"base": "BTC", "currency": "USD", "amount": "43250.00"}}
-                amount = data.get("data", {}).get("amount")
-                
-                if not amount:
-                    raise ValueError("Resposta da API Coinbase inválida")
-                
-                return Decimal(amount)
-            
-            except httpx.HTTPStatusError as e:
-                if e.response.status_code == 404:
-                    raise ValueError(f"Par de moedas {moeda_origem}-{moeda_destino} não encontrado na Coinbase")
-                raise ValueError(f"Erro ao consultar cotação: {e}")
-            
-            except Exception as e:
-                raise ValueError(f"Erro ao obter cotação da Coinbase: {str(e)}")
+                response = await self.client.get(url)
+            finally:
+                metricas.coinbase_duracao.observar(time.perf_counter() - inicio)
+            response.raise_for_status()
+            data = response.json()
+
+            # A API retorna: {"data": {"base": "BTC", "currency": "USD", "amount": "43250.00"}}
+            amount = data.get("data", {}).get("amount")
+
+            if not amount:
+                raise ValueError("Resposta da API Coinbase inválida")
+
+            return Decimal(amount)
+
+        except httpx.HTTPStatusError as e:
+            metricas.coinbase_falhas.incrementar(f"http_{e.response.status_code}")
+            if e.response.status_code == 404:
+                raise ParNaoCotado(f"Par de moedas {moeda_origem}-{moeda_destino} não encontrado na Coinbase")
+            raise ValueError(f"Erro ao consultar cotação: {e}")
+
+        except Exception as e:
+            metricas.coinbase_falhas.incrementar(_motivo_falha(e))
+            raise ValueError(f"Erro ao obter cotação da Coinbase: {str(e)}")
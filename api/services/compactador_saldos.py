@@ -0,0 +1,101 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict
+
+from sqlalchemy import text
+
+from api.persistence.db import get_async_connection
+from api.persistence.repositories.saldo_repository import AsyncSaldoRepository
+
+
+logger = logging.getLogger(__name__)
+
+
+# Lock nomeado do MySQL: com vários workers (ou hosts), só um compacta a
+# cada ciclo. O lock é da sessão; se a conexão cair, o servidor o libera.
+_NOME_LOCK = "carteira_compactador_saldos"
+_SQL_OBTER_LOCK = text("SELECT GET_LOCK(:nome, 0)")
+_SQL_LIBERAR_LOCK = text("SELECT RELEASE_LOCK(:nome)")
+
+
+class CompactadorSaldos:
+    """
+    Tarefa de fundo que junta no slot 0 os saldos divididos em vários slots
+    (carteiras com carteira.slots_saldo > 1, ou que deixaram de ser).
+    Cada par (endereço, moeda) é compactado em uma transação curta, para
+    travar os slots de uma carteira muito movimentada pelo menor tempo
+    possível. Os créditos seguintes voltam a se espalhar pelos slots.
+
+    Cada ciclo roda só no processo que obtiver o lock nomeado; os demais
+    pulam o ciclo.
+    """
+
+    def __init__(self, pares_por_ciclo: int):
+        self.pares_por_ciclo = max(1, pares_por_ciclo)
+        self.saldo_repo = AsyncSaldoRepository()
+        self.ciclos = 0
+        self.ciclos_sem_lock = 0
+        self.compactados = 0
+        self.falhas = 0
+
+    @classmethod
+    def a_partir_do_env(cls) -> "CompactadorSaldos":
+        return cls(pares_por_ciclo=int(os.getenv("SALDO_COMPACTACAO_PARES_POR_CICLO", "1000")))
+
+    async def compactar_pendentes(self) -> int:
+        """Compacta até pares_por_ciclo pares; retorna quantos foram compactados."""
+        async with get_async_connection() as conn:
+            pendentes = await self.saldo_repo.listar_pendentes_compactacao(conn, self.pares_por_ciclo)
+
+        compactados = 0
+        for endereco, moeda in pendentes:
+            try:
+                async with get_async_connection() as conn:
+                    await self.saldo_repo.compactar(conn, endereco, moeda)
+                compactados += 1
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # ex.: lock wait timeout em uma carteira muito disputada; fica para o próximo ciclo
+                self.falhas += 1
+                logger.exception("Falha ao compactar o saldo %s/%s", endereco, moeda)
+
+        self.ciclos += 1
+        self.compactados += compactados
+        return compactados
+
+    async def executar_ciclo(self) -> int:
+        """Um ciclo sob o lock nomeado; retorna 0 se outro processo o detém."""
+        async with get_async_connection() as conn:
+            if not (await conn.execute(_SQL_OBTER_LOCK, {"nome": _NOME_LOCK})).scalar():
+                self.ciclos_sem_lock += 1
+                return 0
+            try:
+                return await self.compactar_pendentes()
+            finally:
+                await conn.execute(_SQL_LIBERAR_LOCK, {"nome": _NOME_LOCK})
+
+    async def executar(self, intervalo_segundos: float) -> None:
+        """
+        Laço da tarefa de fundo: um ciclo a cada intervalo_segundos. O
+        primeiro ciclo espera o intervalo, para não abrir conexão na subida.
+        """
+        while True:
+            await asyncio.sleep(intervalo_segundos)
+            try:
+                await self.executar_ciclo()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.falhas += 1
+                logger.exception("Falha no ciclo de compactação de saldos")
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "pares_por_ciclo": self.pares_por_ciclo,
+            "ciclos": self.ciclos,
+            "ciclos_sem_lock": self.ciclos_sem_lock,
+            "compactados": self.compactados,
+            "falhas": self.falhas,
+        }
@@ -1,69 +1,138 @@
-from decimal import Decimal
+from typing import Optional
 
-from api.persistence.repositories.conversao_repository import ConversaoRepository
-from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.persistence.repositories.conversao_repository import AsyncConversaoRepository
+from api.persistence.repositories.carteira_repository import AsyncCarteiraRepository
+from api.persistence.repositories.idempotencia_repository import AsyncIdempotenciaRepository
 from api.services.coinbase_service import CoinbaseService
+from api.services.cotacao_cache import Cotacao
+from api.services.matriz_cotacoes import MatrizCotacoes
+from api.persistence.db import AsyncUnidadeDeTrabalho
+from api.services.idempotencia_service import AsyncIdempotenciaService
 from api.models.operacao_models import ConversaoRequest, ConversaoResponse
 
 
 class ConversaoService:
     """
     Serviço para conversão entre moedas.
+
+    Repetições de uma Idempotency-Key e carteiras inexistentes, bloqueadas
+    ou com chave errada são respondidas antes da cotação, sem chamar a
+    Coinbase. A cotação é obtida antes de abrir a unidade de trabalho:
+    enquanto a Coinbase responde, a requisição não segura conexão do pool,
+    transação nem lock. A transação cobre a reserva da chave, a revalidação
+    do status e o débito/crédito.
     """
 
     def __init__(
         self,
-        conversao_repo: ConversaoRepository,
-        carteira_repo: CarteiraRepository,
-        coinbase_service: CoinbaseService
+        coinbase_service: CoinbaseService,
+        matriz_cotacoes: Optional[MatrizCotacoes] = None,
     ):
-        self.conversao_repo = conversao_repo
-        self.carteira_repo = carteira_repo
         self.coinbase_service = coinbase_service
+        self.matriz_cotacoes = matriz_cotacoes
 
     async def realizar_conversao(
         self,
         endereco_carteira: str,
-        request: ConversaoRequest
+        request: ConversaoRequest,
+        chave_idempotencia: Optional[str] = None
     ) -> ConversaoResponse:
         """
         Realiza conversão entre moedas com validação de chave privada.
         """
-        # Valida se a carteira existe e está ativa
-        self._validar_carteira_ativa(endereco_carteira)
-
-        # Valida chave privada
-        if not self.carteira_repo.validar_chave_privada(
-            endereco_carteira,
-            request.chave_privada
-        ):
-            raise ValueError("Chave privada inválida")
-
         # Valida se moedas são diferentes
         if request.moeda_origem == request.moeda_destino:
             raise ValueError("Moedas de origem e destino devem ser diferentes")
 
-        # Obtém cotação da Coinbase
-        cotacao = await self.coinbase_service.obter_cotacao(
-            request.moeda_origem,
-            request.moeda_destino
-        )
+        # Repetição de uma chave já executada: resposta gravada, sem cotação
+        if chave_idempotencia is not None:
+            repetida = await AsyncIdempotenciaService(AsyncIdempotenciaRepository()).consultar(
+                chave_idempotencia, "CONVERSAO", endereco_carteira, request, ConversaoResponse
+            )
+            if repetida is not None:
+                return repetida
+
+        # Carteira e chave privada conferidas antes de chamar a Coinbase
+        # (consultas curtas, cada uma com uma conexão do pool)
+        await self._validar_carteira(AsyncCarteiraRepository(), endereco_carteira, request.chave_privada)
+
+        cotacao = await self._obter_cotacao(request.moeda_origem, request.moeda_destino)
+
+        uow = await AsyncUnidadeDeTrabalho().iniciar()
+        try:
+            return await self._converter(uow, endereco_carteira, request, cotacao, chave_idempotencia)
+        finally:
+            await uow.close()
+
+    async def _obter_cotacao(self, moeda_origem: str, moeda_destino: str) -> Cotacao:
+        # Usa a matriz de cotações em memória quando ativa e atualizada;
+        # senão consulta a Coinbase (ou o cache de cotações)
+        if self.matriz_cotacoes is not None:
+            cotacao = self.matriz_cotacoes.obter(moeda_origem, moeda_destino)
+            if cotacao is not None:
+                return cotacao
+        return await self.coinbase_service.obter_cotacao_detalhada(moeda_origem, moeda_destino)
+
+    async def _converter(
+        self,
+        uow: AsyncUnidadeDeTrabalho,
+        endereco_carteira: str,
+        request: ConversaoRequest,
+        cotacao: Cotacao,
+        chave_idempotencia: Optional[str],
+    ) -> ConversaoResponse:
+        # todos os repositórios usam a mesma conexão/transação
+        conversao_repo = AsyncConversaoRepository(uow.conn)
+        carteira_repo = AsyncCarteiraRepository(uow.conn)
+        idempotencia = AsyncIdempotenciaService(AsyncIdempotenciaRepository(uow.conn))
+
+        # Outra requisição com a mesma chave pode ter confirmado enquanto a
+        # cotação era obtida: devolve a resposta dela (a cotação é descartada)
+        if chave_idempotencia is not None:
+            repetida = await idempotencia.reservar(
+                chave_idempotencia, "CONVERSAO", endereco_carteira, request, ConversaoResponse
+            )
+            if repetida is not None:
+                return repetida
+
+        # Revalida o status na transação: um bloqueio feito durante a
+        # cotação vale para esta conversão
+        await self._validar_carteira_ativa(carteira_repo, endereco_carteira)
 
         # Realiza conversão
-        row = self.conversao_repo.realizar_conversao(
+        row = await conversao_repo.realizar_conversao(
             endereco_carteira=endereco_carteira,
             moeda_origem=request.moeda_origem,
             moeda_destino=request.moeda_destino,
             valor_origem=request.valor_origem,
-            cotacao=cotacao
+            cotacao=cotacao.valor
         )
+        resposta = ConversaoResponse(**row, idade_cotacao_segundos=cotacao.idade_segundos)
+        if chave_idempotencia is not None:
+            await idempotencia.registrar(
+                chave_idempotencia, "CONVERSAO", endereco_carteira, request, resposta
+            )
+        await uow.commit()
+
+        return resposta
 
-        return ConversaoResponse(**row)
+    @classmethod
+    async def _validar_carteira(
+        cls,
+        carteira_repo: AsyncCarteiraRepository,
+        endereco_carteira: str,
+        chave_privada: str,
+    ) -> None:
+        """Valida se a carteira existe, está ativa e se a chave privada confere"""
+        await cls._validar_carteira_ativa(carteira_repo, endereco_carteira)
+        if not await carteira_repo.validar_chave_privada(endereco_carteira, chave_privada):
+            raise ValueError("Chave privada inválida")
 
-    def _validar_carteira_ativa(self, endereco_carteira: str) -> None:
+    @staticmethod
+    async def _validar_carteira_ativa(carteira_repo: AsyncCarteiraRepository, endereco_carteira: str) -> None:
         """Valida se a carteira existe e está ativa"""
-        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
-        if not carteira:
+        status = await carteira_repo.buscar_status(endereco_carteira)
+        if status is None:
             raise ValueError("Carteira não encontrada")
-        if carteira["status"] != "ATIVA":
+        if status != "ATIVA":
             raise ValueError("Carteira está bloqueada")
@@ -0,0 +1,134 @@
+import os
+import time
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Awaitable, Callable, Dict, Tuple, Any
+
+
+ParMoedas = Tuple[str, str]
+
+
+@dataclass(frozen=True)
+class Cotacao:
+    """Cotação de um par de moedas e o momento em que foi obtida na Coinbase."""
+    valor: Decimal
+    obtida_em: datetime
+    idade_segundos: float
+
+
+@dataclass
+class _Entrada:
+    valor: Decimal
+    obtida_em: datetime
+    monotonic: float
+
+    def para_cotacao(self) -> Cotacao:
+        return Cotacao(
+            valor=self.valor,
+            obtida_em=self.obtida_em,
+            idade_segundos=max(0.0, time.monotonic() - self.monotonic),
+        )
+
+
+def _consumir_excecao(tarefa: asyncio.Task) -> None:
+    # evita o aviso "exception was never retrieved" quando todos os
+    # interessados na consulta foram cancelados antes do término
+    if not tarefa.cancelled():
+        tarefa.exception()
+
+
+class CotacaoCache:
+    """
+    Cache em memória de cotações por par (moeda_origem, moeda_destino).
+
+    - Dentro do TTL a cotação é servida do cache (hit).
+    - Fora do TTL uma nova consulta é feita; consultas simultâneas do mesmo
+      par são agrupadas em uma única chamada à Coinbase (single-flight).
+    - Se a consulta falhar, a última cotação ainda é aceita enquanto a sua
+      idade não passar de idade_maxima_segundos.
+    """
+
+    def __init__(self, ttl_segundos: float, idade_maxima_segundos: float):
+        self.ttl_segundos = ttl_segundos
+        self.idade_maxima_segundos = max(idade_maxima_segundos, ttl_segundos)
+        self._entradas: Dict[ParMoedas, _Entrada] = {}
+        self._em_andamento: Dict[ParMoedas, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalescidos = 0
+        self.obsoletos = 0
+
+    @classmethod
+    def a_partir_do_env(cls) -> "CotacaoCache":
+        return cls(
+            ttl_segundos=float(os.getenv("COTACAO_CACHE_TTL_SEGUNDOS", "2")),
+            idade_maxima_segundos=float(os.getenv("COTACAO_CACHE_IDADE_MAXIMA_SEGUNDOS", "30")),
+        )
+
+    async def obter(
+        self,
+        par: ParMoedas,
+        buscar: Callable[[], Awaitable[Decimal]],
+    ) -> Cotacao:
+        """
+        Retorna a cotação do par, consultando `buscar` apenas quando necessário.
+        """
+        entrada = self._entradas.get(par)
+        if entrada and time.monotonic() - entrada.monotonic <= self.ttl_segundos:
+            self.hits += 1
+            return entrada.para_cotacao()
+
+        tarefa = self._em_andamento.get(par)
+        if tarefa is not None:
+            self.coalescidos += 1
+        else:
+            self.misses += 1
+            tarefa = asyncio.ensure_future(self._atualizar(par, buscar))
+            tarefa.add_done_callback(_consumir_excecao)
+            self._em_andamento[par] = tarefa
+
+        # shield: se quem espera for cancelado, a consulta continua para os demais
+        entrada = await asyncio.shield(tarefa)
+        return entrada.para_cotacao()
+
+    async def _atualizar(
+        self,
+        par: ParMoedas,
+        buscar: Callable[[], Awaitable[Decimal]],
+    ) -> _Entrada:
+        try:
+            valor = await buscar()
+        except Exception:
+            anterior = self._entradas.get(par)
+            if anterior and time.monotonic() - anterior.monotonic <= self.idade_maxima_segundos:
+                self.obsoletos += 1
+                return anterior
+            raise
+        finally:
+            self._em_andamento.pop(par, None)
+
+        entrada = _Entrada(
+            valor=valor,
+            obtida_em=datetime.now(timezone.utc),
+            monotonic=time.monotonic(),
+        )
+        self._entradas[par] = entrada
+        return entrada
+
+    def limpar(self) -> None:
+        self._entradas.clear()
+
+    def estatisticas(self) -> Dict[str, Any]:
+        consultas = self.hits + self.misses + self.coalescidos
+        return {
+            "ttl_segundos": self.ttl_segundos,
+            "idade_maxima_segundos": self.idade_maxima_segundos,
+            "pares_em_cache": len(self._entradas),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalescidos": self.coalescidos,
+            "obsoletos": self.obsoletos,
+            "taxa_acerto": (self.hits + self.coalescidos) / consultas if consultas else 0.0,
+        }
@@ -0,0 +1,19 @@
+import base64
+import binascii
+from typing import List
+
+
+def codificar_cursor(*partes: str) -> str:
+    """Cursor opaco de paginação com a chave do último item da página."""
+    return base64.urlsafe_b64encode("|".join(partes).encode()).decode()
+
+
+def decodificar_cursor(cursor: str, quantidade: int) -> List[str]:
+    """Partes da chave gravada no cursor; ValueError se o cursor for inválido."""
+    try:
+        partes = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", quantidade - 1)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("Cursor inválido")
+    if len(partes) != quantidade:
+        raise ValueError("Cursor inválido")
+    return partes
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from api.persistence.repositories.extrato_repository import AsyncExtratoRepository, COLUNAS_EXTRATO
+from api.persistence.repositories.carteira_repository import AsyncCarteiraRepository
+
+
+def _serializar(valor: Any) -> Any:
+    if isinstance(valor, Decimal):
+        return str(valor)
+    if isinstance(valor, datetime):
+        return valor.isoformat()
+    return valor
+
+
+def _linhas_ndjson(lote: List[Dict[str, Any]]) -> str:
+    return "".join(
+        json.dumps({c: _serializar(r[c]) for c in COLUNAS_EXTRATO}, ensure_ascii=False) + "\n"
+        for r in lote
+    )
+
+
+def _linhas_csv(lote: List[Dict[str, Any]], cabecalho: bool = False) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if cabecalho:
+        writer.writerow(COLUNAS_EXTRATO)
+    writer.writerows([_serializar(r[c]) for c in COLUNAS_EXTRATO] for r in lote)
+    return buffer.getvalue()
+
+
+class ExtratoService:
+    """
+    Exportação do histórico em NDJSON ou CSV, escrita aos poucos: cada lote
+    lido do banco vira um pedaço da resposta e é descartado em seguida.
+    """
+
+    def __init__(self, extrato_repo: AsyncExtratoRepository, carteira_repo: AsyncCarteiraRepository):
+        self.extrato_repo = extrato_repo
+        self.carteira_repo = carteira_repo
+
+    async def validar_carteira(self, endereco_carteira: str) -> None:
+        """Chamado antes de iniciar a resposta, para ainda poder devolver 404"""
+        carteira = await self.carteira_repo.buscar_por_endereco(endereco_carteira)
+        if not carteira:
+            raise ValueError("Carteira não encontrada")
+
+    async def exportar(
+        self,
+        formato: str,
+        endereco_carteira: Optional[str] = None,
+        data_de: Optional[datetime] = None,
+        data_ate: Optional[datetime] = None,
+    ) -> AsyncIterator[str]:
+        if formato == "csv":
+            yield _linhas_csv([], cabecalho=True)
+
+        async for lote in self.extrato_repo.stream_lancamentos(endereco_carteira, data_de, data_ate):
+            yield _linhas_csv(lote) if formato == "csv" else _linhas_ndjson(lote)
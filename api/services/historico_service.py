@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Optional, Tuple
+
+from api.persistence.repositories.historico_repository import HistoricoRepository
+from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.services.cursor import codificar_cursor, decodificar_cursor
+from api.models.operacao_models import HistoricoItem, HistoricoPagina
+
+
+def _decodificar_cursor(cursor: str) -> Tuple[datetime, int, int]:
+    data, fonte, id_ = decodificar_cursor(cursor, 3)
+    try:
+        return datetime.fromisoformat(data), int(fonte), int(id_)
+    except ValueError:
+        raise ValueError("Cursor inválido")
+
+
+class HistoricoService:
+    """
+    Serviço do histórico unificado de operações da carteira.
+    """
+
+    def __init__(self, historico_repo: HistoricoRepository, carteira_repo: CarteiraRepository):
+        self.historico_repo = historico_repo
+        self.carteira_repo = carteira_repo
+
+    def validar_carteira(self, endereco_carteira: str) -> None:
+        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
+        if not carteira:
+            raise ValueError("Carteira não encontrada")
+
+    def listar(
+        self,
+        endereco_carteira: str,
+        limite: int,
+        cursor: Optional[str] = None,
+        codigo_moeda: Optional[str] = None,
+        tipo: Optional[str] = None,
+    ) -> HistoricoPagina:
+        """
+        Uma página do histórico, da operação mais recente para a mais antiga.
+        """
+        apos = _decodificar_cursor(cursor) if cursor else None
+        # um item a mais só para saber se existe próxima página
+        rows = self.historico_repo.listar(endereco_carteira, limite + 1, apos, codigo_moeda, tipo)
+
+        proximo_cursor = None
+        if len(rows) > limite:
+            rows = rows[:limite]
+            ultimo = rows[-1]
+            proximo_cursor = codificar_cursor(
+                ultimo["data_operacao"].isoformat(), str(ultimo["fonte"]), str(ultimo["id"])
+            )
+
+        return HistoricoPagina(
+            itens=[HistoricoItem(**{k: v for k, v in r.items() if k != "fonte"}) for r in rows],
+            proximo_cursor=proximo_cursor,
+        )
@@ -0,0 +1,154 @@
+import hashlib
+import json
+from typing import Optional, Type, TypeVar
+
+from pydantic import BaseModel
+
+from api.persistence.repositories.idempotencia_repository import (
+    IdempotenciaRepository,
+    AsyncIdempotenciaRepository,
+)
+
+
+M = TypeVar("M", bound=BaseModel)
+
+
+class ConflitoIdempotencia(Exception):
+    """A Idempotency-Key já foi usada com outra requisição."""
+
+
+def _hash_requisicao(operacao: str, endereco_carteira: str, request: BaseModel) -> str:
+    corpo = json.dumps(request.model_dump(mode="json"), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{operacao}|{endereco_carteira}|{corpo}".encode()).hexdigest()
+
+
+def _resposta_gravada(registro: dict, hash_requisicao: str, modelo: Type[M]) -> M:
+    if registro["hash_requisicao"] != hash_requisicao:
+        raise ConflitoIdempotencia("Idempotency-Key já utilizada com outra requisição")
+    if registro["resposta"] is None:
+        # só nos lotes, que reservam a chave em uma transação própria: a
+        # primeira execução ainda não terminou (ou parou no meio)
+        raise ConflitoIdempotencia("Requisição com esta Idempotency-Key ainda em processamento")
+    return modelo.model_validate_json(registro["resposta"])
+
+
+def _repeticao(registro: Optional[dict], hash_requisicao: str, modelo: Type[M]) -> Optional[M]:
+    if registro is None:
+        return None
+    if registro["resposta"] is None and registro["hash_requisicao"] == hash_requisicao:
+        # primeira execução ainda em andamento: a reserva espera por ela
+        return None
+    return _resposta_gravada(registro, hash_requisicao, modelo)
+
+
+class IdempotenciaService:
+    """
+    Idempotency-Key das operações: a primeira execução reserva a chave e
+    grava a resposta na mesma transação da operação; as repetições recebem
+    a resposta gravada, sem refazer a operação.
+    """
+
+    def __init__(self, idempotencia_repo: IdempotenciaRepository):
+        self.idempotencia_repo = idempotencia_repo
+
+    def reservar(
+        self,
+        chave: str,
+        operacao: str,
+        endereco_carteira: str,
+        request: BaseModel,
+        modelo: Type[M]
+    ) -> Optional[M]:
+        """
+        None: esta execução reservou a chave e deve realizar a operação.
+        Caso contrário, a resposta da primeira execução.
+        """
+        hash_requisicao = _hash_requisicao(operacao, endereco_carteira, request)
+        registro = self.idempotencia_repo.reservar(endereco_carteira, chave, hash_requisicao)
+        if registro is None:
+            return None
+        return _resposta_gravada(registro, hash_requisicao, modelo)
+
+    def consultar(
+        self,
+        chave: str,
+        operacao: str,
+        endereco_carteira: str,
+        request: BaseModel,
+        modelo: Type[M]
+    ) -> Optional[M]:
+        """
+        Resposta gravada se a chave já foi executada, sem reservá-la; None
+        se a chave é nova. Serve para responder repetições antes de um
+        trabalho caro; a operação ainda passa por reservar.
+        """
+        hash_requisicao = _hash_requisicao(operacao, endereco_carteira, request)
+        return _repeticao(
+            self.idempotencia_repo.consultar(endereco_carteira, chave), hash_requisicao, modelo
+        )
+
+    def registrar(
+        self,
+        chave: str,
+        operacao: str,
+        endereco_carteira: str,
+        request: BaseModel,
+        resposta: BaseModel
+    ) -> None:
+        self.idempotencia_repo.registrar_resposta(
+            endereco_carteira,
+            chave,
+            _hash_requisicao(operacao, endereco_carteira, request),
+            resposta.model_dump_json(),
+        )
+
+
+class AsyncIdempotenciaService:
+    """
+    Versão assíncrona do IdempotenciaService.
+    """
+
+    def __init__(self, idempotencia_repo: AsyncIdempotenciaRepository):
+        self.idempotencia_repo = idempotencia_repo
+
+    async def reservar(
+        self,
+        chave: str,
+        operacao: str,
+        endereco_carteira: str,
+        request: BaseModel,
+        modelo: Type[M]
+    ) -> Optional[M]:
+        hash_requisicao = _hash_requisicao(operacao, endereco_carteira, request)
+        registro = await self.idempotencia_repo.reservar(endereco_carteira, chave, hash_requisicao)
+        if registro is None:
+            return None
+        return _resposta_gravada(registro, hash_requisicao, modelo)
+
+    async def consultar(
+        self,
+        chave: str,
+        operacao: str,
+        endereco_carteira: str,
+        request: BaseModel,
+        modelo: Type[M]
+    ) -> Optional[M]:
+        hash_requisicao = _hash_requisicao(operacao, endereco_carteira, request)
+        return _repeticao(
+            await self.idempotencia_repo.consultar(endereco_carteira, chave), hash_requisicao, modelo
+        )
+
+    async def registrar(
+        self,
+        chave: str,
+        operacao: str,
+        endereco_carteira: str,
+        request: BaseModel,
+        resposta: BaseModel
+    ) -> None:
+        await self.idempotencia_repo.registrar_resposta(
+            endereco_carteira,
+            chave,
+            _hash_requisicao(operacao, endereco_carteira, request),
+            resposta.model_dump_json(),
+        )
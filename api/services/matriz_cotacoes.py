@@ -0,0 +1,208 @@
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Callable, Awaitable, Dict, List, Optional, Set, Tuple, Any
+
+from api.services.coinbase_service import CoinbaseService, ParNaoCotado
+from api.services.cotacao_cache import Cotacao
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class _Estado:
+    codigos: Tuple[str, ...]
+    indice: Dict[str, int]
+    # matriz densa n x n guardada em lista plana: celula (i, j) = i * n + j
+    valores: List[Optional[Decimal]]
+    obtidas_em: List[float]  # epoch (segundos) de cada célula; 0 = sem cotação
+
+
+class MatrizCotacoes:
+    """
+    Matriz de cotações entre todas as moedas da tabela moeda, atualizada
+    em segundo plano.
+
+    A cada ciclo são consultados na Coinbase todos os pares que ela cota
+    diretamente; os pares que ela não cota (HTTP 404, ex.: SOL -> BRL) são
+    lembrados e não são pedidos de novo. Essas células são obtidas por
+    triangulação: cotacao(A -> B) = cotacao(A -> USD) / cotacao(B -> USD),
+    também usada quando a cotação direta estiver velha demais. Os valores
+    ficam com a precisão completa do Decimal; o arredondamento para a
+    escala do banco é feito só nos valores monetários da conversão.
+
+    Cada célula guarda o momento da cotação mais antiga usada para
+    calculá-la, e células mais velhas que idade_maxima_segundos são
+    recusadas.
+    """
+    MOEDA_PIVO = "USD"
+
+    def __init__(self, idade_maxima_segundos: float):
+        self.idade_maxima_segundos = idade_maxima_segundos
+        self._estado = _Estado(codigos=(), indice={}, valores=[], obtidas_em=[])
+        # cotações diretas da Coinbase: (origem, destino) -> (valor, epoch)
+        self._diretas: Dict[Tuple[str, str], Tuple[Decimal, float]] = {}
+        self._sem_cotacao_direta: Set[Tuple[str, str]] = set()
+        self.atualizacoes = 0
+        self.falhas = 0
+
+    @classmethod
+    def a_partir_do_env(cls) -> "MatrizCotacoes":
+        return cls(
+            idade_maxima_segundos=float(os.getenv("COTACAO_MATRIZ_IDADE_MAXIMA_SEGUNDOS", "15")),
+        )
+
+    def obter(self, moeda_origem: str, moeda_destino: str) -> Optional[Cotacao]:
+        """
+        Lê a cotação da matriz, sem nenhuma chamada de rede.
+        Retorna None se o par não existir ou a célula estiver velha demais.
+        """
+        estado = self._estado
+        i = estado.indice.get(moeda_origem)
+        j = estado.indice.get(moeda_destino)
+        if i is None or j is None:
+            return None
+
+        celula = i * len(estado.codigos) + j
+        valor = estado.valores[celula]
+        obtida_em = estado.obtidas_em[celula]
+        if valor is None:
+            return None
+
+        idade = max(0.0, time.time() - obtida_em)
+        if idade > self.idade_maxima_segundos:
+            return None
+
+        return Cotacao(
+            valor=valor,
+            obtida_em=datetime.fromtimestamp(obtida_em, timezone.utc),
+            idade_segundos=idade,
+        )
+
+    async def atualizar(self, coinbase_service: CoinbaseService, codigos: List[str]) -> None:
+        """
+        Consulta (em paralelo) todos os pares com cotação direta e
+        recalcula a matriz inteira.
+        """
+        consultados = [
+            (origem, destino)
+            for origem in codigos
+            for destino in codigos
+            if origem != destino and (origem, destino) not in self._sem_cotacao_direta
+        ]
+        resultados = await asyncio.gather(
+            *(coinbase_service.obter_cotacao_detalhada(*par) for par in consultados),
+            return_exceptions=True,
+        )
+
+        for par, resultado in zip(consultados, resultados):
+            if isinstance(resultado, ParNaoCotado):
+                # par sem cotação direta: fica por triangulação
+                self._sem_cotacao_direta.add(par)
+                self._diretas.pop(par, None)
+                continue
+            if isinstance(resultado, Exception):
+                # mantém a cotação anterior; ela será recusada quando envelhecer
+                self.falhas += 1
+                logger.warning("Falha ao atualizar cotação %s-%s: %s", *par, resultado)
+                continue
+            self._diretas[par] = (resultado.valor, resultado.obtida_em.timestamp())
+
+        self._estado = self._montar_estado(codigos)
+        self.atualizacoes += 1
+
+    def _montar_estado(self, codigos: List[str]) -> _Estado:
+        n = len(codigos)
+        valores: List[Optional[Decimal]] = [None] * (n * n)
+        obtidas_em = [0.0] * (n * n)
+
+        # perna de cada moeda contra o pivô; o pivô vale 1 contra ele mesmo
+        # e nunca envelhece
+        pernas = {
+            origem: cotacao
+            for (origem, destino), cotacao in self._diretas.items()
+            if destino == self.MOEDA_PIVO
+        }
+        pernas[self.MOEDA_PIVO] = (Decimal(1), float("inf"))
+        limite = time.time() - self.idade_maxima_segundos
+
+        for i, origem in enumerate(codigos):
+            for j, destino in enumerate(codigos):
+                if i == j:
+                    continue
+                celula = self._direta_ou_triangulada(origem, destino, pernas, limite)
+                if celula is not None:
+                    valores[i * n + j], obtidas_em[i * n + j] = celula
+
+        return _Estado(
+            codigos=tuple(codigos),
+            indice={codigo: i for i, codigo in enumerate(codigos)},
+            valores=valores,
+            obtidas_em=obtidas_em,
+        )
+
+    def _direta_ou_triangulada(
+        self,
+        origem: str,
+        destino: str,
+        pernas: Dict[str, Tuple[Decimal, float]],
+        limite: float,
+    ) -> Optional[Tuple[Decimal, float]]:
+        direta = self._diretas.get((origem, destino))
+        if direta is not None and direta[1] >= limite:
+            return direta
+
+        perna_origem = pernas.get(origem)
+        perna_destino = pernas.get(destino)
+        if perna_origem is None or perna_destino is None or not perna_destino[0]:
+            return direta
+        triangulada = (
+            perna_origem[0] / perna_destino[0],
+            min(perna_origem[1], perna_destino[1]),
+        )
+        if direta is not None and direta[1] >= triangulada[1]:
+            return direta
+        return triangulada
+
+    async def executar(
+        self,
+        coinbase_service: CoinbaseService,
+        carregar_codigos: Callable[[], Awaitable[List[str]]],
+        intervalo_segundos: float,
+    ) -> None:
+        """
+        Laço da tarefa de fundo: recarrega as moedas (para incluir moedas
+        novas) e atualiza a matriz a cada intervalo_segundos.
+        """
+        while True:
+            try:
+                codigos = await carregar_codigos()
+                await self.atualizar(coinbase_service, codigos)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.falhas += 1
+                logger.exception("Falha ao atualizar a matriz de cotações")
+            await asyncio.sleep(intervalo_segundos)
+
+    def estatisticas(self) -> Dict[str, Any]:
+        estado = self._estado
+        agora = time.time()
+        validas = sum(
+            1 for v, t in zip(estado.valores, estado.obtidas_em)
+            if v is not None and agora - t <= self.idade_maxima_segundos
+        )
+        return {
+            "moedas": list(estado.codigos),
+            "celulas": len(estado.codigos) * max(len(estado.codigos) - 1, 0),
+            "celulas_validas": validas,
+            "pares_sem_cotacao_direta": sorted(f"{o}-{d}" for o, d in self._sem_cotacao_direta),
+            "idade_maxima_segundos": self.idade_maxima_segundos,
+            "atualizacoes": self.atualizacoes,
+            "falhas": self.falhas,
+        }
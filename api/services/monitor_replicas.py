@@ -0,0 +1,86 @@
+import os
+import asyncio
+import logging
+from typing import Any, Dict
+
+from sqlalchemy import text
+
+from api.persistence.db import Replica, get_replicas
+
+
+logger = logging.getLogger(__name__)
+
+
+# MySQL 8.0.22+; o usuário precisa do privilégio REPLICATION CLIENT
+_SQL_STATUS_REPLICA = text("SHOW REPLICA STATUS")
+
+
+class MonitorReplicas:
+    """
+    Tarefa de fundo que confere o atraso de replicação de cada réplica de
+    leitura. Uma réplica atrasada mais que atraso_maximo_segundos, com a
+    replicação parada ou inacessível sai do rodízio, e as leituras vão
+    para o primário até ela se recuperar.
+    """
+
+    def __init__(self, atraso_maximo_segundos: float):
+        self.atraso_maximo_segundos = atraso_maximo_segundos
+        self.verificacoes = 0
+
+    @classmethod
+    def a_partir_do_env(cls) -> "MonitorReplicas":
+        return cls(atraso_maximo_segundos=float(os.getenv("DB_REPLICA_ATRASO_MAXIMO_SEGUNDOS", "5")))
+
+    def verificar(self) -> None:
+        """Atualiza a situação de todas as réplicas (síncrono; rodar em thread)."""
+        for replica in get_replicas():
+            self._verificar(replica)
+        self.verificacoes += 1
+
+    def _verificar(self, replica: Replica) -> None:
+        try:
+            with replica.engine.connect() as conn:
+                row = conn.execute(_SQL_STATUS_REPLICA).mappings().first()
+        except Exception as e:
+            self._marcar(replica, False, None, str(e))
+            return
+
+        if row is None:
+            self._marcar(replica, False, None, "Replicação não configurada neste servidor")
+            return
+
+        atraso = row.get("Seconds_Behind_Source")
+        if atraso is None:
+            # NULL: a thread de SQL da réplica está parada
+            self._marcar(replica, False, None, row.get("Last_Error") or "Replicação parada")
+        elif atraso > self.atraso_maximo_segundos:
+            self._marcar(replica, False, float(atraso), f"Atraso de {atraso} s acima do limite")
+        else:
+            self._marcar(replica, True, float(atraso), None)
+
+    def _marcar(self, replica: Replica, saudavel: bool, atraso, erro) -> None:
+        if replica.saudavel and not saudavel:
+            logger.warning("Réplica %s fora do rodízio: %s", replica.nome, erro)
+        elif saudavel and not replica.saudavel:
+            logger.info("Réplica %s de volta ao rodízio (atraso %s s)", replica.nome, atraso)
+        replica.saudavel = saudavel
+        replica.atraso_segundos = atraso
+        replica.erro = erro
+
+    async def executar(self, intervalo_segundos: float) -> None:
+        """Laço da tarefa de fundo: uma verificação a cada intervalo_segundos."""
+        while True:
+            await asyncio.sleep(intervalo_segundos)
+            try:
+                await asyncio.to_thread(self.verificar)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Falha na verificação das réplicas")
+
+    def estatisticas(self) -> Dict[str, Any]:
+        return {
+            "atraso_maximo_segundos": self.atraso_maximo_segundos,
+            "verificacoes": self.verificacoes,
+            "replicas": [r.situacao() for r in get_replicas()],
+        }
@@ -1,15 +1,26 @@
 from decimal import Decimal
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 from api.persistence.repositories.movimentacao_repository import MovimentacaoRepository
 from api.persistence.repositories.carteira_repository import CarteiraRepository
+from api.persistence.db import UnidadeDeTrabalho
+from api.persistence.fila_depositos import FilaDepositos
+from api.services.idempotencia_service import IdempotenciaService
 from api.models.operacao_models import (
     DepositoRequest,
+    DepositoLoteRequest,
+    DepositoLoteResponse,
+    DepositoLoteResultado,
     SaqueRequest,
     MovimentacaoResponse
 )
 
 
+# As Idempotency-Keys dos depósitos em lote não pertencem a uma carteira;
+# ficam neste escopo (endereços são hexadecimais e não colidem com ele)
+_ESCOPO_DEPOSITOS_LOTE = "depositos/lote"
+
+
 class MovimentacaoService:
     """
     Serviço para depósitos e saques.
@@ -18,19 +29,31 @@ class MovimentacaoService:
     def __init__(
         self,
         movimentacao_repo: MovimentacaoRepository,
-        carteira_repo: CarteiraRepository
+        carteira_repo: CarteiraRepository,
+        uow: Optional[UnidadeDeTrabalho] = None,
+        idempotencia: Optional[IdempotenciaService] = None,
+        fila_depositos: Optional[FilaDepositos] = None
     ):
         self.movimentacao_repo = movimentacao_repo
         self.carteira_repo = carteira_repo
+        self.uow = uow
+        self.idempotencia = idempotencia
+        self.fila_depositos = fila_depositos
 
     def realizar_deposito(
         self,
         endereco_carteira: str,
-        request: DepositoRequest
+        request: DepositoRequest,
+        chave_idempotencia: Optional[str] = None
     ) -> MovimentacaoResponse:
         """
         Realiza depósito sem exigir chave privada.
         """
+        # Repetição de uma Idempotency-Key já executada: devolve a resposta gravada
+        repetida = self._reservar_chave(chave_idempotencia, "DEPOSITO", endereco_carteira, request)
+        if repetida is not None:
+            return repetida
+
         # Valida se a carteira existe e está ativa
         self._validar_carteira_ativa(endereco_carteira)
 
@@ -39,17 +62,77 @@ class MovimentacaoService:
             codigo_moeda=request.codigo_moeda,
             valor=request.valor
         )
+        resposta = MovimentacaoResponse(**row)
+        self._registrar_chave(chave_idempotencia, "DEPOSITO", endereco_carteira, request, resposta)
+        self._confirmar()
 
+        return resposta
+
+    async def realizar_deposito_em_grupo(
+        self,
+        endereco_carteira: str,
+        request: DepositoRequest
+    ) -> MovimentacaoResponse:
+        """
+        Depósito pelo commit em grupo: gravado com os de outras requisições,
+        fora de uma transação da requisição. A carteira e a moeda são
+        validadas pelo grupo, item a item, com as mesmas mensagens. Sem
+        Idempotency-Key: a chave precisaria ser gravada na transação do
+        depósito, então esses seguem por realizar_deposito.
+        """
+        row = await self.fila_depositos.depositar(endereco_carteira, request.codigo_moeda, request.valor)
         return MovimentacaoResponse(**row)
 
+    def realizar_depositos_lote(
+        self,
+        request: DepositoLoteRequest,
+        chave_idempotencia: Optional[str] = None
+    ) -> DepositoLoteResponse:
+        """
+        Realiza vários depósitos de uma vez. Itens com carteira inexistente,
+        bloqueada ou moeda inválida são recusados sem afetar os demais.
+
+        Com Idempotency-Key, a chave é reservada na sua própria transação
+        antes do primeiro bloco e a resposta do lote é gravada no final.
+        """
+        if chave_idempotencia is not None and self.idempotencia is not None:
+            repetida = self.idempotencia.reservar(
+                chave_idempotencia, "DEPOSITO_LOTE", _ESCOPO_DEPOSITOS_LOTE, request, DepositoLoteResponse
+            )
+            if repetida is not None:
+                return repetida
+
+        itens = [item.model_dump() for item in request.itens]
+        rows = self.movimentacao_repo.realizar_depositos_lote(itens)
+
+        resultados = [DepositoLoteResultado(indice=i, **row) for i, row in enumerate(rows)]
+        sucessos = sum(1 for r in resultados if r.sucesso)
+        resposta = DepositoLoteResponse(
+            total=len(resultados),
+            sucessos=sucessos,
+            falhas=len(resultados) - sucessos,
+            resultados=resultados,
+        )
+        if chave_idempotencia is not None and self.idempotencia is not None:
+            self.idempotencia.registrar(
+                chave_idempotencia, "DEPOSITO_LOTE", _ESCOPO_DEPOSITOS_LOTE, request, resposta
+            )
+
+        return resposta
+
     def realizar_saque(
         self,
         endereco_carteira: str,
-        request: SaqueRequest
+        request: SaqueRequest,
+        chave_idempotencia: Optional[str] = None
     ) -> MovimentacaoResponse:
         """
         Realiza saque com validação de chave privada e taxa.
         """
+        repetida = self._reservar_chave(chave_idempotencia, "SAQUE", endereco_carteira, request)
+        if repetida is not None:
+            return repetida
+
         # Valida se a carteira existe e está ativa
         self._validar_carteira_ativa(endereco_carteira)
 
@@ -65,13 +148,31 @@ class MovimentacaoService:
             codigo_moeda=request.codigo_moeda,
             valor=request.valor
         )
+        resposta = MovimentacaoResponse(**row)
+        self._registrar_chave(chave_idempotencia, "SAQUE", endereco_carteira, request, resposta)
+        self._confirmar()
 
-        return MovimentacaoResponse(**row)
+        return resposta
 
     def _validar_carteira_ativa(self, endereco_carteira: str) -> None:
-        """Valida se a carteira existe e está ativa"""
-        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
-        if not carteira:
+        """Valida se a carteira existe e está ativa (na transação da operação)"""
+        status = self.carteira_repo.buscar_status(endereco_carteira)
+        if status is None:
             raise ValueError("Carteira não encontrada")
-        if carteira["status"] != "ATIVA":
+        if status != "ATIVA":
             raise ValueError("Carteira está bloqueada")
+
+    def _reservar_chave(self, chave, operacao, endereco_carteira, request) -> Optional[MovimentacaoResponse]:
+        """Reserva a Idempotency-Key (se houver); retorna a resposta gravada em uma repetição"""
+        if chave is None or self.idempotencia is None:
+            return None
+        return self.idempotencia.reservar(chave, operacao, endereco_carteira, request, MovimentacaoResponse)
+
+    def _registrar_chave(self, chave, operacao, endereco_carteira, request, resposta) -> None:
+        if chave is not None and self.idempotencia is not None:
+            self.idempotencia.registrar(chave, operacao, endereco_carteira, request, resposta)
+
+    def _confirmar(self) -> None:
+        """Confirma a transação da requisição (quando há unidade de trabalho)"""
+        if self.uow is not None:
+            self.uow.commit()
@@ -1,6 +1,17 @@
+from decimal import Decimal
+from typing import Optional
+
 from api.persistence.repositories.transferencia_repository import TransferenciaRepository
 from api.persistence.repositories.carteira_repository import CarteiraRepository
-from api.models.operacao_models import TransferenciaRequest, TransferenciaResponse
+from api.persistence.db import UnidadeDeTrabalho
+from api.services.idempotencia_service import IdempotenciaService
+from api.models.operacao_models import (
+    TransferenciaRequest,
+    TransferenciaResponse,
+    TransferenciaLoteRequest,
+    TransferenciaLoteResponse,
+    TransferenciaLoteResultado,
+)
 
 
 class TransferenciaService:
@@ -11,19 +22,29 @@ class TransferenciaService:
     def __init__(
         self,
         transferencia_repo: TransferenciaRepository,
-        carteira_repo: CarteiraRepository
+        carteira_repo: CarteiraRepository,
+        uow: Optional[UnidadeDeTrabalho] = None,
+        idempotencia: Optional[IdempotenciaService] = None
     ):
         self.transferencia_repo = transferencia_repo
         self.carteira_repo = carteira_repo
+        self.uow = uow
+        self.idempotencia = idempotencia
 
     def realizar_transferencia(
         self,
         endereco_origem: str,
-        request: TransferenciaRequest
+        request: TransferenciaRequest,
+        chave_idempotencia: Optional[str] = None
     ) -> TransferenciaResponse:
         """
         Realiza transferência entre carteiras com validação de chave privada.
         """
+        # Repetição de uma Idempotency-Key já executada: devolve a resposta gravada
+        repetida = self._reservar_chave(chave_idempotencia, endereco_origem, request)
+        if repetida is not None:
+            return repetida
+
         # Valida se a carteira origem existe e está ativa
         self._validar_carteira_ativa(endereco_origem)
 
@@ -45,13 +66,93 @@ class TransferenciaService:
             codigo_moeda=request.codigo_moeda,
             valor=request.valor
         )
+        resposta = TransferenciaResponse(**row)
+        if chave_idempotencia is not None and self.idempotencia is not None:
+            self.idempotencia.registrar(chave_idempotencia, "TRANSFERENCIA", endereco_origem, request, resposta)
+        self._confirmar()
+
+        return resposta
+
+    def realizar_transferencias_lote(
+        self,
+        endereco_origem: str,
+        request: TransferenciaLoteRequest,
+        chave_idempotencia: Optional[str] = None
+    ) -> TransferenciaLoteResponse:
+        """
+        Pagamento de uma carteira para vários destinos, com validação de chave privada.
 
-        return TransferenciaResponse(**row)
+        Com Idempotency-Key, a chave é reservada na sua própria transação
+        antes do primeiro bloco e a resposta do pagamento é gravada no final.
+        """
+        usar_chave = chave_idempotencia is not None and self.idempotencia is not None
+
+        # Repetição de um pagamento já feito: resposta gravada, mesmo que a
+        # carteira tenha sido bloqueada depois
+        if usar_chave:
+            repetida = self.idempotencia.consultar(
+                chave_idempotencia, "TRANSFERENCIA_LOTE", endereco_origem, request, TransferenciaLoteResponse
+            )
+            if repetida is not None:
+                return repetida
+
+        self._validar_carteira_ativa(endereco_origem)
+
+        if not self.carteira_repo.validar_chave_privada(
+            endereco_origem,
+            request.chave_privada
+        ):
+            raise ValueError("Chave privada inválida")
+
+        # Reserva só depois das validações: uma recusa não prende a chave
+        if usar_chave:
+            repetida = self.idempotencia.reservar(
+                chave_idempotencia, "TRANSFERENCIA_LOTE", endereco_origem, request, TransferenciaLoteResponse
+            )
+            if repetida is not None:
+                return repetida
+
+        itens = [item.model_dump() for item in request.itens]
+        rows = self.transferencia_repo.realizar_transferencias_lote(
+            endereco_origem=endereco_origem,
+            codigo_moeda=request.codigo_moeda,
+            itens=itens
+        )
+        self._confirmar()
+
+        resultados = [TransferenciaLoteResultado(indice=i, **row) for i, row in enumerate(rows)]
+        pagos = [r for r in resultados if r.sucesso]
+        resposta = TransferenciaLoteResponse(
+            endereco_origem=endereco_origem,
+            codigo_moeda=request.codigo_moeda,
+            total=len(resultados),
+            sucessos=len(pagos),
+            falhas=len(resultados) - len(pagos),
+            valor_debitado=sum((r.valor + r.taxa for r in pagos), Decimal(0)),
+            resultados=resultados,
+        )
+        if usar_chave:
+            self.idempotencia.registrar(
+                chave_idempotencia, "TRANSFERENCIA_LOTE", endereco_origem, request, resposta
+            )
+
+        return resposta
 
     def _validar_carteira_ativa(self, endereco_carteira: str) -> None:
-        """Valida se a carteira existe e está ativa"""
-        carteira = self.carteira_repo.buscar_por_endereco(endereco_carteira)
-        if not carteira:
+        """Valida se a carteira existe e está ativa (na transação da operação)"""
+        status = self.carteira_repo.buscar_status(endereco_carteira)
+        if status is None:
             raise ValueError("Carteira não encontrada")
-        if carteira["status"] != "ATIVA":
+        if status != "ATIVA":
             raise ValueError("Carteira está bloqueada")
+
+    def _reservar_chave(self, chave, endereco_origem, request) -> Optional[TransferenciaResponse]:
+        """Reserva a Idempotency-Key (se houver); retorna a resposta gravada em uma repetição"""
+        if chave is None or self.idempotencia is None:
+            return None
+        return self.idempotencia.reservar(chave, "TRANSFERENCIA", endereco_origem, request, TransferenciaResponse)
+
+    def _confirmar(self) -> None:
+        """Confirma a transação da requisição (quando há unidade de trabalho)"""
+        if self.uow is not None:
+            self.uow.commit()
@@ -0,0 +1,155 @@
+import asyncio
+from decimal import Decimal, localcontext
+from typing import Dict, List, Optional, Tuple
+
+from api.persistence.repositories.carteira_repository import AsyncCarteiraRepository
+from api.persistence.repositories.moeda_repository import AsyncMoedaRepository
+from api.persistence.repositories.saldo_repository import arredondar
+from api.services.coinbase_service import CoinbaseService, ParNaoCotado
+from api.services.cotacao_cache import Cotacao
+from api.services.matriz_cotacoes import MatrizCotacoes
+from api.models.carteira_models import (
+    CotacaoUtilizada,
+    ValorCarteira,
+    ValorCarteiraResponse,
+    ValorCarteirasResponse,
+    ValorMoeda,
+)
+
+
+# Saldo DECIMAL(20, 8) vezes uma cotação pode passar das 28 casas do
+# contexto padrão; os produtos são calculados sem arredondamento e só o
+# valor de cada moeda é arredondado para a escala do banco
+_PRECISAO = 60
+
+
+class CarteiraNaoEncontrada(ValueError):
+    """A carteira avaliada não existe."""
+
+
+class ValorCarteiraService:
+    """
+    Valor das carteiras em uma moeda de referência: saldos lidos em uma
+    consulta e as cotações de todas as moedas com saldo buscadas ao mesmo
+    tempo (matriz em memória primeiro, depois Coinbase/cache de cotações).
+    Pares que a Coinbase não cota (ex.: SOL -> BRL) são triangulados via USD.
+    """
+
+    def __init__(
+        self,
+        carteira_repo: AsyncCarteiraRepository,
+        moeda_repo: AsyncMoedaRepository,
+        coinbase_service: CoinbaseService,
+        matriz_cotacoes: Optional[MatrizCotacoes] = None,
+    ):
+        self.carteira_repo = carteira_repo
+        self.moeda_repo = moeda_repo
+        self.coinbase_service = coinbase_service
+        self.matriz_cotacoes = matriz_cotacoes
+
+    async def avaliar(self, endereco_carteira: str, moeda: str) -> ValorCarteiraResponse:
+        resultado = await self.avaliar_lote([endereco_carteira], moeda)
+        if resultado.nao_encontradas:
+            raise CarteiraNaoEncontrada("Carteira não encontrada")
+
+        return ValorCarteiraResponse(
+            **resultado.carteiras[0].model_dump(),
+            moeda_referencia=resultado.moeda_referencia,
+            cotacoes=resultado.cotacoes,
+        )
+
+    async def avaliar_lote(self, enderecos: List[str], moeda: str) -> ValorCarteirasResponse:
+        """
+        Valor de cada carteira e o total. Carteiras inexistentes vão para
+        nao_encontradas; moedas com saldo zero não pedem cotação.
+        """
+        moeda = moeda.upper()
+        if moeda not in await self.moeda_repo.listar_codigos():
+            raise ValueError(f"Moeda de referência inválida: {moeda}")
+
+        enderecos = list(dict.fromkeys(enderecos))  # sem repetidos, na ordem recebida
+        status = await self.carteira_repo.buscar_status_lote(enderecos)
+        encontradas = [e for e in enderecos if e in status]
+        saldos = await self.carteira_repo.buscar_saldos_lote(encontradas)
+
+        # Uma cotação por moeda com saldo em qualquer das carteiras, todas de uma vez
+        moedas = sorted({m for por_moeda in saldos.values() for m in por_moeda} - {moeda})
+        cotacoes = dict(zip(moedas, await asyncio.gather(*(self._cotacao(m, moeda) for m in moedas))))
+
+        carteiras = [self._valor_carteira(e, saldos.get(e, {}), moeda, cotacoes) for e in encontradas]
+        return ValorCarteirasResponse(
+            moeda_referencia=moeda,
+            valor_total=sum((c.valor_total for c in carteiras), arredondar(Decimal(0))),
+            carteiras=carteiras,
+            nao_encontradas=[e for e in enderecos if e not in status],
+            cotacoes=[
+                CotacaoUtilizada(
+                    moeda_origem=m,
+                    moeda_destino=moeda,
+                    cotacao=cotacao.valor,
+                    obtida_em=cotacao.obtida_em,
+                    idade_segundos=cotacao.idade_segundos,
+                    origem=origem,
+                )
+                for m, (cotacao, origem) in cotacoes.items()
+            ],
+        )
+
+    async def _cotacao(self, moeda_origem: str, moeda_destino: str) -> Tuple[Cotacao, str]:
+        """Cotação do par e de onde veio; a matriz não faz chamada de rede."""
+        if self.matriz_cotacoes is not None:
+            cotacao = self.matriz_cotacoes.obter(moeda_origem, moeda_destino)
+            if cotacao is not None:
+                return cotacao, "matriz"
+        try:
+            return await self.coinbase_service.obter_cotacao_detalhada(moeda_origem, moeda_destino), "coinbase"
+        except ParNaoCotado:
+            if MatrizCotacoes.MOEDA_PIVO in (moeda_origem, moeda_destino):
+                raise
+            return await self._triangular(moeda_origem, moeda_destino), "triangulada"
+
+    async def _triangular(self, moeda_origem: str, moeda_destino: str) -> Cotacao:
+        """
+        cotacao(A -> B) = cotacao(A -> USD) / cotacao(B -> USD), arredondada
+        para a escala do banco, como as cotações diretas; vale o momento da
+        perna mais antiga.
+        """
+        pivo = MatrizCotacoes.MOEDA_PIVO
+        perna_origem, perna_destino = await asyncio.gather(
+            self.coinbase_service.obter_cotacao_detalhada(moeda_origem, pivo),
+            self.coinbase_service.obter_cotacao_detalhada(moeda_destino, pivo),
+        )
+        if not perna_destino.valor:
+            raise ValueError(f"Cotação {moeda_destino}-{pivo} inválida")
+        mais_antiga = min(perna_origem, perna_destino, key=lambda c: c.obtida_em)
+        with localcontext() as ctx:
+            ctx.prec = _PRECISAO
+            valor = perna_origem.valor / perna_destino.valor
+        return Cotacao(
+            valor=arredondar(valor),
+            obtida_em=mais_antiga.obtida_em,
+            idade_segundos=max(perna_origem.idade_segundos, perna_destino.idade_segundos),
+        )
+
+    @staticmethod
+    def _valor_carteira(
+        endereco: str,
+        saldos: Dict[str, Decimal],
+        moeda: str,
+        cotacoes: Dict[str, Tuple[Cotacao, str]],
+    ) -> ValorCarteira:
+        itens = []
+        with localcontext() as ctx:
+            ctx.prec = _PRECISAO
+            for codigo, saldo in sorted(saldos.items()):
+                cotacao = Decimal(1) if codigo == moeda else cotacoes[codigo][0].valor
+                itens.append(ValorMoeda(
+                    codigo_moeda=codigo,
+                    saldo=saldo,
+                    cotacao=cotacao,
+                    valor=arredondar(saldo * cotacao),
+                ))
+            # valores já na escala do banco: a soma é exata
+            total = sum((i.valor for i in itens), arredondar(Decimal(0)))
+
+        return ValorCarteira(endereco_carteira=endereco, valor_total=total, moedas=itens)
@@ -0,0 +1,387 @@
+"""
+Teste de carga reproduzível de todos os endpoints de operação.
+
+Sobe a API (api.main:create_app, via uvicorn em um subprocesso) contra o
+banco configurado no .env, com a Coinbase trocada pelo stub de
+benchmarks/coinbase_stub.py. Use um banco dedicado: o teste cria
+carteiras e movimentações.
+
+1. Cria --carteiras carteiras (POST /carteiras/lote) e deposita
+   --saldo-inicial em cada moeda de --moedas (POST /depositos/lote).
+2. Dispara --requisicoes requisições com --concorrencia clientes
+   simultâneos, sorteando a operação pelos pesos de --mix: depósito,
+   saque, transferência, conversão, saldos e listagem. As primeiras
+   --aquecimento requisições não entram no resultado.
+3. Imprime em JSON a vazão e a latência (p50/p95/p99) por endpoint.
+
+Com a mesma --semente, a sequência de operações, carteiras e valores de
+cada cliente é a mesma entre execuções.
+
+Com --baseline, compara com um resultado salvo antes (--saida) e sai com
+código 1 se algum endpoint ficou mais lento (p95/p99) ou com vazão menor
+que o baseline além de --limite-regressao.
+
+Uso:
+    python -m benchmarks.bench_carga --carteiras 1000 --concorrencia 50 --requisicoes 20000 --saida baseline.json
+    python -m benchmarks.bench_carga --carteiras 1000 --concorrencia 50 --requisicoes 20000 --baseline baseline.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.coinbase_stub import iniciar_stub
+
+
+MIX_PADRAO = "deposito=25,saque=10,transferencia=20,conversao=10,saldos=25,listagem=10"
+
+# operação -> (método, rota declarada), como aparece no relatório
+ENDPOINTS = {
+    "deposito": ("POST", "/carteiras/{endereco_carteira}/depositos"),
+    "saque": ("POST", "/carteiras/{endereco_carteira}/saques"),
+    "transferencia": ("POST", "/carteiras/{endereco_origem}/transferencias"),
+    "conversao": ("POST", "/carteiras/{endereco_carteira}/conversoes"),
+    "saldos": ("GET", "/carteiras/{endereco_carteira}/saldos"),
+    "listagem": ("GET", "/carteiras"),
+}
+
+
+@dataclass
+class Carteira:
+    endereco: str
+    chave: str
+
+
+@dataclass
+class Amostras:
+    latencias_ms: List[float] = field(default_factory=list)
+    status: Dict[str, int] = field(default_factory=dict)
+    erros: int = 0
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _percentil(ordenados: List[float], p: float) -> float:
+    """Percentil pelo método nearest-rank."""
+    if not ordenados:
+        return 0.0
+    return ordenados[min(len(ordenados) - 1, max(0, math.ceil(p / 100 * len(ordenados)) - 1))]
+
+
+def _ler_mix(texto: str) -> Dict[str, int]:
+    mix = {}
+    for parte in texto.split(","):
+        nome, _, peso = parte.partition("=")
+        nome = nome.strip()
+        if nome not in ENDPOINTS:
+            raise SystemExit(f"Operação desconhecida em --mix: {nome} (use {', '.join(ENDPOINTS)})")
+        mix[nome] = int(peso)
+    if not any(mix.values()):
+        raise SystemExit("--mix precisa de pelo menos um peso maior que zero")
+    return mix
+
+
+def _valor(rng: random.Random, minimo: str, maximo: str) -> str:
+    """Valor decimal sorteado com 2 casas (string, para não passar por float no JSON)."""
+    centavos = rng.randint(int(Decimal(minimo) * 100), int(Decimal(maximo) * 100))
+    return str(Decimal(centavos) / 100)
+
+
+# --- API em subprocesso -------------------------------------------------------
+
+def _subir_api(porta: int, workers: int, coinbase_url: str) -> subprocess.Popen:
+    env = {**os.environ, "COINBASE_BASE_URL": coinbase_url}
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "api.main:create_app", "--factory",
+            "--host", "127.0.0.1", "--port", str(porta),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        env=env,
+    )
+
+
+async def _esperar_api(client: httpx.AsyncClient, processo: Optional[subprocess.Popen], timeout: float = 60) -> None:
+    prazo = time.monotonic() + timeout
+    while time.monotonic() < prazo:
+        if processo is not None and processo.poll() is not None:
+            raise SystemExit(f"A API encerrou na inicialização (código {processo.returncode})")
+        try:
+            if (await client.get("/metrics")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("A API não respondeu a tempo")
+
+
+# --- Carga inicial -------------------------------------------------------------
+
+async def _semear(client: httpx.AsyncClient, quantidade: int, moedas: List[str], saldo_inicial: str) -> List[Carteira]:
+    carteiras: List[Carteira] = []
+    async with client.stream("POST", "/carteiras/lote", json={"quantidade": quantidade}, timeout=None) as resposta:
+        resposta.raise_for_status()
+        async for linha in resposta.aiter_lines():
+            if linha:
+                c = json.loads(linha)
+                carteiras.append(Carteira(c["endereco_carteira"], c["chave_privada"]))
+
+    itens = [
+        {"endereco_carteira": c.endereco, "codigo_moeda": moeda, "valor": saldo_inicial}
+        for c in carteiras
+        for moeda in moedas
+    ]
+    for i in range(0, len(itens), 50000):
+        resposta = await client.post("/depositos/lote", json={"itens": itens[i:i + 50000]}, timeout=None)
+        resposta.raise_for_status()
+        if resposta.json()["falhas"]:
+            raise SystemExit(f"Depósitos iniciais recusados: {resposta.json()['falhas']}")
+    return carteiras
+
+
+# --- Operações -----------------------------------------------------------------
+
+def _montar_requisicao(
+    operacao: str, rng: random.Random, carteiras: List[Carteira], moedas: List[str],
+) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """(método, caminho, corpo) da operação sorteada."""
+    indice = rng.randrange(len(carteiras))
+    carteira = carteiras[indice]
+    moeda = rng.choice(moedas)
+    if operacao == "deposito":
+        return "POST", f"/carteiras/{carteira.endereco}/depositos", {
+            "codigo_moeda": moeda, "valor": _valor(rng, "1", "100"),
+        }
+    if operacao == "saque":
+        return "POST", f"/carteiras/{carteira.endereco}/saques", {
+            "codigo_moeda": moeda, "valor": _valor(rng, "0.01", "1"), "chave_privada": carteira.chave,
+        }
+    if operacao == "transferencia":
+        # Outra carteira qualquer (transferir para si mesma é recusado)
+        destino = carteiras[(indice + rng.randrange(1, len(carteiras))) % len(carteiras)] if len(carteiras) > 1 else carteira
+        return "POST", f"/carteiras/{carteira.endereco}/transferencias", {
+            "endereco_destino": destino.endereco, "codigo_moeda": moeda,
+            "valor": _valor(rng, "0.01", "1"), "chave_privada": carteira.chave,
+        }
+    if operacao == "conversao":
+        origem, destino = rng.sample(moedas, 2) if len(moedas) > 1 else (moeda, moeda)
+        return "POST", f"/carteiras/{carteira.endereco}/conversoes", {
+            "moeda_origem": origem, "moeda_destino": destino,
+            "valor_origem": _valor(rng, "0.01", "1"), "chave_privada": carteira.chave,
+        }
+    if operacao == "saldos":
+        return "GET", f"/carteiras/{carteira.endereco}/saldos", None
+    return "GET", "/carteiras", None  # listagem: primeira página
+
+
+async def _executar_carga(
+    client: httpx.AsyncClient,
+    carteiras: List[Carteira],
+    moedas: List[str],
+    mix: Dict[str, int],
+    concorrencia: int,
+    total: int,
+    semente: int,
+    registrar: Callable[[str, float, Optional[int]], None],
+) -> float:
+    """Roda `total` requisições com `concorrencia` clientes; retorna a duração em segundos."""
+    operacoes, pesos = list(mix), list(mix.values())
+    # Cada cliente faz a sua fatia fixa de requisições com o seu próprio gerador
+    fatias = [total // concorrencia + (1 if i < total % concorrencia else 0) for i in range(concorrencia)]
+
+    async def cliente(indice: int, quantidade: int) -> None:
+        rng = random.Random(semente * 1_000_003 + indice)
+        for _ in range(quantidade):
+            operacao = rng.choices(operacoes, pesos)[0]
+            metodo, caminho, corpo = _montar_requisicao(operacao, rng, carteiras, moedas)
+            inicio = time.perf_counter()
+            try:
+                resposta = await client.request(metodo, caminho, json=corpo)
+                status: Optional[int] = resposta.status_code
+            except httpx.HTTPError:
+                status = None
+            registrar(operacao, (time.perf_counter() - inicio) * 1000, status)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente(i, n) for i, n in enumerate(fatias) if n))
+    return time.perf_counter() - inicio
+
+
+def _relatorio(amostras: Dict[str, Amostras], duracao: float) -> Dict[str, Any]:
+    endpoints = {}
+    todas: List[float] = []
+    for operacao, a in amostras.items():
+        ordenadas = sorted(a.latencias_ms)
+        todas.extend(ordenadas)
+        metodo, rota = ENDPOINTS[operacao]
+        endpoints[operacao] = {
+            "metodo": metodo,
+            "rota": rota,
+            "requisicoes": len(ordenadas),
+            "erros": a.erros,
+            "status": dict(sorted(a.status.items())),
+            "vazao_rps": round(len(ordenadas) / duracao, 1),
+            "latencia_ms": _resumo_latencia(ordenadas),
+        }
+    todas.sort()
+    return {
+        "duracao_s": round(duracao, 3),
+        "requisicoes": len(todas),
+        "erros": sum(a.erros for a in amostras.values()),
+        "vazao_rps": round(len(todas) / duracao, 1),
+        "latencia_ms": _resumo_latencia(todas),
+        "endpoints": endpoints,
+    }
+
+
+def _resumo_latencia(ordenadas: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(_percentil(ordenadas, 50), 3),
+        "p95": round(_percentil(ordenadas, 95), 3),
+        "p99": round(_percentil(ordenadas, 99), 3),
+        "media": round(sum(ordenadas) / len(ordenadas), 3) if ordenadas else 0.0,
+        "max": round(ordenadas[-1], 3) if ordenadas else 0.0,
+    }
+
+
+def comparar(atual: Dict[str, Any], baseline: Dict[str, Any], limite: float) -> Dict[str, Any]:
+    """
+    Compara p95/p99 (maior é pior) e vazão (menor é pior) de cada endpoint
+    e do total com o baseline. Variação além de `limite` (fração, 0.10 =
+    10%) é regressão. Endpoints ausentes em um dos lados são ignorados.
+    """
+    pares = [("total", atual, baseline)] + [
+        (nome, atual["endpoints"][nome], baseline["endpoints"][nome])
+        for nome in atual["endpoints"]
+        if nome in baseline.get("endpoints", {})
+    ]
+    regressoes = []
+    variacoes = {}
+    for nome, a, b in pares:
+        variacao = {}
+        for metrica in ("p95", "p99"):
+            antes, depois = b["latencia_ms"][metrica], a["latencia_ms"][metrica]
+            variacao[f"{metrica}_ms"] = _variacao(antes, depois)
+            if antes and depois > antes * (1 + limite):
+                regressoes.append(f"{nome}: {metrica} {antes} ms -> {depois} ms")
+        antes, depois = b["vazao_rps"], a["vazao_rps"]
+        variacao["vazao_rps"] = _variacao(antes, depois)
+        if antes and depois < antes * (1 - limite):
+            regressoes.append(f"{nome}: vazão {antes} -> {depois} req/s")
+        variacoes[nome] = variacao
+    return {"limite_regressao": limite, "variacoes": variacoes, "regressoes": regressoes}
+
+
+def _variacao(antes: float, depois: float) -> Optional[float]:
+    """Variação relativa (0.05 = +5%); None se o baseline é zero."""
+    return round(depois / antes - 1, 4) if antes else None
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--carteiras", type=int, default=200, help="Carteiras criadas na carga inicial")
+    parser.add_argument("--moedas", default="BRL,USD", help="Moedas com saldo inicial e usadas nas operações")
+    parser.add_argument("--saldo-inicial", default="1000000", help="Saldo inicial por carteira e moeda")
+    parser.add_argument("--concorrencia", type=int, default=20, help="Clientes simultâneos")
+    parser.add_argument("--requisicoes", type=int, default=5000, help="Requisições medidas")
+    parser.add_argument("--aquecimento", type=int, default=200, help="Requisições iniciais descartadas")
+    parser.add_argument("--mix", default=MIX_PADRAO, help="Pesos das operações")
+    parser.add_argument("--semente", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=1, help="Workers do uvicorn")
+    parser.add_argument("--latencia-coinbase-ms", type=float, default=0, help="Atraso artificial do stub da Coinbase")
+    parser.add_argument("--url", default=None, help="Usar uma API já em execução (não sobe subprocesso nem stub)")
+    parser.add_argument("--saida", default=None, help="Grava o resultado em JSON (ex.: para virar baseline)")
+    parser.add_argument("--baseline", default=None, help="Resultado anterior para comparação")
+    parser.add_argument("--limite-regressao", type=float, default=0.10, help="Piora tolerada (0.10 = 10%%)")
+    args = parser.parse_args()
+
+    moedas = [m.strip().upper() for m in args.moedas.split(",") if m.strip()]
+    mix = _ler_mix(args.mix)
+
+    stub = processo = None
+    url = args.url
+    if url is None:
+        stub, coinbase_url = iniciar_stub(latencia_ms=args.latencia_coinbase_ms)
+        porta = _porta_livre()
+        processo = _subir_api(porta, args.workers, coinbase_url)
+        url = f"http://127.0.0.1:{porta}"
+
+    limites = httpx.Limits(max_connections=args.concorrencia, max_keepalive_connections=args.concorrencia)
+    try:
+        async with httpx.AsyncClient(base_url=url, limits=limites, timeout=60) as client:
+            await _esperar_api(client, processo)
+            carteiras = await _semear(client, args.carteiras, moedas, args.saldo_inicial)
+
+            amostras: Dict[str, Amostras] = {op: Amostras() for op in mix if mix[op]}
+
+            def registrar(operacao: str, latencia_ms: float, status: Optional[int]) -> None:
+                a = amostras[operacao]
+                a.latencias_ms.append(latencia_ms)
+                chave = str(status) if status is not None else "falha_conexao"
+                a.status[chave] = a.status.get(chave, 0) + 1
+                if status is None or status >= 400:
+                    a.erros += 1
+
+            if args.aquecimento:
+                await _executar_carga(
+                    client, carteiras, moedas, mix, args.concorrencia, args.aquecimento,
+                    args.semente - 1, lambda *_: None,
+                )
+            duracao = await _executar_carga(
+                client, carteiras, moedas, mix, args.concorrencia, args.requisicoes,
+                args.semente, registrar,
+            )
+    finally:
+        if processo is not None:
+            processo.terminate()
+            processo.wait()
+        if stub is not None:
+            stub.shutdown()
+
+    resultado = {
+        "configuracao": {
+            "carteiras": args.carteiras,
+            "moedas": moedas,
+            "saldo_inicial": args.saldo_inicial,
+            "concorrencia": args.concorrencia,
+            "requisicoes": args.requisicoes,
+            "aquecimento": args.aquecimento,
+            "mix": mix,
+            "semente": args.semente,
+            "workers": args.workers,
+            "latencia_coinbase_ms": args.latencia_coinbase_ms,
+        },
+        **_relatorio(amostras, duracao),
+    }
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, indent=2, ensure_ascii=False)
+
+    codigo = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            resultado["comparacao"] = comparar(resultado, json.load(f), args.limite_regressao)
+        codigo = 1 if resultado["comparacao"]["regressoes"] else 0
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
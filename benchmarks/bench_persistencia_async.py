@@ -0,0 +1,91 @@
+"""
+Benchmark: repositórios síncronos x assíncronos dentro de rotas async.
+
+Simula N requisições async simultâneas, cada uma fazendo consultas de
+carteira, e compara:
+
+- sync:  CarteiraRepository chamado direto no event loop (como a rota de
+         conversão fazia antes), bloqueando o loop a cada round trip;
+- async: AsyncCarteiraRepository (engine aiomysql), sem bloquear o loop.
+
+Mede o tempo total e o maior atraso observado no event loop.
+Usa o banco configurado no .env; se --endereco não for informado, uma
+carteira nova é criada para o teste.
+
+Uso:
+    python -m benchmarks.bench_persistencia_async --concorrencia 50 --consultas 20
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from api.persistence.db import fechar_engines
+from api.persistence.repositories.carteira_repository import (
+    CarteiraRepository,
+    AsyncCarteiraRepository,
+)
+
+
+async def _monitorar_loop(parar: asyncio.Event, intervalo: float = 0.005) -> float:
+    """Retorna o maior atraso (em ms) entre o tick esperado e o real."""
+    maior_atraso = 0.0
+    while not parar.is_set():
+        inicio = time.perf_counter()
+        await asyncio.sleep(intervalo)
+        atraso = time.perf_counter() - inicio - intervalo
+        maior_atraso = max(maior_atraso, atraso)
+    return maior_atraso * 1000
+
+
+async def _rodar(modo: str, endereco: str, concorrencia: int, consultas: int) -> dict:
+    repo_sync = CarteiraRepository()
+    repo_async = AsyncCarteiraRepository()
+
+    async def requisicao_sync():
+        for _ in range(consultas):
+            repo_sync.buscar_por_endereco(endereco)
+
+    async def requisicao_async():
+        for _ in range(consultas):
+            await repo_async.buscar_por_endereco(endereco)
+
+    requisicao = requisicao_sync if modo == "sync" else requisicao_async
+
+    parar = asyncio.Event()
+    monitor = asyncio.create_task(_monitorar_loop(parar))
+    inicio = time.perf_counter()
+    await asyncio.gather(*(requisicao() for _ in range(concorrencia)))
+    duracao = time.perf_counter() - inicio
+    parar.set()
+    maior_atraso_ms = await monitor
+
+    total = concorrencia * consultas
+    return {
+        "modo": modo,
+        "consultas": total,
+        "duracao_s": round(duracao, 4),
+        "consultas_por_s": round(total / duracao, 1),
+        "maior_atraso_event_loop_ms": round(maior_atraso_ms, 2),
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concorrencia", type=int, default=50)
+    parser.add_argument("--consultas", type=int, default=20)
+    parser.add_argument("--endereco", default=None)
+    args = parser.parse_args()
+
+    endereco = args.endereco or CarteiraRepository().criar()["endereco_carteira"]
+
+    resultados = []
+    for modo in ("sync", "async"):
+        resultados.append(await _rodar(modo, endereco, args.concorrencia, args.consultas))
+
+    await fechar_engines()
+    print(json.dumps({"concorrencia": args.concorrencia, "resultados": resultados}, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,165 @@
+"""
+Benchmark: custo de inicialização da API.
+
+Cada medição roda em um interpretador novo (sem cache de módulos):
+
+- importar api.main, rodar create_app() e o tempo total do processo;
+- se alguma engine foi criada ou algum driver do MySQL carregado só pela
+  importação (o esperado é que não);
+- com --detalhar N, os N módulos mais caros da importação
+  (python -X importtime), pelo tempo próprio.
+
+Com --com-banco, sobe a API com uvicorn contra o banco do .env e mede a
+primeira requisição que usa o banco (GET /carteiras?limite=1), sem
+pré-aquecimento e com DB_POOL_PREAQUECER_CONEXOES=--preaquecer.
+
+Uso:
+    python -m benchmarks.bench_startup --repeticoes 5 --detalhar 15
+    python -m benchmarks.bench_startup --com-banco --preaquecer 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List
+
+import httpx
+
+
+_MEDIR_IMPORTACAO = """
+import json, sys, time
+inicio = time.perf_counter()
+import api.main
+importado = time.perf_counter()
+api.main.create_app()
+criado = time.perf_counter()
+import api.persistence.db as db
+print(json.dumps({
+    "importar_ms": (importado - inicio) * 1000,
+    "create_app_ms": (criado - importado) * 1000,
+    "engines_criadas": [n for n, e in (("sync", db._engine), ("async", db._async_engine)) if e is not None],
+    "drivers_carregados": [m for m in ("mysql.connector", "aiomysql") if m in sys.modules],
+}))
+"""
+
+
+def _resumo(valores: List[float]) -> Dict[str, float]:
+    return {
+        "mediana": round(statistics.median(valores), 2),
+        "min": round(min(valores), 2),
+        "max": round(max(valores), 2),
+    }
+
+
+def _medir_importacao(repeticoes: int) -> Dict[str, Any]:
+    importar, criar, total = [], [], []
+    ultima: Dict[str, Any] = {}
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        saida = subprocess.run(
+            [sys.executable, "-c", _MEDIR_IMPORTACAO],
+            capture_output=True, text=True, check=True,
+        )
+        total.append((time.perf_counter() - inicio) * 1000)
+        ultima = json.loads(saida.stdout.strip().splitlines()[-1])
+        importar.append(ultima["importar_ms"])
+        criar.append(ultima["create_app_ms"])
+
+    return {
+        "importar_api_main_ms": _resumo(importar),
+        "create_app_ms": _resumo(criar),
+        "processo_total_ms": _resumo(total),
+        "engines_criadas_na_importacao": ultima["engines_criadas"],
+        "drivers_carregados_na_importacao": ultima["drivers_carregados"],
+    }
+
+
+def _modulos_mais_caros(quantidade: int) -> List[Dict[str, Any]]:
+    """Módulos com maior tempo próprio de importação (python -X importtime)."""
+    saida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.main"],
+        capture_output=True, text=True, check=True,
+    )
+    modulos = []
+    for linha in saida.stderr.splitlines():
+        if not linha.startswith("import time:") or "self [us]" in linha:
+            continue
+        proprio, acumulado, nome = linha[len("import time:"):].split("|")
+        modulos.append({
+            "modulo": nome.strip(),
+            "proprio_ms": round(int(proprio) / 1000, 2),
+            "acumulado_ms": round(int(acumulado) / 1000, 2),
+        })
+    return sorted(modulos, key=lambda m: m["proprio_ms"], reverse=True)[:quantidade]
+
+
+def _porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _primeira_requisicao(preaquecer: int) -> Dict[str, Any]:
+    """Sobe a API e mede a subida e a primeira requisição com banco."""
+    porta = _porta_livre()
+    env = {**os.environ, "DB_POOL_PREAQUECER_CONEXOES": str(preaquecer)}
+    inicio = time.perf_counter()
+    processo = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "api.main:create_app", "--factory",
+            "--host", "127.0.0.1", "--port", str(porta), "--log-level", "warning",
+        ],
+        env=env,
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{porta}", timeout=30) as client:
+            while True:
+                if processo.poll() is not None:
+                    raise SystemExit(f"A API encerrou na inicialização (código {processo.returncode})")
+                try:
+                    client.get("/metrics")  # não usa o banco
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.02)
+            pronta = time.perf_counter()
+
+            resposta = client.get("/carteiras", params={"limite": 1})
+            primeira = time.perf_counter()
+            client.get("/carteiras", params={"limite": 1})
+            segunda = time.perf_counter()
+    finally:
+        processo.terminate()
+        processo.wait()
+
+    return {
+        "preaquecer_conexoes": preaquecer,
+        "ate_atender_ms": round((pronta - inicio) * 1000, 2),
+        "primeira_requisicao_ms": round((primeira - pronta) * 1000, 2),
+        "segunda_requisicao_ms": round((segunda - primeira) * 1000, 2),
+        "status": resposta.status_code,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--detalhar", type=int, default=0, help="Mostrar os N módulos mais caros")
+    parser.add_argument("--com-banco", action="store_true", help="Medir a primeira requisição com banco")
+    parser.add_argument("--preaquecer", type=int, default=5, help="Conexões pré-aquecidas na comparação")
+    args = parser.parse_args()
+
+    resultado: Dict[str, Any] = {"repeticoes": args.repeticoes, **_medir_importacao(args.repeticoes)}
+    if args.detalhar:
+        resultado["modulos_mais_caros"] = _modulos_mais_caros(args.detalhar)
+    if args.com_banco:
+        resultado["primeira_requisicao"] = [_primeira_requisicao(0), _primeira_requisicao(args.preaquecer)]
+
+    print(json.dumps(resultado, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Servidor falso da API de cotações da Coinbase, para benchmarks e testes
+de carga sem depender da rede nem do limite de requisições da Coinbase.
+
+Responde GET /v2/prices/{ORIGEM}-{DESTINO}/spot no mesmo formato da API
+real, com cotações fixas derivadas de um preço em USD por moeda. Pares
+com moedas desconhecidas respondem 404, como a Coinbase.
+
+A API aponta para ele com COINBASE_BASE_URL=http://127.0.0.1:<porta>/v2/prices.
+
+Uso:
+    python -m benchmarks.coinbase_stub --porta 8081 --latencia-ms 20
+"""
+import argparse
+import json
+import re
+import threading
+import time
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Tuple
+
+
+# Preço de 1 unidade de cada moeda em USD
+PRECOS_USD = {
+    "USD": Decimal("1"),
+    "BRL": Decimal("0.20"),
+    "BTC": Decimal("65000"),
+    "ETH": Decimal("3500"),
+    "SOL": Decimal("150"),
+}
+
+_ROTA = re.compile(r"^/v2/prices/([A-Z0-9]+)-([A-Z0-9]+)/spot/?$")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, como o cliente da API espera
+    latencia_segundos = 0.0
+
+    def do_GET(self):
+        if self.latencia_segundos:
+            time.sleep(self.latencia_segundos)
+
+        rota = _ROTA.match(self.path)
+        if rota is None or rota.group(1) not in PRECOS_USD or rota.group(2) not in PRECOS_USD:
+            self._responder(404, {"errors": [{"id": "not_found", "message": "Invalid currency"}]})
+            return
+
+        origem, destino = rota.groups()
+        cotacao = (PRECOS_USD[origem] / PRECOS_USD[destino]).quantize(Decimal("0.00000001"))
+        self._responder(200, {"data": {"base": origem, "currency": destino, "amount": str(cotacao)}})
+
+    def _responder(self, status: int, corpo: dict) -> None:
+        dados = json.dumps(corpo).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(dados)))
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def log_message(self, *args):
+        pass
+
+
+def iniciar_stub(porta: int = 0, latencia_ms: float = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Sobe o stub em uma thread (porta 0 = porta livre qualquer).
+    Retorna o servidor (para shutdown()) e o valor de COINBASE_BASE_URL.
+    """
+    handler = type("Handler", (_Handler,), {"latencia_segundos": latencia_ms / 1000})
+    servidor = ThreadingHTTPServer(("127.0.0.1", porta), handler)
+    servidor.daemon_threads = True
+    threading.Thread(target=servidor.serve_forever, name="coinbase-stub", daemon=True).start()
+    return servidor, f"http://127.0.0.1:{servidor.server_address[1]}/v2/prices"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--porta", type=int, default=8081)
+    parser.add_argument("--latencia-ms", type=float, default=0, help="Atraso artificial por resposta")
+    args = parser.parse_args()
+
+    servidor, url = iniciar_stub(args.porta, args.latencia_ms)
+    print(f"COINBASE_BASE_URL={url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
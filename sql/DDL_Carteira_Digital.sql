@@ -32,8 +32,14 @@ USE wallet_homolog;
 CREATE TABLE IF NOT EXISTS carteira (
     endereco_carteira VARCHAR(64) PRIMARY KEY,
     hash_chave_privada VARCHAR(64) NOT NULL,
-    data_criacao DATETIME DEFAULT CURRENT_TIMESTAMP,
-    status ENUM('ATIVA', 'BLOQUEADA') DEFAULT 'ATIVA'
+    data_criacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    status ENUM('ATIVA', 'BLOQUEADA') DEFAULT 'ATIVA',
+    -- Em quantas linhas o saldo de cada moeda é dividido (1 = sem divisão)
+    slots_saldo TINYINT UNSIGNED NOT NULL DEFAULT 1,
+    -- Paginação por cursor de GET /carteiras: (data_criacao, endereco_carteira)
+    INDEX idx_carteira_criacao (data_criacao, endereco_carteira),
+    INDEX idx_carteira_status_criacao (status, data_criacao, endereco_carteira),
+    INDEX idx_carteira_slots (slots_saldo)
 );
 
 -- Tabela de Moedas
@@ -47,12 +53,23 @@ CREATE TABLE IF NOT EXISTS moeda (
 CREATE TABLE IF NOT EXISTS saldo_carteira (
     endereco_carteira VARCHAR(64) NOT NULL,
     codigo_moeda VARCHAR(10) NOT NULL,
+    -- carteiras com slots_saldo > 1 dividem o saldo de cada moeda em várias linhas
+    slot TINYINT UNSIGNED NOT NULL DEFAULT 0,
     saldo DECIMAL(20, 8) NOT NULL DEFAULT 0,
-    PRIMARY KEY (endereco_carteira, codigo_moeda),
+    PRIMARY KEY (endereco_carteira, codigo_moeda, slot),
+    INDEX idx_saldo_slot (slot),
     FOREIGN KEY (endereco_carteira) REFERENCES carteira(endereco_carteira),
     FOREIGN KEY (codigo_moeda) REFERENCES moeda(codigo)
 );
 
+-- Versão do saldo de cada carteira não fragmentada, avançada na mesma
+-- transação de todo débito ou crédito (ETag de GET /carteiras/{endereco}/saldos)
+CREATE TABLE IF NOT EXISTS versao_saldo (
+    endereco_carteira VARCHAR(64) PRIMARY KEY,
+    versao BIGINT UNSIGNED NOT NULL,
+    FOREIGN KEY (endereco_carteira) REFERENCES carteira(endereco_carteira)
+);
+
 -- Tabela de Depósitos e Saques
 CREATE TABLE IF NOT EXISTS deposito_saque (
     id INT AUTO_INCREMENT PRIMARY KEY,
@@ -61,7 +78,12 @@ CREATE TABLE IF NOT EXISTS deposito_saque (
     tipo ENUM('DEPOSITO', 'SAQUE') NOT NULL,
     valor DECIMAL(20, 8) NOT NULL,
     taxa DECIMAL(20, 8) DEFAULT 0,
-    data_operacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+    data_operacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- INSERT de várias linhas que gravou o depósito (lotes); lê os ids de volta
+    lote CHAR(32) NULL,
+    -- Histórico por carteira (GET /carteiras/{endereco}/historico)
+    INDEX idx_deposito_saque_carteira_data (endereco_carteira, data_operacao, id),
+    INDEX idx_deposito_saque_lote (lote),
     FOREIGN KEY (endereco_carteira) REFERENCES carteira(endereco_carteira),
     FOREIGN KEY (codigo_moeda) REFERENCES moeda(codigo)
 );
@@ -76,7 +98,8 @@ CREATE TABLE IF NOT EXISTS conversao (
     valor_destino DECIMAL(20, 8) NOT NULL,
     cotacao DECIMAL(20, 8) NOT NULL,
     taxa DECIMAL(20, 8) NOT NULL,
-    data_operacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+    data_operacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_conversao_carteira_data (endereco_carteira, data_operacao, id),
     FOREIGN KEY (endereco_carteira) REFERENCES carteira(endereco_carteira),
     FOREIGN KEY (moeda_origem) REFERENCES moeda(codigo),
     FOREIGN KEY (moeda_destino) REFERENCES moeda(codigo)
@@ -90,12 +113,28 @@ CREATE TABLE IF NOT EXISTS transferencia (
     codigo_moeda VARCHAR(10) NOT NULL,
     valor DECIMAL(20, 8) NOT NULL,
     taxa DECIMAL(20, 8) NOT NULL,
-    data_operacao DATETIME DEFAULT CURRENT_TIMESTAMP,
+    data_operacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    -- INSERT de várias linhas que gravou a transferência (pagamentos em lote)
+    lote CHAR(32) NULL,
+    INDEX idx_transferencia_origem_data (endereco_origem, data_operacao, id),
+    INDEX idx_transferencia_destino_data (endereco_destino, data_operacao, id),
+    INDEX idx_transferencia_lote (lote),
     FOREIGN KEY (endereco_origem) REFERENCES carteira(endereco_carteira),
     FOREIGN KEY (endereco_destino) REFERENCES carteira(endereco_carteira),
     FOREIGN KEY (codigo_moeda) REFERENCES moeda(codigo)
 );
 
+-- Idempotency-Key das operações: a resposta da primeira execução de cada chave
+CREATE TABLE IF NOT EXISTS idempotencia (
+    endereco_carteira VARCHAR(64) NOT NULL,
+    chave VARCHAR(128) NOT NULL,
+    hash_requisicao CHAR(64) NOT NULL,
+    resposta JSON NULL,
+    data_criacao DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (endereco_carteira, chave),
+    INDEX idx_idempotencia_criacao (data_criacao)
+);
+
 -- Inserir moedas obrigatórias
 INSERT INTO moeda (codigo, nome, tipo) VALUES
     ('BTC', 'Bitcoin', 'CRYPTO'),